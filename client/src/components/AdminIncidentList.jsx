@@ -1,5 +1,10 @@
 import { useState } from 'react';
-import { deleteIncident } from '../services/incidentService';
+import {
+  deleteIncident,
+  deleteIncidents,
+  updateIncidentStatus,
+  updateIncidentStatuses,
+} from '../services/incidentService';
 import { MapPin, Trash2, AlertTriangle, MessageCircle } from 'lucide-react';
 import { format } from 'date-fns';
 import ConfirmDialog from './ConfirmDialog';
@@ -8,6 +13,37 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
   const [showConfirm, setShowConfirm] = useState(false);
   const [selectedIncident, setSelectedIncident] = useState(null);
   const [expandedIncident, setExpandedIncident] = useState(null);
+  const [selectedIds, setSelectedIds] = useState([]);
+  const [showBulkConfirm, setShowBulkConfirm] = useState(false);
+
+  const toggleSelected = (id) => {
+    setSelectedIds(ids => ids.includes(id) ? ids.filter(i => i !== id) : [...ids, id]);
+  };
+
+  const toggleAll = () => {
+    setSelectedIds(ids => ids.length === incidents.length ? [] : incidents.map(i => i.id));
+  };
+
+  const handleBulkStatus = async (status) => {
+    if (!status) return;
+    try {
+      await updateIncidentStatuses(selectedIds, status);
+      setSelectedIds([]);
+      onIncidentUpdated();
+    } catch (error) {
+      console.error('Failed to update incidents:', error);
+    }
+  };
+
+  const confirmBulkDelete = async () => {
+    try {
+      await deleteIncidents(selectedIds);
+      setSelectedIds([]);
+      onIncidentUpdated();
+    } catch (error) {
+      console.error('Failed to delete incidents:', error);
+    }
+  };
 
   const handleStatusChange = async (id, newStatus) => {
     try {
@@ -54,6 +90,39 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
 
   return (
     <>
+      <div className="flex items-center justify-between mb-4 text-sm">
+        <label className="flex items-center space-x-2 text-gray-600">
+          <input
+            type="checkbox"
+            checked={selectedIds.length === incidents.length}
+            onChange={toggleAll}
+            className="rounded border-gray-300 text-red-600 focus:ring-red-500"
+          />
+          <span>{selectedIds.length ? `${selectedIds.length} selected` : 'Select all'}</span>
+        </label>
+        {selectedIds.length > 0 && (
+          <div className="flex items-center space-x-2">
+            <select
+              value=""
+              onChange={(e) => handleBulkStatus(e.target.value)}
+              className="text-sm rounded-lg px-3 py-1 border border-gray-300"
+            >
+              <option value="">Set status…</option>
+              <option value="pending">Pending Review</option>
+              <option value="under investigation">Under Investigation</option>
+              <option value="resolved">Resolved</option>
+              <option value="rejected">Rejected</option>
+            </select>
+            <button
+              onClick={() => setShowBulkConfirm(true)}
+              className="flex items-center px-3 py-1 text-red-600 rounded-lg hover:bg-red-50"
+            >
+              <Trash2 className="w-4 h-4 mr-1" />
+              Delete
+            </button>
+          </div>
+        )}
+      </div>
       <div className="space-y-6">
         {incidents.map((incident) => (
           <div
@@ -63,6 +132,12 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
             <div className="p-6">
               <div className="flex justify-between items-start mb-4">
                 <div className="flex items-center space-x-3">
+                  <input
+                    type="checkbox"
+                    checked={selectedIds.includes(incident.id)}
+                    onChange={() => toggleSelected(incident.id)}
+                    className="rounded border-gray-300 text-red-600 focus:ring-red-500"
+                  />
                   <div className="w-10 h-10 bg-red-100 rounded-full flex items-center justify-center">
                     <span className="text-red-600 font-medium">
                       {incident.user.username.charAt(0).toUpperCase()}
@@ -111,7 +186,7 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
                   {incident.images.map((image, index) => (
                     <img
                       key={index}
-                      src={`${import.meta.env.VITE_API_URL}/uploads/${image.image_url}`}
+                      src={`${import.meta.env.VITE_API_URL}/uploads/${image.thumbnail_url || image.image_url}`}
                       alt={`Incident image ${index + 1}`}
                       className="w-full h-48 object-cover rounded-lg"
                     />
@@ -125,6 +200,8 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
                     <video
                       key={index}
                       src={`${import.meta.env.VITE_API_URL}/uploads/${video.video_url}`}
+                      poster={video.poster_url && `${import.meta.env.VITE_API_URL}/uploads/${video.poster_url}`}
+                      preload="none"
                       controls
                       className="w-full h-48 object-cover rounded-lg"
                     />
@@ -138,7 +215,7 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
                   className="flex items-center text-sm text-gray-500 hover:text-red-600"
                 >
                   <MessageCircle className="w-4 h-4 mr-1" />
-                  {incident.comments?.length || 0} comments
+                  {incident.comment_count ?? incident.comments?.length ?? 0} comments
                 </button>
               </div>
             </div>
@@ -153,6 +230,13 @@ const AdminIncidentList = ({ incidents, onIncidentUpdated }) => {
         title="Delete Incident"
         description="Are you sure you want to delete this incident? This action cannot be undone."
       />
+      <ConfirmDialog
+        isOpen={showBulkConfirm}
+        onClose={() => setShowBulkConfirm(false)}
+        onConfirm={confirmBulkDelete}
+        title="Delete Incidents"
+        description={`Are you sure you want to delete ${selectedIds.length} incidents? This action cannot be undone.`}
+      />
     </>
   );
 };
@@ -110,7 +110,7 @@ const IncidentList = ({ incidents, onIncidentUpdated }) => {
                   {incident.images.map((image, index) => (
                     <div key={index} className="relative aspect-video">
                       <img
-                        src={`${import.meta.env.VITE_API_URL}/uploads/${image.image_url}`}
+                        src={`${import.meta.env.VITE_API_URL}/uploads/${image.thumbnail_url || image.image_url}`}
                         alt={`Incident image ${index + 1}`}
                         className="w-full h-full object-cover rounded-lg"
                       />
@@ -125,6 +125,8 @@ const IncidentList = ({ incidents, onIncidentUpdated }) => {
                     <div key={index} className="relative aspect-video">
                       <video
                         src={`${import.meta.env.VITE_API_URL}/uploads/${video.video_url}`}
+                        poster={video.poster_url && `${import.meta.env.VITE_API_URL}/uploads/${video.poster_url}`}
+                        preload="none"
                         controls
                         className="w-full h-full object-cover rounded-lg"
                       />
@@ -1,10 +1,7 @@
 import { useNotifications } from '../context/NotificationContext';
 
 const NotificationBadge = () => {
-  const { notifications } = useNotifications();
-  
-  // Safely handle notifications array
-  const unreadCount = notifications?.filter(n => !n.read)?.length || 0;
+  const { unreadCount } = useNotifications();
 
   if (unreadCount === 0) return null;
 
@@ -5,7 +5,7 @@ import { useNotifications } from '../context/NotificationContext';
 import { markNotificationAsRead } from '../services/notificationService';
 
 const NotificationDropdown = () => {
-  const { notifications, markAsRead } = useNotifications();
+  const { notifications, unreadCount, markAsRead, markAllAsRead } = useNotifications();
 
   const handleMarkAsRead = async (id) => {
     try {
@@ -16,8 +16,6 @@ const NotificationDropdown = () => {
     }
   };
 
-  const unreadCount = notifications?.filter(n => !n.read)?.length || 0;
-
   return (
     <Menu as="div" className="relative inline-block text-left">
       <div>
@@ -41,8 +39,21 @@ const NotificationDropdown = () => {
         leaveTo="transform opacity-0 scale-95"
       >
         <Menu.Items className="absolute right-0 mt-2 w-96 origin-top-right bg-white rounded-xl shadow-lg ring-1 ring-black ring-opacity-5 focus:outline-none divide-y divide-gray-100 z-50">
-          <div className="px-4 py-3">
+          <div className="px-4 py-3 flex items-center justify-between">
             <p className="text-sm font-medium text-gray-900">Notifications</p>
+            {unreadCount > 0 && (
+              <button
+                onClick={(e) => {
+                  e.preventDefault();
+                  markAllAsRead().catch(error =>
+                    console.error('Failed to mark notifications as read:', error)
+                  );
+                }}
+                className="text-xs text-red-600 hover:text-red-700"
+              >
+                Mark all as read
+              </button>
+            )}
           </div>
 
           <div className="max-h-[calc(100vh-200px)] overflow-y-auto">
@@ -1,19 +1,32 @@
 import { useState, useEffect } from 'react';
-import { getAllUsers, deleteUser, banUser } from '../services/userService';
+import { getUsers, deleteUser, banUser } from '../services/userService';
 import { toast } from 'react-hot-toast';
 import { FaTrash, FaBan } from 'react-icons/fa';
 
+// Filter value -> { isAdmin, isBanned } query
+const FILTERS = {
+  all: {},
+  admins: { isAdmin: true },
+  banned: { isBanned: true }
+};
+
 const UserManagement = () => {
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [query, setQuery] = useState('');
+  const [filter, setFilter] = useState('all');
 
   useEffect(() => {
-    fetchUsers();
-  }, []);
+    // Wait for typing to pause before searching
+    const timer = setTimeout(() => fetchUsers(), 300);
+    return () => clearTimeout(timer);
+  }, [query, filter]);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (cursor) => {
     try {
-      const data = await getAllUsers();
-      setUsers(data);
+      const data = await getUsers({ q: query.trim(), ...FILTERS[filter], cursor });
+      setUsers((current) => (cursor ? [...current, ...data.users] : data.users));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch users');
     }
@@ -22,7 +35,7 @@ const UserManagement = () => {
   const handleDeleteUser = async (id) => {
     try {
       await deleteUser(id);
-      fetchUsers();
+      setUsers((current) => current.filter((user) => user.id !== id));
       toast.success('User deleted successfully');
     } catch (error) {
       toast.error('Failed to delete user');
@@ -31,8 +44,10 @@ const UserManagement = () => {
 
   const handleBanUser = async (id, isBanned) => {
     try {
-      await banUser(id, isBanned);
-      fetchUsers();
+      const updated = await banUser(id, isBanned);
+      setUsers((current) =>
+        current.map((user) => (user.id === id ? { ...user, ...updated } : user))
+      );
       toast.success(isBanned ? 'User banned successfully' : 'User unbanned successfully');
     } catch (error) {
       toast.error('Failed to update user status');
@@ -41,6 +56,24 @@ const UserManagement = () => {
 
   return (
     <div className="bg-white shadow overflow-hidden sm:rounded-lg">
+      <div className="flex space-x-2 p-4 border-b border-gray-200">
+        <input
+          type="search"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          placeholder="Search by username or email"
+          className="flex-1 rounded-md border border-gray-300 px-3 py-2 text-sm"
+        />
+        <select
+          value={filter}
+          onChange={(e) => setFilter(e.target.value)}
+          className="rounded-md border border-gray-300 px-3 py-2 text-sm"
+        >
+          <option value="all">All users</option>
+          <option value="admins">Admins</option>
+          <option value="banned">Banned</option>
+        </select>
+      </div>
       <ul className="divide-y divide-gray-200">
         {users.map((user) => (
           <li key={user.id} className="p-4">
@@ -48,6 +81,10 @@ const UserManagement = () => {
               <div>
                 <p className="text-sm font-medium text-gray-900">{user.username}</p>
                 <p className="text-sm text-gray-500">{user.email}</p>
+                <p className="text-xs text-gray-400">
+                  {user.incident_count} incidents · last active{' '}
+                  {user.last_active_at ? new Date(user.last_active_at).toLocaleDateString() : 'never'}
+                </p>
               </div>
               <div className="flex space-x-2">
                 <button
@@ -71,8 +108,16 @@ const UserManagement = () => {
           </li>
         ))}
       </ul>
+      {nextCursor && (
+        <button
+          onClick={() => fetchUsers(nextCursor)}
+          className="w-full p-3 text-sm text-blue-600 hover:text-blue-800"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 };
 
-export default UserManagement;
\ No newline at end of file
+export default UserManagement;
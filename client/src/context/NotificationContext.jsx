@@ -1,25 +1,32 @@
 import { createContext, useContext, useState, useEffect } from 'react';
-import { getNotifications } from '../services/notificationService';
+import { getNotifications, markAllNotificationsAsRead } from '../services/notificationService';
+import { subscribeToEvents } from '../services/eventService';
 
 const NotificationContext = createContext(null);
 
 export const NotificationProvider = ({ children }) => {
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
   const [error, setError] = useState(null);
 
+  // Merge by id in one pass, newest first
+  const mergeNotifications = (prevNotifications, incoming) => {
+    const byId = new Map(prevNotifications.map(n => [n.id, n]));
+    incoming.forEach(n => byId.set(n.id, n));
+    return [...byId.values()].sort((a, b) =>
+      new Date(b.created_at) - new Date(a.created_at)
+    );
+  };
+
   useEffect(() => {
     const checkNotifications = async () => {
       try {
-        const data = await getNotifications();
-        // Only update if there are new notifications
-        setNotifications(prevNotifications => {
-          const newNotifications = data.filter(
-            newNotif => !prevNotifications.some(
-              prevNotif => prevNotif.id === newNotif.id
-            )
-          );
-          return [...prevNotifications, ...newNotifications];
-        });
+        // Only the newest page; the unread counter comes from the server
+        const page = await getNotifications({ limit: 50 });
+        setNotifications(prevNotifications =>
+          mergeNotifications(prevNotifications, page.notifications)
+        );
+        setUnreadCount(page.unread_count);
         setError(null);
       } catch (error) {
         if (!error || error.message !== error?.message) {
@@ -34,9 +41,20 @@ export const NotificationProvider = ({ children }) => {
     // Initial check
     checkNotifications();
 
-    // Check for notifications every 30 seconds
-    const interval = setInterval(checkNotifications, 30000);
-    return () => clearInterval(interval);
+    // New notifications are pushed; the slow poll only covers a dropped stream
+    const unsubscribe = subscribeToEvents({
+      onNotification: (notification) => {
+        setNotifications(prevNotifications =>
+          mergeNotifications(prevNotifications, [notification])
+        );
+        setUnreadCount(count => count + 1);
+      },
+    });
+    const interval = setInterval(checkNotifications, 120000);
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+    };
   }, []);
 
   const markAsRead = (notificationId) => {
@@ -47,12 +65,23 @@ export const NotificationProvider = ({ children }) => {
           : notification
       )
     );
+    setUnreadCount(count => Math.max(count - 1, 0));
+  };
+
+  const markAllAsRead = async () => {
+    const { unread_count } = await markAllNotificationsAsRead();
+    setNotifications(prevNotifications =>
+      prevNotifications.map(notification => ({ ...notification, read: true }))
+    );
+    setUnreadCount(unread_count);
   };
 
   const value = {
     notifications,
+    unreadCount,
     error,
-    markAsRead
+    markAsRead,
+    markAllAsRead
   };
 
   return (
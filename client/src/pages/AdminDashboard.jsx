@@ -1,26 +1,32 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { Navigate } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import AdminIncidentList from '../components/AdminIncidentList';
 import UserManagement from '../components/UserManagement';
-import { getAllIncidents } from '../services/incidentService';
-import { AlertTriangle, Users, FileText } from 'lucide-react';
+import { getAdminStats, getIncidentChanges, mergeIncidentChanges, incidentExportUrl } from '../services/incidentService';
+import { subscribeToEvents } from '../services/eventService';
+import { AlertTriangle, Users, FileText, Download } from 'lucide-react';
 
 const AdminDashboard = () => {
   const [incidents, setIncidents] = useState([]);
   const [activeTab, setActiveTab] = useState('incidents');
+  const [stats, setStats] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const { user } = useAuth();
 
+  const sinceRef = useRef(null);
+
+  // Pull only what changed since the last sync instead of the whole feed
   const fetchIncidents = async () => {
     try {
-      setIsLoading(true);
-      const data = await getAllIncidents();
-      const sortedIncidents = data.sort((a, b) => 
-        new Date(b.created_at) - new Date(a.created_at)
-      );
-      setIncidents(sortedIncidents);
+      let page;
+      do {
+        page = await getIncidentChanges(sinceRef.current);
+        sinceRef.current = page.since;
+        const changes = page;
+        setIncidents(prevIncidents => mergeIncidentChanges(prevIncidents, changes));
+      } while (page.has_more);
     } catch (error) {
       console.error('Error fetching incidents:', error);
     } finally {
@@ -28,12 +34,30 @@ const AdminDashboard = () => {
     }
   };
 
+  // Breakdowns come precomputed from the server rather than counted here
+  const fetchStats = async () => {
+    try {
+      setStats(await getAdminStats());
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+    }
+  };
+
+  const refresh = () => {
+    fetchIncidents();
+    fetchStats();
+  };
+
   useEffect(() => {
     if (user?.is_admin) {
-      fetchIncidents();
-      // Poll for new incidents every 15 seconds
-      const interval = setInterval(fetchIncidents, 15000);
-      return () => clearInterval(interval);
+      refresh();
+      // Sync on pushed incident events; slow polling only covers a dropped stream
+      const unsubscribe = subscribeToEvents({ onIncident: refresh });
+      const interval = setInterval(refresh, 60000);
+      return () => {
+        unsubscribe();
+        clearInterval(interval);
+      };
     }
   }, [user]);
 
@@ -53,6 +77,26 @@ const AdminDashboard = () => {
           <p className="text-red-100">Manage incidents and users</p>
         </div>
 
+        {stats && (
+          <div className="grid grid-cols-2 sm:grid-cols-5 gap-4 mb-8">
+            <div className="bg-white rounded-2xl shadow-lg p-4">
+              <p className="text-sm text-gray-500">Total</p>
+              <p className="text-2xl font-bold text-gray-900">{stats.total}</p>
+            </div>
+            {['pending', 'under investigation', 'resolved', 'rejected'].map(status => (
+              <div key={status} className="bg-white rounded-2xl shadow-lg p-4">
+                <p className="text-sm text-gray-500 capitalize">{status}</p>
+                <p className="text-2xl font-bold text-gray-900">{stats.by_status[status] || 0}</p>
+              </div>
+            ))}
+            {stats.resolution.mean_seconds !== null && (
+              <p className="col-span-2 sm:col-span-5 text-sm text-gray-500">
+                Mean time to resolve: {(stats.resolution.mean_seconds / 3600).toFixed(1)} hours
+              </p>
+            )}
+          </div>
+        )}
+
         <div className="bg-white rounded-2xl shadow-lg p-6">
           <div className="flex space-x-4 mb-6">
             <button
@@ -77,6 +121,13 @@ const AdminDashboard = () => {
               <Users className="w-5 h-5 mr-2" />
               User Management
             </button>
+            <a
+              href={incidentExportUrl('csv')}
+              className="flex items-center px-4 py-2 ml-auto rounded-lg text-gray-600 hover:bg-gray-100 transition-all"
+            >
+              <Download className="w-5 h-5 mr-2" />
+              Export CSV
+            </a>
           </div>
 
           {isLoading ? (
@@ -84,7 +135,7 @@ const AdminDashboard = () => {
               <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-red-600"></div>
             </div>
           ) : activeTab === 'incidents' ? (
-            <AdminIncidentList incidents={incidents} onIncidentUpdated={fetchIncidents} />
+            <AdminIncidentList incidents={incidents} onIncidentUpdated={refresh} />
           ) : (
             <UserManagement />
           )}
@@ -1,9 +1,10 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../context/AuthContext';
 import Navbar from '../components/Navbar';
 import IncidentList from '../components/IncidentList';
 import CreateIncidentModal from '../components/CreateIncidentModal';
-import { getAllIncidents } from '../services/incidentService';
+import { getIncidentChanges, mergeIncidentChanges } from '../services/incidentService';
+import { subscribeToEvents } from '../services/eventService';
 import { AlertTriangle, Plus } from 'lucide-react';
 
 const Dashboard = () => {
@@ -12,15 +13,18 @@ const Dashboard = () => {
   const [isLoading, setIsLoading] = useState(true);
   const { user } = useAuth();
 
+  const sinceRef = useRef(null);
+
+  // Pull only what changed since the last sync instead of the whole feed
   const fetchIncidents = async () => {
     try {
-      setIsLoading(true);
-      const data = await getAllIncidents();
-      // Sort incidents by creation date, newest first
-      const sortedIncidents = data.sort((a, b) => 
-        new Date(b.created_at) - new Date(a.created_at)
-      );
-      setIncidents(sortedIncidents);
+      let page;
+      do {
+        page = await getIncidentChanges(sinceRef.current);
+        sinceRef.current = page.since;
+        const changes = page;
+        setIncidents(prevIncidents => mergeIncidentChanges(prevIncidents, changes));
+      } while (page.has_more);
     } catch (error) {
       console.error('Error fetching incidents:', error);
     } finally {
@@ -30,13 +34,21 @@ const Dashboard = () => {
 
   useEffect(() => {
     fetchIncidents();
-    // Poll for new incidents every 15 seconds
-    const interval = setInterval(fetchIncidents, 15000);
-    return () => clearInterval(interval);
+    // Sync on pushed incident events; slow polling only covers a dropped stream
+    const unsubscribe = subscribeToEvents({ onIncident: fetchIncidents });
+    const interval = setInterval(fetchIncidents, 60000);
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+    };
   }, []);
 
   const handleIncidentCreated = (newIncident) => {
-    setIncidents(prevIncidents => [newIncident, ...prevIncidents]);
+    // In surge mode the server only queues the report (202 with a provisional_id);
+    // it shows up through the changes feed once written
+    if (newIncident.id) {
+      setIncidents(prevIncidents => [newIncident, ...prevIncidents]);
+    }
     setIsModalOpen(false);
   };
 
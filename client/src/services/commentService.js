@@ -2,8 +2,10 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:5000';
 
-export const getComments = async (incidentId) => {
+// One page of the thread, newest first: { comments, next_cursor, count }
+export const getComments = async (incidentId, { limit = 20, cursor } = {}) => {
   const response = await axios.get(`${API_URL}/incidents/${incidentId}/comments`, {
+    params: { limit, cursor },
     withCredentials: true
   });
   return response.data;
@@ -0,0 +1,23 @@
+import axios from './axiosConfig';
+
+const INCIDENT_EVENTS = ['incident.created', 'incident.updated', 'incident.deleted'];
+
+// Open the server-sent event stream; returns a function that closes it
+export const subscribeToEvents = ({ onIncident, onNotification } = {}) => {
+  const source = new EventSource(`${axios.defaults.baseURL}/events`, {
+    withCredentials: true,
+  });
+
+  if (onIncident) {
+    INCIDENT_EVENTS.forEach(type =>
+      source.addEventListener(type, (event) => onIncident(JSON.parse(event.data)))
+    );
+  }
+  if (onNotification) {
+    source.addEventListener('notification', (event) =>
+      onNotification(JSON.parse(event.data).data)
+    );
+  }
+
+  return () => source.close();
+};
@@ -10,6 +10,54 @@ export const getAllIncidents = async () => {
   }
 };
 
+export const getIncidentPage = async ({ limit = 20, cursor, fields } = {}) => {
+  try {
+    const response = await axios.get('/incidents', {
+      params: { limit, cursor, fields },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching incidents:', error);
+    throw error;
+  }
+};
+
+export const getIncidentChanges = async (since) => {
+  try {
+    const response = await axios.get('/incidents/changes', {
+      params: { since, limit: 100 },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching incident changes:', error);
+    throw error;
+  }
+};
+
+export const getAdminStats = async () => {
+  try {
+    const response = await axios.get('/admin/stats');
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching incident stats:', error);
+    throw error;
+  }
+};
+
+// Streamed by the server; link to it rather than loading it through axios
+export const incidentExportUrl = (format = 'csv', { archived = true } = {}) =>
+  `${axios.defaults.baseURL}/incidents/export?format=${format}${archived ? '&archived=1' : ''}`;
+
+// Apply a changes-feed page to a list of incidents, newest first
+export const mergeIncidentChanges = (incidents, { incidents: changed, deleted }) => {
+  const byId = new Map(incidents.map(incident => [incident.id, incident]));
+  changed.forEach(incident => byId.set(incident.id, incident));
+  deleted.forEach(({ id }) => byId.delete(id));
+  return [...byId.values()].sort((a, b) =>
+    new Date(b.created_at) - new Date(a.created_at)
+  );
+};
+
 export const createIncident = async (formData) => {
   try {
     const response = await axios.post('/incidents', formData, {
@@ -44,6 +92,27 @@ export const updateIncidentStatus = async (id, status) => {
   }
 };
 
+// Admin triage: one request and one transaction for many incidents
+export const updateIncidentStatuses = async (ids, status) => {
+  try {
+    const response = await axios.put('/incidents/batch', { ids, status });
+    return response.data;
+  } catch (error) {
+    console.error('Error updating incidents:', error);
+    throw error;
+  }
+};
+
+export const deleteIncidents = async (ids) => {
+  try {
+    const response = await axios.delete('/incidents/batch', { data: { ids } });
+    return response.data;
+  } catch (error) {
+    console.error('Error deleting incidents:', error);
+    throw error;
+  }
+};
+
 export const deleteIncident = async (id) => {
   try {
     await axios.delete(`/incidents/${id}`);
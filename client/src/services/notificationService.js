@@ -1,11 +1,28 @@
 import axios from './axiosConfig';
 
-export const getNotifications = async () => {
-  const response = await axios.get('/notifications');
+export const getNotifications = async ({ limit = 50, cursor, unread } = {}) => {
+  const response = await axios.get('/notifications', {
+    params: { limit, cursor, unread: unread ? 1 : undefined },
+  });
   return response.data;
 };
 
+export const getUnreadCount = async () => {
+  const response = await axios.get('/notifications/unread_count');
+  return response.data.unread_count;
+};
+
 export const markNotificationAsRead = async (id) => {
   const response = await axios.put(`/notifications/${id}`);
   return response.data;
-};
\ No newline at end of file
+};
+
+export const markNotificationsAsRead = async (ids) => {
+  const response = await axios.put('/notifications', { ids });
+  return response.data;
+};
+
+export const markAllNotificationsAsRead = async () => {
+  const response = await axios.put('/notifications', { all: true });
+  return response.data;
+};
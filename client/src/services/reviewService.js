@@ -2,8 +2,10 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:5000';
 
-const getReviews = async (incidentId) => {
+// One page of the thread, newest first: { reviews, next_cursor, count }
+const getReviews = async (incidentId, { limit = 20, cursor } = {}) => {
   const response = await axios.get(`${API_URL}/incidents/${incidentId}/reviews`, {
+    params: { limit, cursor },
     withCredentials: true
   });
   return response.data;
@@ -2,8 +2,17 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:5000';
 
-export const getAllUsers = async () => {
+// One page of the directory, newest first: { users, next_cursor }.
+// `q` is a username/email prefix; isAdmin/isBanned filter when set.
+export const getUsers = async ({ q, isAdmin, isBanned, limit = 50, cursor } = {}) => {
   const response = await axios.get(`${API_URL}/users`, {
+    params: {
+      limit,
+      cursor,
+      q: q || undefined,
+      is_admin: isAdmin === undefined ? undefined : Number(isAdmin),
+      is_banned: isBanned === undefined ? undefined : Number(isBanned)
+    },
     withCredentials: true
   });
   return response.data;
@@ -1,38 +1,51 @@
-from flask import Flask, request, jsonify, session, make_response
+from flask import Flask, request, jsonify, session, Response, stream_with_context
 from flask_restful import Api, Resource
 from flask_migrate import Migrate
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
 from models.extensions import db
 from models.user import User
 from models.incident_report import IncidentReport
-from models.incident_image import IncidentImage
-from models.incident_video import IncidentVideo
 from models.incident_comment import IncidentComment
 from models.incident_reaction import IncidentReaction
 from models.incident_review import IncidentReview
 from models.notification import Notification
+from models.incident_rollup import IncidentRollup
+from models.incident_cluster import IncidentCluster
+from services.incident_feed import feed_query, serialize_incidents, feed_page, parse_fields, changes_since, feed_watermark
+from services.pagination import page_limit, paginate
+from services.events import broker, INCIDENTS_CHANNEL, user_channel
+from services.geo import bbox_filter, radius_filter, parse_bbox, parse_near, encode_geohash
+from services.media import UploadRequest, pipeline, store_upload, allowed_file, send_media
+from services.thumbnails import variants
+from services.notifications import dispatcher
+from services.cache import response_cache
+from services.principal import principals, current_principal
+from services.search import search_incidents, rebuild_search_index
+from services.database import engines, read_only
+from services.metrics import metrics
+from services.analytics import snapshot, rebuild as rebuild_rollups
+from services.moderation import parse_ids, update_status, delete_incidents, owner_messages
+from services.media_gc import collector
+from services.archive import archive_incidents, archived_incident, archived_thread
+from services.ingest import MEDIA_KINDS, QueueFull, create_incident, ingest_queue
+from services.wire import MEDIA_TYPES, WireJSONProvider, compressor, output
+from services.export import FORMATS, export_incidents, parse_filters as parse_export_filters
+from services.users import delete_user, directory_page, parse_flag
+from config import Config
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from datetime import timedelta
+from sqlalchemy.orm import selectinload
+import click
+from datetime import datetime, timedelta
 import os
 
 # Create Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest  # stream uploads to disk as they are parsed
 
 # Basic configuration
-app.config.update(
-    SECRET_KEY='ajali-2',
-    SQLALCHEMY_DATABASE_URI='sqlite:///ajali.db',
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    SESSION_COOKIE_SAMESITE='Lax',
-    SESSION_COOKIE_SECURE=False,  # Set to True in production with HTTPS
-    UPLOAD_FOLDER='uploads',
-    MAX_CONTENT_LENGTH=100 * 1024 * 1024,  # 100MB max file size
-    ALLOWED_EXTENSIONS={'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'},
-    PERMANENT_SESSION_LIFETIME=timedelta(days=1),  # Session lasts 1 day
-    SESSION_PERMANENT=True
-)
+app.config.from_object(Config)
+app.json = WireJSONProvider(app)  # jsonify() negotiates JSON/MessagePack and the normalized shape
 
 # Configure CORS
 CORS(app,
@@ -46,8 +59,21 @@ CORS(app,
     })
 
 # Initialize database
+engines.init_app(app)
 db.init_app(app)
 migrate = Migrate(app, db)
+broker.init_app(app)
+pipeline.init_app(app)
+variants.init_app(app, pipeline)
+dispatcher.init_app(app)
+response_cache.init_app(app)
+principals.init_app(app)
+metrics.init_app(app)
+collector.init_app(app)
+ingest_queue.init_app(app)
+compressor.init_app(app)  # after metrics, so its after_request runs first and bytes are counted compressed
+collector.keep(ingest_queue.queued_files)  # uploads of reports still waiting in the queue
+response_cache.watermark('incidents')(feed_watermark)
 
 # Create uploads folder
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -55,6 +81,39 @@ if not os.path.exists(app.config['UPLOAD_FOLDER']):
 
 # Initialize API
 api = Api(app)
+api.representations = {mimetype: output for mimetype in MEDIA_TYPES}
+
+def incident_changed(event, data):
+    """Fan a committed incident write out to the response cache and event streams"""
+    response_cache.invalidate('incidents')
+    broker.publish(INCIDENTS_CHANNEL, event, data)
+
+@pipeline.on_done
+def media_processed(media):
+    """Let sync clients and open streams see the media leave 'processing'"""
+    IncidentReport.touch(media.report_id)
+    db.session.commit()
+    incident_changed('incident.updated', {'id': media.report_id, 'media': media.to_dict()})
+
+@ingest_queue.on_committed
+def incident_created(incident, media, new_cluster):
+    """Start media processing and fan a committed new incident out; returns its payload"""
+    for item in media:
+        pipeline.submit(type(item), item.id)
+
+    payload = incident.to_dict()
+    incident_changed('incident.created', payload)
+
+    # Admin fan-out happens on the dispatcher thread with one INSERT ... SELECT;
+    # probable duplicates of an open cluster do not notify again
+    if new_cluster:
+        dispatcher.notify_admins(
+            f"New incident reported by {payload['user']['username']} requires review",
+            type='warning',
+            coalesce='new-incident',
+            summary="{count} new incidents require review"
+        )
+    return payload
 
 # Decorators
 def login_required(f):
@@ -62,16 +121,20 @@ def login_required(f):
     def decorated(*args, **kwargs):
         if 'user_id' not in session:
             return {'message': 'Authentication required'}, 401
+        principal = current_principal()
+        if principal is None:
+            session.clear()
+            return {'message': 'Authentication required'}, 401
+        if principal.is_banned:
+            return {'message': 'Account is banned'}, 403
         return f(*args, **kwargs)
     return decorated
 
 def admin_required(f):
     @wraps(f)
+    @login_required
     def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return {'message': 'Authentication required'}, 401
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_admin:
+        if not current_principal().is_admin:
             return {'message': 'Admin privileges required'}, 403
         return f(*args, **kwargs)
     return decorated
@@ -90,6 +153,34 @@ def create_admin_user():
         db.session.add(admin)
         db.session.commit()
 
+# Helpers
+def _bounded_int(raw, default, minimum, maximum):
+    """An integer query argument or JSON value within [minimum, maximum]"""
+    if raw is None or raw == '':
+        return default
+    # int() would truncate 4.5 and accept True as 1
+    if isinstance(raw, bool) or not isinstance(raw, (int, str)):
+        raise ValueError(f"Expected an integer, got {raw!r}")
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"Expected an integer, got {raw!r}")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"Value must be between {minimum} and {maximum}")
+    return value
+
+def _thread_page(model, incident_id, counter):
+    """One keyset page of an incident's comments or reviews, newest first"""
+    limit, cursor = page_limit(request.args.get('limit')), request.args.get('cursor')
+    count = db.session.query(counter).filter(IncidentReport.id == incident_id).scalar()
+    if count is None:
+        return archived_thread(model, incident_id, limit, cursor)
+    items, next_cursor = paginate(
+        model.query.options(selectinload(model.user)).filter(model.incident_id == incident_id),
+        (model.created_at, model.id), limit, cursor, types=(datetime, int)
+    )
+    return [item.to_dict() for item in items], next_cursor, count
+
 # Resources
 class AuthResource(Resource):
     def post(self):
@@ -97,6 +188,8 @@ class AuthResource(Resource):
         user = User.query.filter_by(email=data['email']).first()
         
         if user and check_password_hash(user.password_hash, data['password']):
+            if user.is_banned:
+                return {'message': 'Account is banned'}, 403
             session['user_id'] = user.id
             return {'user': user.to_dict()}, 200
         
@@ -125,63 +218,84 @@ class LogoutResource(Resource):
 class IncidentListResource(Resource):
     @login_required
     def post(self):
-        files = request.files.getlist('files')
+        files = [file for file in request.files.getlist('files') if file]
         data = request.form
 
-        incident = IncidentReport(
-            description=data['description'],
-            latitude=float(data['latitude']),
-            longitude=float(data['longitude']),
-            user_id=session['user_id'],
-            status='pending'  # Set initial status to pending
-        )
-        db.session.add(incident)
-        db.session.commit()
-
-        # Handle file uploads
+        if any(not allowed_file(file.filename) for file in files):
+            return {'message': 'Unsupported file type'}, 400
+        try:
+            description = data['description']
+            latitude, longitude = float(data['latitude']), float(data['longitude'])
+        except (KeyError, ValueError):
+            return {'message': 'description, latitude and longitude are required'}, 400
+
+        # Files were streamed to disk while the form was parsed; store them by
+        # content hash and leave post-processing to the media pipeline
+        media = []
         for file in files:
-            if file:
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                
-                if file.content_type.startswith('image/'):
-                    image = IncidentImage(image_url=filename, report_id=incident.id)
-                    db.session.add(image)
-                elif file.content_type.startswith('video/'):
-                    video = IncidentVideo(video_url=filename, report_id=incident.id)
-                    db.session.add(video)
-
-        db.session.commit()
-
-        # Create notification for admin
-        admin_users = User.query.filter_by(is_admin=True).all()
-        for admin in admin_users:
-            notification = Notification(
-                user_id=admin.id,
-                message=f"New incident reported by {incident.user.username} requires review",
-                type='warning'
-            )
-            db.session.add(notification)
+            kind = file.content_type.split('/')[0]
+            if kind in MEDIA_KINDS:
+                media.append((*store_upload(file), kind))
+
+        if ingest_queue.enabled:
+            # Surge mode: acknowledge once durably queued, the writer commits in batches
+            try:
+                ticket, depth = ingest_queue.append(session['user_id'], description, latitude, longitude, media)
+            except QueueFull as e:
+                return {'message': str(e), 'queue_depth': e.depth}, 503, {'Retry-After': str(e.retry_after)}
+            return ({'provisional_id': ticket, 'status': 'queued', 'queue_depth': depth},
+                    202, {'Location': f'/incidents/ingest/{ticket}'})
+
+        incident, items, new_cluster = create_incident(session['user_id'], description, latitude, longitude, media)
         db.session.commit()
-
-        return incident.to_dict(), 201
+        return incident_created(incident, items, new_cluster), 201
     
     @login_required
+    @read_only
+    @response_cache.cached('incidents')
     def get(self):
-        """Get all incidents"""
+        """Get incidents, one keyset page at a time when ?limit/cursor/fields is given"""
+        args = request.args
         try:
-            incidents = IncidentReport.query.order_by(IncidentReport.created_at.desc()).all()
-            return jsonify([incident.to_dict() for incident in incidents])    
+            try:
+                filters = self._location_filters(args)
+                if not any(key in args for key in ('limit', 'cursor', 'fields')):
+                    incidents = (feed_query().filter(*filters)
+                                 .order_by(IncidentReport.created_at.desc()).all())
+                    return jsonify(serialize_incidents(incidents))
+
+                limit = page_limit(args.get('limit'))
+                fields = parse_fields(args.get('fields'))
+                return jsonify(feed_page(limit, args.get('cursor'), fields, filters))
+            except ValueError as e:
+                return {'message': str(e)}, 400
         except Exception as e:
             print(f"Error fetching incidents: {str(e)}")  # Debug log
             return {'message': 'Internal server error'}, 500
 
+    @staticmethod
+    def _location_filters(args):
+        """?bbox=min_lon,min_lat,max_lon,max_lat and ?near=lat,lon&radius_km="""
+        filters = []
+        if args.get('bbox'):
+            filters.append(bbox_filter(IncidentReport, *parse_bbox(args['bbox'])))
+        if args.get('near'):
+            filters.append(radius_filter(IncidentReport, *parse_near(args['near'], args.get('radius_km'))))
+        return filters
+
 class IncidentResource(Resource):
     @login_required
+    @read_only
+    @response_cache.cached('incidents')
     def get(self, incident_id):
-        incident = IncidentReport.query.get_or_404(incident_id)
-        return incident.to_dict()
+        incident = feed_query().filter(IncidentReport.id == incident_id).first()
+        if incident is not None:
+            return incident.to_dict()
+        # Archived incidents stay reachable by id
+        archived = archived_incident(incident_id)
+        if archived is None:
+            return {'message': 'Incident not found'}, 404
+        return archived
 
     @login_required
     def put(self, incident_id):
@@ -189,7 +303,7 @@ class IncidentResource(Resource):
             incident = IncidentReport.query.get_or_404(incident_id)
             
             # Check if user owns the incident
-            if incident.user_id != session['user_id'] and not User.query.get(session['user_id']).is_admin:
+            if incident.user_id != session['user_id'] and not current_principal().is_admin:
                 return {'message': 'Unauthorized'}, 403
 
             data = request.get_json()
@@ -203,57 +317,198 @@ class IncidentResource(Resource):
                 incident.longitude = float(data['longitude'])
             
             # Only admin can update status
-            if User.query.get(session['user_id']).is_admin and 'status' in data:
+            if current_principal().is_admin and 'status' in data:
                 incident.status = data['status']
 
             db.session.commit()
-            return incident.to_dict(), 200
+            payload = incident.to_dict()
+            incident_changed('incident.updated', payload)
+            return payload, 200
         except Exception as e:
             db.session.rollback()
             return {'message': str(e)}, 500
 
     @login_required
     def delete(self, incident_id):
-        try:
-            incident = IncidentReport.query.get_or_404(incident_id)
-            
-            # Check if user owns the incident or is admin
-            if incident.user_id != session['user_id'] and not User.query.get(session['user_id']).is_admin:
-                return {'message': 'Unauthorized'}, 403
+        incident = IncidentReport.query.get_or_404(incident_id)
+
+        if not (session['user_id'] == incident.user_id or
+                current_principal().is_admin):
+            return {'message': 'Unauthorized'}, 403
+
+        _, files = delete_incidents([incident_id])
+        db.session.commit()
+        collector.collect(files)  # unlinked off the request once nothing references them
+        incident_changed('incident.deleted', {'id': incident_id})
+        return '', 204
 
-            # Delete associated media files
-            for image in incident.images:
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], image.image_url)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                db.session.delete(image)
+class IncidentClusterResource(Resource):
+    @admin_required
+    @read_only
+    def get(self):
+        """Clusters of probable duplicates, most recently active first.
 
-            for video in incident.videos:
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], video.video_url)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                db.session.delete(video)
+        ?min_reports=2 (default) hides single reports; pages with ?limit/cursor.
+        """
+        args = request.args
+        try:
+            min_reports = _bounded_int(args.get('min_reports'), 2, 1, 1000000)
+            clusters, next_cursor = paginate(
+                IncidentCluster.query.filter(IncidentCluster.report_count >= min_reports),
+                (IncidentCluster.last_reported_at, IncidentCluster.id),
+                page_limit(args.get('limit')), args.get('cursor'), types=(datetime, int)
+            )
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        members = {}
+        if clusters:
+            rows = (db.session.query(IncidentReport.cluster_id, IncidentReport.id)
+                    .filter(IncidentReport.cluster_id.in_([c.id for c in clusters]))
+                    .order_by(IncidentReport.created_at, IncidentReport.id))
+            for cluster_id, incident_id in rows:
+                members.setdefault(cluster_id, []).append(incident_id)
+        return jsonify({
+            'clusters': [dict(c.to_dict(), incident_ids=members.get(c.id, [])) for c in clusters],
+            'next_cursor': next_cursor
+        })
+
+class IncidentBatchResource(Resource):
+    """Admin triage of many incidents per request, each in one transaction"""
 
-            db.session.delete(incident)
-            db.session.commit()
-            return '', 204
-        except Exception as e:
+    @admin_required
+    def put(self):
+        """Set {"status": ...} on every incident in {"ids": [...]}"""
+        data = request.get_json(silent=True) or {}
+        try:
+            changed = update_status(parse_ids(data.get('ids')), data.get('status'))
+        except ValueError as e:
             db.session.rollback()
-            return {'message': str(e)}, 500
+            return {'message': str(e)}, 400
+        db.session.commit()
 
-    @login_required
-    def delete(self, incident_id):
-        incident = IncidentReport.query.get_or_404(incident_id)
-        
-        if not (session['user_id'] == incident.user_id or 
-                User.query.get(session['user_id']).is_admin):
-            return {'message': 'Unauthorized'}, 403
+        ids = [incident_id for incident_id, _ in changed]
+        if ids:
+            status = data['status']
+            dispatcher.notify_each(owner_messages(
+                changed,
+                lambda own: f"Your incident report #{own[0]} is now {status}" if len(own) == 1
+                else f"{len(own)} of your incident reports are now {status}",
+                exclude_user_id=session['user_id']
+            ))
+            incident_changed('incident.updated', {'ids': ids, 'status': status})
+        return {'updated': ids}
 
-        db.session.delete(incident)
+    @admin_required
+    def delete(self):
+        """Delete every incident in {"ids": [...]} along with its comments, reactions, reviews and media"""
+        data = request.get_json(silent=True) or {}
+        try:
+            deleted, files = delete_incidents(parse_ids(data.get('ids')))
+        except ValueError as e:
+            db.session.rollback()
+            return {'message': str(e)}, 400
         db.session.commit()
-        return '', 204
+        collector.collect(files)
+
+        ids = [incident_id for incident_id, _ in deleted]
+        if ids:
+            dispatcher.notify_each(owner_messages(
+                deleted,
+                lambda own: f"Your incident report #{own[0]} was removed by a moderator" if len(own) == 1
+                else f"{len(own)} of your incident reports were removed by a moderator",
+                exclude_user_id=session['user_id']
+            ), type='warning')
+            incident_changed('incident.deleted', {'ids': ids})
+        return {'deleted': ids}
+
+class IngestResource(Resource):
+    @login_required
+    def get(self, ticket):
+        """State of a report queued in surge mode, by its provisional id"""
+        status = ingest_queue.status(ticket)
+        if status is None:
+            return {'message': 'Unknown provisional id'}, 404
+        return status
+
+class IngestStatsResource(Resource):
+    @admin_required
+    def get(self):
+        """Ingest queue depth, failures, age of the oldest report and drain rate"""
+        return ingest_queue.stats()
+
+class IncidentExportResource(Resource):
+    @admin_required
+    def get(self):
+        """Stream every incident as ?format=ndjson (default) or csv.
+
+        Filters: status=a,b and since/until on created_at; archived=1 appends
+        the archived incidents after the live ones.
+        """
+        args = request.args
+        fmt = args.get('format', 'ndjson')
+        if fmt not in FORMATS:
+            return {'message': f"Format must be one of: {', '.join(FORMATS)}"}, 400
+        try:
+            filters = parse_export_filters(args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        include_archived = args.get('archived') in ('1', 'true')
+        return Response(
+            stream_with_context(export_incidents(fmt, filters, include_archived)),
+            mimetype=FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename=incidents.{fmt}'}
+        )
+
+class IncidentChangesResource(Resource):
+    @login_required
+    @read_only
+    def get(self):
+        """Incidents created, updated or deleted since the ?since= watermark"""
+        args = request.args
+        try:
+            limit = page_limit(args.get('limit'))
+            fields = parse_fields(args.get('fields'))
+            overlap = timedelta(seconds=app.config['CHANGES_OVERLAP_SECONDS'])
+            return jsonify(changes_since(args.get('since'), limit, fields, overlap))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+class IncidentSearchResource(Resource):
+    @login_required
+    @read_only
+    @response_cache.cached('incidents')
+    def get(self):
+        """Ranked full-text search: ?q= plus optional status, since/until and location filters"""
+        args = request.args
+        try:
+            filters = IncidentListResource._location_filters(args)
+            if args.get('status'):
+                filters.append(IncidentReport.status.in_(args['status'].split(',')))
+            if args.get('since'):
+                filters.append(IncidentReport.created_at >= datetime.fromisoformat(args['since']))
+            if args.get('until'):
+                filters.append(IncidentReport.created_at < datetime.fromisoformat(args['until']))
+            limit = page_limit(args.get('limit'))
+            fields = parse_fields(args.get('fields'))
+            return jsonify(search_incidents(args.get('q'), limit, args.get('cursor'), fields, filters))
+        except ValueError as e:
+            return {'message': str(e)}, 400
 
 class CommentResource(Resource):
+    @login_required
+    @read_only
+    def get(self, incident_id):
+        """The incident's comments, newest first; page with ?limit and ?cursor"""
+        try:
+            page = _thread_page(IncidentComment, incident_id, IncidentReport.comment_count)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        if page is None:
+            return {'message': 'Incident not found'}, 404
+        comments, next_cursor, count = page
+        return jsonify({'comments': comments, 'next_cursor': next_cursor, 'count': count})
+
     @login_required
     def post(self, incident_id):
         data = request.get_json()
@@ -263,46 +518,137 @@ class CommentResource(Resource):
             incident_id=incident_id
         )
         db.session.add(comment)
+        if not IncidentReport.touch(incident_id, comment_count=1):
+            db.session.rollback()
+            return {'message': 'Incident not found'}, 404
         db.session.commit()
-        return comment.to_dict(), 201
+        payload = comment.to_dict()
+        incident_changed('incident.updated', {'id': incident_id, 'comment': payload})
+        return payload, 201
+
+# Reaction type -> IncidentReport counter column
+REACTION_COUNTERS = {'like': 'like_count', 'share': 'share_count'}
 
 class ReactionResource(Resource):
     @login_required
     def post(self, incident_id):
         data = request.get_json()
+        counter = REACTION_COUNTERS.get(data['reaction_type'])
+        if counter is None:
+            return {'message': 'Invalid reaction type'}, 400
         reaction = IncidentReaction(
             reaction_type=data['reaction_type'],
             user_id=session['user_id'],
             incident_id=incident_id
         )
         db.session.add(reaction)
+        if not IncidentReport.touch(incident_id, **{counter: 1}):
+            db.session.rollback()
+            return {'message': 'Incident not found'}, 404
         db.session.commit()
-        return reaction.to_dict(), 201
+        payload = reaction.to_dict()
+        incident_changed('incident.updated', {'id': incident_id, 'reaction': payload})
+        return payload, 201
 
 class ReviewResource(Resource):
+    @login_required
+    @read_only
+    def get(self, incident_id):
+        """The incident's reviews, newest first; page with ?limit and ?cursor"""
+        try:
+            page = _thread_page(IncidentReview, incident_id, IncidentReport.review_count)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        if page is None:
+            return {'message': 'Incident not found'}, 404
+        reviews, next_cursor, count = page
+        return jsonify({'reviews': reviews, 'next_cursor': next_cursor, 'count': count})
+
     @login_required
     def post(self, incident_id):
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        # Checked before anything is written: the rating feeds rating_total
+        try:
+            rating = _bounded_int(data.get('rating'), None, 1, 5)
+        except ValueError:
+            rating = None
+        if rating is None:
+            return {'message': 'rating must be an integer from 1 to 5'}, 400
+        if not isinstance(data.get('content'), str) or not data['content'].strip():
+            return {'message': 'content is required'}, 400
         review = IncidentReview(
-            rating=data['rating'],
+            rating=rating,
             content=data['content'],
             user_id=session['user_id'],
             incident_id=incident_id
         )
         db.session.add(review)
+        if not IncidentReport.touch(incident_id, review_count=1, rating_total=review.rating):
+            db.session.rollback()
+            return {'message': 'Incident not found'}, 404
         db.session.commit()
-        return review.to_dict(), 201
+        payload = review.to_dict()
+        incident_changed('incident.updated', {'id': incident_id, 'review': payload})
+        return payload, 201
+
+class EventStreamResource(Resource):
+    @login_required
+    def get(self):
+        """Server-Sent Events: incident changes plus the caller's notifications"""
+        channels = [INCIDENTS_CHANNEL, user_channel(session['user_id'])]
+        # The stream stays open as long as the client does and never touches
+        # the database, so give back the connection the login check used
+        db.session.remove()
+        return Response(
+            broker.stream(channels),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
 class NotificationResource(Resource):
     @login_required
+    @read_only
     def get(self):
-        notifications = Notification.query.filter_by(
-            user_id=session['user_id']
-        ).order_by(Notification.created_at.desc()).all()
-        return jsonify([n.to_dict() for n in notifications])
+        """The caller's inbox, one keyset page at a time when ?limit/cursor/unread is given"""
+        args = request.args
+        query = Notification.query.filter_by(user_id=session['user_id'])
+        if not any(key in args for key in ('limit', 'cursor', 'unread')):
+            notifications = query.order_by(Notification.created_at.desc()).all()
+            return jsonify([n.to_dict() for n in notifications])
+
+        if args.get('unread') in ('1', 'true'):
+            query = query.filter_by(read=False)
+        try:
+            notifications, next_cursor = paginate(
+                query, (Notification.created_at, Notification.id),
+                page_limit(args.get('limit')), args.get('cursor'), types=(datetime, int)
+            )
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        return jsonify({
+            'notifications': [n.to_dict() for n in notifications],
+            'next_cursor': next_cursor,
+            'unread_count': Notification.unread_count(session['user_id'])
+        })
 
     @login_required
-    def put(self, notification_id):
+    def put(self, notification_id=None):
+        """Mark one notification read, or many with {"ids": [...]} / {"all": true}"""
+        if notification_id is None:
+            data = request.get_json(silent=True) or {}
+            if data.get('all'):
+                updated = Notification.mark_read(session['user_id'])
+            elif 'ids' in data:
+                try:
+                    ids = parse_ids(data['ids'], kind='notification')
+                except ValueError as e:
+                    return {'message': str(e)}, 400
+                updated = Notification.mark_read(session['user_id'], ids)
+            else:
+                return {'message': 'Provide "ids" or "all"'}, 400
+            db.session.commit()
+            return {'updated': updated, 'unread_count': Notification.unread_count(session['user_id'])}
+
         notification = Notification.query.get_or_404(notification_id)
         if notification.user_id != session['user_id']:
             return {'message': 'Unauthorized'}, 403
@@ -310,11 +656,59 @@ class NotificationResource(Resource):
         db.session.commit()
         return notification.to_dict()
 
+class NotificationUnreadCountResource(Resource):
+    @login_required
+    @read_only
+    def get(self):
+        return {'unread_count': Notification.unread_count(session['user_id'])}
+
+class MediaResource(Resource):
+    @login_required
+    def get(self, filename):
+        """Serve an uploaded file with Range, ETag and caching support"""
+        return send_media(filename)
+
+class CacheStatsResource(Resource):
+    @admin_required
+    def get(self):
+        return response_cache.stats
+
+class AdminStatsResource(Resource):
+    @admin_required
+    @read_only
+    def get(self):
+        """Dashboard aggregates from the rollup table: ?hours=48&days=30 size the time series"""
+        try:
+            hours = _bounded_int(request.args.get('hours'), 48, 1, 24 * 14)
+            days = _bounded_int(request.args.get('days'), 30, 1, 366)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        return snapshot(hours, days)
+
+class MetricsResource(Resource):
+    def get(self):
+        """Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>` when that is set"""
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return {'message': 'Authentication required'}, 401
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 class UserResource(Resource):
     @admin_required
+    @read_only
     def get(self):
-        users = User.query.all()
-        return jsonify([user.to_dict() for user in users])
+        """The user directory, one keyset page at a time when ?limit/cursor/q/is_admin/is_banned is given"""
+        args = request.args
+        if not any(key in args for key in ('limit', 'cursor', 'q', 'is_admin', 'is_banned')):
+            users = User.query.all()
+            return jsonify([user.to_dict() for user in users])
+        try:
+            return jsonify(directory_page(
+                page_limit(args.get('limit')), args.get('cursor'), args.get('q', '').strip(),
+                parse_flag(args.get('is_admin'), 'is_admin'), parse_flag(args.get('is_banned'), 'is_banned')
+            ))
+        except ValueError as e:
+            return {'message': str(e)}, 400
 
 class UserDetailResource(Resource):    
     @admin_required
@@ -322,14 +716,26 @@ class UserDetailResource(Resource):
         user = User.query.get_or_404(user_id)
         data = request.get_json()
         user.is_admin = data.get('is_admin', user.is_admin)
+        user.is_banned = data.get('is_banned', user.is_banned)
         db.session.commit()
+        principals.invalidate(user.id)
+        response_cache.invalidate('incidents')  # incidents embed their author
         return user.to_dict()
 
     @admin_required
     def delete(self, user_id):
-        user = User.query.get_or_404(user_id)
-        db.session.delete(user)
+        """Delete a user with their incidents, notifications, comments, reviews and reactions"""
+        if db.session.get(User, user_id) is None:
+            return {'message': 'User not found'}, 404
+        deleted, touched, files = delete_user(user_id)
         db.session.commit()
+        collector.collect(files)
+        principals.invalidate(user_id)
+        response_cache.invalidate('incidents')
+        if deleted:
+            incident_changed('incident.deleted', {'ids': [incident_id for incident_id, _ in deleted]})
+        if touched:
+            incident_changed('incident.updated', {'ids': touched})
         return '', 204
 
 # API Endpoints
@@ -338,12 +744,25 @@ api.add_resource(RegisterResource, '/register')
 api.add_resource(LogoutResource, '/logout')
 api.add_resource(IncidentListResource, '/incidents')
 api.add_resource(IncidentResource, '/incidents/<int:incident_id>')
+api.add_resource(IncidentChangesResource, '/incidents/changes')
+api.add_resource(IngestStatsResource, '/incidents/ingest')
+api.add_resource(IngestResource, '/incidents/ingest/<string:ticket>')
+api.add_resource(IncidentExportResource, '/incidents/export')
+api.add_resource(IncidentBatchResource, '/incidents/batch')
+api.add_resource(IncidentClusterResource, '/incidents/clusters')
+api.add_resource(IncidentSearchResource, '/incidents/search')
 api.add_resource(CommentResource, '/incidents/<int:incident_id>/comments')
 api.add_resource(ReactionResource, '/incidents/<int:incident_id>/reactions')
 api.add_resource(ReviewResource, '/incidents/<int:incident_id>/reviews')
-api.add_resource(NotificationResource, '/notifications')
+api.add_resource(NotificationResource, '/notifications', '/notifications/<int:notification_id>')
+api.add_resource(NotificationUnreadCountResource, '/notifications/unread_count')
+api.add_resource(EventStreamResource, '/events')
+api.add_resource(MediaResource, '/uploads/<path:filename>')
+api.add_resource(CacheStatsResource, '/cache/stats')
+api.add_resource(MetricsResource, '/metrics')
+api.add_resource(AdminStatsResource, '/admin/stats')
 api.add_resource(UserResource, '/users')
-api.add_resource(UserDetailResource, '/users/<int:user_id>')
+api.add_resource(UserDetailResource, '/users/<int:user_id>', '/users/<int:user_id>/ban')
 
 @app.after_request
 def after_request(response):
@@ -354,9 +773,114 @@ def after_request(response):
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
         response.headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE,OPTIONS'
         response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Vary'] = 'Origin'
+        response.vary.add('Origin')
     return response
 
+# CLI commands
+@app.cli.command('index-locations')
+def index_locations():
+    """Backfill the geohash spatial key for incidents that lack one"""
+    total = 0
+    while True:
+        rows = (db.session.query(IncidentReport.id, IncidentReport.latitude, IncidentReport.longitude)
+                .filter(IncidentReport.geohash.is_(None)).limit(1000).all())
+        if not rows:
+            break
+        db.session.bulk_update_mappings(IncidentReport, [
+            {'id': row.id, 'geohash': encode_geohash(row.latitude, row.longitude)}
+            for row in rows
+        ])
+        db.session.commit()
+        total += len(rows)
+    print(f"Indexed {total} incidents")
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters():
+    """Recompute incident reaction/comment/review counters from the source tables"""
+    def count(model, *criteria):
+        return (db.select(db.func.count(model.id))
+                .where(model.incident_id == IncidentReport.id, *criteria)
+                .scalar_subquery())
+
+    result = db.session.execute(db.update(IncidentReport).values(
+        like_count=count(IncidentReaction, IncidentReaction.reaction_type == 'like'),
+        share_count=count(IncidentReaction, IncidentReaction.reaction_type == 'share'),
+        comment_count=count(IncidentComment),
+        review_count=count(IncidentReview),
+        rating_total=(db.select(db.func.coalesce(db.func.sum(IncidentReview.rating), 0))
+                      .where(IncidentReview.incident_id == IncidentReport.id)
+                      .scalar_subquery()),
+    ))
+    db.session.commit()
+    print(f"Rebuilt counters for {result.rowcount} incidents")
+
+@app.cli.command('compact-notifications')
+@click.option('--days', default=None, type=int, help='Keep read notifications this many days')
+@click.option('--batch-size', default=5000, help='Rows deleted per transaction')
+def compact_notifications(days, batch_size):
+    """Delete read notifications older than the retention window"""
+    days = days if days is not None else app.config['NOTIFICATION_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        ids = [row.id for row in db.session.query(Notification.id)
+               .filter(Notification.read.is_(True), Notification.created_at < cutoff)
+               .limit(batch_size)]
+        if not ids:
+            break
+        Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    print(f"Deleted {total} read notifications older than {days} days")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the full-text index if missing and refill it from incidents and comments"""
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    print("Search index rebuilt")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    """Recompute the admin dashboard rollups from the incidents table"""
+    with db.engine.begin() as connection:
+        rebuild_rollups(connection)
+    print(f"Rebuilt {IncidentRollup.query.count()} rollup rows")
+
+@app.cli.command('sweep-media')
+def sweep_media():
+    """Delete files in UPLOAD_FOLDER that no image or video references"""
+    print(f"Removed {collector.sweep()} orphaned media files")
+
+@app.cli.command('archive-incidents')
+@click.option('--days', default=None, type=int, help='Archive resolved/rejected incidents untouched this many days')
+@click.option('--batch-size', default=None, type=int, help='Incidents moved per transaction')
+def archive_incidents_command(days, batch_size):
+    """Move old resolved and rejected incidents into the archive tables"""
+    days = days if days is not None else app.config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    total = 0
+    for ids in archive_incidents(days, batch_size):
+        total += len(ids)
+        incident_changed('incident.deleted', {'ids': ids})
+        print(f"Archived {total} incidents")
+    print(f"Archived {total} incidents older than {days} days")
+
+@app.cli.command('drain-ingest')
+def drain_ingest():
+    """Write every report still waiting in the ingest queue"""
+    total = 0
+    while (taken := ingest_queue.drain()):
+        total += taken
+    print(f"Drained {total} queued reports, {ingest_queue.depth()} left")
+
+@app.cli.command('prune-ingest')
+@click.option('--days', default=None, type=int, help='Keep receipts and failed submissions this many days')
+def prune_ingest(days):
+    """Drop old ingest receipts and failed submissions"""
+    days = days if days is not None else app.config['INGEST_RETENTION_DAYS']
+    print(f"Pruned {ingest_queue.prune(timedelta(days=days))} ingest receipts")
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -0,0 +1,415 @@
+"""HTTP API benchmark: scripted workloads against the full app.
+
+Fills a fresh SQLite database with benchmarks.datagen, then drives the
+real Flask app with virtual users, once through the in-process test client
+(no network, isolates the Python cost) and once through a threaded WSGI
+server over real sockets. Every request records latency, status, response
+size and the number of SQL statements it issued; the report gives
+p50/p95/p99, throughput and queries per endpoint and workload.
+
+    cd server && python -m benchmarks.api_bench --incidents 10000 --output before.json
+    cd server && python -m benchmarks.api_bench --compare before.json after.json
+
+Workloads:
+    feed          polling dashboards: feed pages, changes, search, unread count, detail
+    create        reporters posting incidents with an image attached
+    review        admins loading dashboard stats and moderating a page of incidents
+"""
+import argparse
+import http.client
+import io
+import json
+import logging
+import math
+import os
+import random
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.datagen import PASSWORD, ROADS, VEHICLES, describe, generate, random_point
+
+QUERIES_HEADER = 'X-Bench-Queries'
+ENDPOINT_HEADER = 'X-Bench-Endpoint'
+
+
+def make_png(rng, size=32):
+    """A small valid PNG with random pixels, so every upload hashes differently"""
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    rows = b''.join(b'\x00' + rng.randbytes(size * 3) for _ in range(size))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+# Transports: both return (status, headers, body) for one request
+
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, form=None, files=None):
+        kwargs = {'json': json}
+        if files:
+            data = dict(form or {})
+            data['files'] = [(io.BytesIO(body), name, content_type) for name, body, content_type in files]
+            kwargs = {'data': data, 'content_type': 'multipart/form-data'}
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.headers, response.get_data()
+
+
+class HttpSession:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.cookie = None
+
+    def request(self, method, path, json=None, form=None, files=None):
+        headers = {}
+        body = None
+        if files:
+            body, headers['Content-Type'] = _multipart(form or {}, files)
+        elif json is not None:
+            body = _json_bytes(json)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, response.headers, data
+
+
+def _json_bytes(value):
+    return json.dumps(value).encode()
+
+
+def _multipart(form, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in form.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for filename, body, content_type in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + body + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class VirtualUser:
+    """One logged-in client; records a sample for every request it makes"""
+
+    def __init__(self, session, user_id, rng, samples):
+        self.session = session
+        self.user_id = user_id
+        self.rng = rng
+        self.samples = samples
+        self.since = None
+        self.recording = True
+
+    def call(self, method, path, **kwargs):
+        start = time.perf_counter()
+        status, headers, body = self.session.request(method, path, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.recording:
+            queries = headers.get(QUERIES_HEADER)
+            self.samples.append({
+                'endpoint': headers.get(ENDPOINT_HEADER) or f'{method} {path.split("?")[0]}',
+                'ms': elapsed,
+                'status': status,
+                'bytes': len(body),
+                'queries': int(queries) if queries is not None else None,
+            })
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+    def login(self):
+        status, _ = self.call('POST', '/login', json={'email': f'user{self.user_id}@bench.ajali',
+                                                       'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'login failed for user{self.user_id}: {status}')
+
+
+# Workloads: one iteration of a scripted client
+
+def feed_workload(vu, ctx):
+    vu.call('GET', '/incidents?limit=20')
+    vu.call('GET', '/incidents?limit=20&fields=summary')
+    status, page = vu.call('GET', '/incidents/changes?limit=50' + (f'&since={vu.since}' if vu.since else ''))
+    if status == 200:
+        vu.since = page['since']
+    vu.call('GET', '/notifications/unread_count')
+    vu.call('GET', f'/incidents/{vu.rng.randint(1, ctx["incidents"])}')
+    term = vu.rng.choice(ROADS + VEHICLES).split()[0].lower()
+    vu.call('GET', f'/incidents/search?q={term}&limit=20&fields=summary')
+
+
+def create_workload(vu, ctx):
+    lat, lon = random_point(vu.rng)
+    form = {'description': describe(vu.rng), 'latitude': lat, 'longitude': lon}
+    status, incident = vu.call('POST', '/incidents', form=form,
+                               files=[('photo.png', make_png(vu.rng), 'image/png')])
+    if status == 201:
+        vu.call('GET', f'/incidents/{incident["id"]}')
+
+
+def review_workload(vu, ctx):
+    vu.call('GET', '/admin/stats')
+    status, page = vu.call('GET', '/incidents?limit=20&fields=id,status')
+    if status != 200:
+        return
+    for incident in page['incidents'][:10]:
+        new_status = vu.rng.choice(['under investigation', 'resolved', 'rejected'])
+        vu.call('PUT', f'/incidents/{incident["id"]}', json={'status': new_status})
+    vu.call('POST', f'/incidents/{page["incidents"][0]["id"]}/comments',
+            json={'content': 'Reviewed by the response team'})
+
+
+WORKLOADS = {
+    'feed': (feed_workload, 'reporters'),
+    'create': (create_workload, 'reporters'),
+    'review': (review_workload, 'admins'),
+}
+
+
+# Statistics
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(samples, wall_seconds):
+    ms = sorted(sample['ms'] for sample in samples)
+    queries = [sample['queries'] for sample in samples if sample['queries'] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'mean_ms': round(sum(ms) / len(ms), 2),
+        'mean_bytes': round(sum(sample['bytes'] for sample in samples) / len(samples)),
+        'mean_queries': round(sum(queries) / len(queries), 1) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+# Running
+
+def install_probes(app, db):
+    """Tag responses with the route and the number of SQL statements it issued"""
+    from flask import g, has_request_context, request
+    from sqlalchemy import event
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_query(*args, **kwargs):
+            if has_request_context():
+                g.bench_queries = g.get('bench_queries', 0) + 1
+
+    @app.after_request
+    def tag_response(response):
+        rule = request.url_rule.rule if request.url_rule else request.path
+        response.headers[ENDPOINT_HEADER] = f'{request.method} {rule}'
+        response.headers[QUERIES_HEADER] = str(g.get('bench_queries', 0))
+        return response
+
+
+def run_workload(name, make_session, ctx, args):
+    workload, role = WORKLOADS[name]
+    user_ids = ctx[role]
+    samples = []
+    lock = threading.Lock()
+
+    def virtual_user(index):
+        local = []
+        vu = VirtualUser(make_session(), user_ids[index % len(user_ids)],
+                         random.Random(args.seed * 1000 + index), local)
+        vu.recording = False
+        vu.login()
+        for _ in range(args.warmup):
+            workload(vu, ctx)
+        vu.recording = True
+        barrier.wait()
+        for _ in range(args.iterations):
+            workload(vu, ctx)
+        with lock:
+            samples.extend(local)
+
+    barrier = threading.Barrier(args.concurrency + 1)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(virtual_user, i) for i in range(args.concurrency)]
+        barrier.wait()
+        start = time.perf_counter()
+        for future in futures:
+            future.result()
+        wall = time.perf_counter() - start
+
+    endpoints = defaultdict(list)
+    for sample in samples:
+        endpoints[sample['endpoint']].append(sample)
+    return {
+        'wall_seconds': round(wall, 3),
+        'overall': summarize(samples, wall),
+        'endpoints': {endpoint: summarize(rows, wall) for endpoint, rows in sorted(endpoints.items())},
+    }
+
+
+def print_report(mode, name, result):
+    print(f"\n[{mode}] {name}: {result['overall']['requests']} requests in {result['wall_seconds']}s, "
+          f"{result['overall']['throughput_rps']} req/s")
+    print(f"  {'endpoint':<42} {'n':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7} {'sql':>5} {'bytes':>8}")
+    for endpoint, stats in result['endpoints'].items():
+        sql = '-' if stats['mean_queries'] is None else f"{stats['mean_queries']:g}"
+        print(f"  {endpoint:<42} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['throughput_rps']:>7.1f} "
+              f"{sql:>5} {stats['mean_bytes']:>8}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)['results']
+    with open(after_path) as f:
+        after = json.load(f)['results']
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return '     n/a'
+        return f'{(new - old) / old * 100:+7.1f}%'
+
+    for mode, workloads in after.items():
+        for name, result in workloads.items():
+            old_result = before.get(mode, {}).get(name)
+            if old_result is None:
+                continue
+            print(f"\n[{mode}] {name}")
+            print(f"  {'endpoint':<42} {'p50':>17} {'p95':>17} {'sql':>12}")
+            for endpoint, stats in result['endpoints'].items():
+                old = old_result['endpoints'].get(endpoint)
+                if old is None:
+                    continue
+                print(f"  {endpoint:<42} {stats['p50_ms']:>8.2f} {change(old['p50_ms'], stats['p50_ms'])}"
+                      f" {stats['p95_ms']:>8.2f} {change(old['p95_ms'], stats['p95_ms'])}"
+                      f" {stats['mean_queries'] if stats['mean_queries'] is not None else '-':>5}"
+                      f" {change(old['mean_queries'], stats['mean_queries'])}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--incidents', type=int, default=5000)
+    parser.add_argument('--comments', type=float, default=2.0)
+    parser.add_argument('--reactions', type=float, default=3.0)
+    parser.add_argument('--reviews', type=float, default=0.5)
+    parser.add_argument('--notifications', type=float, default=20.0)
+    parser.add_argument('--workloads', default=','.join(WORKLOADS))
+    parser.add_argument('--modes', default='client,wsgi', help='client (test client) and/or wsgi (threaded server)')
+    parser.add_argument('--concurrency', type=int, default=4, help='virtual users per workload')
+    parser.add_argument('--iterations', type=int, default=25, help='workload iterations per virtual user')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two saved result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # The app reads its configuration at import time
+    workdir = tempfile.mkdtemp(prefix='ajali-api-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    from app import app
+    from models.extensions import db
+    from models.user import User
+    from services.analytics import rebuild as rebuild_rollups
+    from werkzeug.serving import make_server
+
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with app.app_context():
+        db.create_all()
+        print(f"Generating {args.incidents} incidents for {args.users} users...")
+        totals = generate(args.users, args.incidents, args.comments, args.reactions,
+                          args.reviews, args.notifications, seed=args.seed)
+        print(totals)
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+        users = db.session.query(User.id, User.is_admin).order_by(User.id).all()
+    install_probes(app, db)
+
+    ctx = {
+        'incidents': totals['incidents'],
+        'admins': [user.id for user in users if user.is_admin],
+        'reporters': [user.id for user in users if not user.is_admin],
+    }
+
+    server = None
+    results = {}
+    try:
+        for mode in args.modes.split(','):
+            if mode == 'client':
+                make_session = lambda: TestClientSession(app)
+            elif mode == 'wsgi':
+                if server is None:
+                    server = make_server('127.0.0.1', 0, app, threaded=True)
+                    threading.Thread(target=server.serve_forever, daemon=True).start()
+                make_session = lambda: HttpSession('127.0.0.1', server.server_port)
+            else:
+                raise SystemExit(f'Unknown mode {mode}')
+            for name in args.workloads.split(','):
+                result = run_workload(name, make_session, ctx, args)
+                results.setdefault(mode, {})[name] = result
+                print_report(mode, name, result)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'api',
+                'revision': git_revision(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'parameters': vars(args),
+                'dataset': totals,
+                'results': results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Archival and export benchmark: archive throughput and export memory vs table size.
+
+Grows the incident table to each size in --sizes, with --archivable of the
+rows resolved long ago and each carrying --comments comments. Times
+services.archive moving those into the archive tables in --batch-size
+transactions, then streams the full export (live plus archived) as NDJSON
+and CSV, recording rows per second and the peak Python heap seen while
+doing so. Peak memory should stay flat as the tables grow.
+
+    cd server && python -m benchmarks.archive_bench --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, insert, select
+
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.incident_comment import IncidentComment
+from models.incident_archive import ArchivedIncidentReport
+from models.notification import Notification  # registers mappers User relates to
+from services.incident_feed import feed_query  # registers the incident child mappers
+from services.archive import archive_incidents
+from services.export import export_incidents
+from services.geo import encode_geohash
+from benchmarks.datagen import random_point
+
+
+def grow(target, current, rng, archivable, comments, batch=20000):
+    """Add incidents; the archivable share is resolved and a year old"""
+    now = datetime.utcnow()
+    while current < target:
+        incidents, thread = [], []
+        for i in range(min(batch, target - current)):
+            incident_id = current + i + 1
+            lat, lon = random_point(rng)
+            old = rng.random() < archivable
+            created = now - timedelta(days=rng.uniform(365, 730) if old else rng.uniform(0, 30))
+            incidents.append({'id': incident_id, 'description': 'benchmark incident',
+                              'latitude': lat, 'longitude': lon, 'geohash': encode_geohash(lat, lon),
+                              'status': 'resolved' if old else 'pending', 'created_at': created,
+                              'updated_at': created, 'user_id': 1, 'comment_count': comments})
+            thread.extend({'content': 'benchmark comment', 'created_at': created,
+                           'user_id': 1, 'incident_id': incident_id} for _ in range(comments))
+        db.session.execute(insert(IncidentReport.__table__), incidents)
+        if thread:
+            db.session.execute(insert(IncidentComment.__table__), thread)
+        db.session.commit()
+        current += len(incidents)
+    return current
+
+
+def count(model):
+    return db.session.scalar(select(func.count()).select_from(model))
+
+
+def export(fmt):
+    """(rows/s, peak heap KiB) for one full export"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    lines = 0
+    for chunk in export_incidents(fmt, include_archived=True):
+        lines += chunk.count('\n')
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(lines / elapsed), round(peak / 1024)
+
+
+def run(sizes, archivable, comments, batch_size, seed):
+    rng = random.Random(seed)
+    results = []
+    current = 0
+    for size in sizes:
+        current = grow(size, current, rng, archivable, comments)
+        start = time.perf_counter()
+        moved = sum(len(ids) for ids in archive_incidents(180, batch_size))
+        elapsed = time.perf_counter() - start
+        ndjson_rate, ndjson_peak = export('ndjson')
+        csv_rate, csv_peak = export('csv')
+        row = {'incidents': size, 'archived': moved,
+               'archive_per_s': round(moved / elapsed) if moved else 0,
+               'hot': count(IncidentReport), 'cold': count(ArchivedIncidentReport),
+               'ndjson_rows_per_s': ndjson_rate, 'ndjson_peak_kib': ndjson_peak,
+               'csv_rows_per_s': csv_rate, 'csv_peak_kib': csv_peak}
+        results.append(row)
+        print(f"{size:>9} incidents  archived {moved:>8} at {row['archive_per_s']:>6}/s  "
+              f"hot {row['hot']:>8} cold {row['cold']:>8}  "
+              f"ndjson {ndjson_rate:>7} rows/s peak {ndjson_peak:>6}KiB  "
+              f"csv {csv_rate:>7} rows/s peak {csv_peak:>6}KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--archivable', type=float, default=0.8, help='share of rows old and resolved')
+    parser.add_argument('--comments', type=int, default=2, help='comments per incident')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ajali-archive-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@ajali.com', password_hash='x'))
+        db.session.commit()
+        sizes = [int(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.archivable, args.comments, args.batch_size, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'archive', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Ingest duplicate-detection benchmark: cluster lookup cost vs table size.
+
+Grows the incident and cluster tables to each size in --sizes, spreading
+history over --days but putting --surge of the rows inside the duplicate
+window, as during a major event. Then times the lookup services.clustering
+runs for every new report against the obvious alternative: a distance scan
+over incidents from the window, found through the created_at index. The
+scan grows with the surge; the geohash/time lookup should stay flat.
+
+    cd server && python -m benchmarks.cluster_bench --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.incident_cluster import CELL_PRECISION, IncidentCluster
+from models.notification import Notification  # registers mappers User relates to
+from services.incident_feed import feed_query  # registers the incident child mappers
+from services.clustering import find_cluster
+from services.geo import distance_km, encode_geohash
+from benchmarks.datagen import random_point
+
+
+def grow(target, current, rng, days, surge, window, batch=20000):
+    """Add one incident and one single-report cluster per row, like ingest does"""
+    now = datetime.utcnow()
+    window_seconds = window.total_seconds()
+    while current < target:
+        clusters, incidents = [], []
+        for i in range(min(batch, target - current)):
+            lat, lon = random_point(rng)
+            age = rng.uniform(0, window_seconds) if rng.random() < surge else rng.uniform(0, days * 86400)
+            created = now - timedelta(seconds=age)
+            geohash = encode_geohash(lat, lon)
+            clusters.append({'id': current + i + 1, 'latitude': lat, 'longitude': lon,
+                             'cell': geohash[:CELL_PRECISION],
+                             'report_count': 1, 'first_reported_at': created, 'last_reported_at': created})
+            incidents.append({'description': 'benchmark incident', 'latitude': lat, 'longitude': lon,
+                              'geohash': geohash, 'status': 'pending', 'created_at': created,
+                              'updated_at': created, 'user_id': 1, 'cluster_id': current + i + 1})
+        db.session.execute(insert(IncidentCluster.__table__), clusters)
+        db.session.execute(insert(IncidentReport.__table__), incidents)
+        db.session.commit()
+        current += len(incidents)
+    return current
+
+
+def timed(f, points, repeat):
+    samples = []
+    for _ in range(repeat):
+        for lat, lon in points:
+            start = time.perf_counter()
+            f(lat, lon)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(sizes, repeat, radius_km, window_minutes, days, surge, seed):
+    rng = random.Random(seed)
+    window = timedelta(minutes=window_minutes)
+    points = [random_point(rng) for _ in range(50)]
+
+    def indexed(lat, lon):
+        find_cluster(lat, lon, radius_km, datetime.utcnow() - window)
+
+    def scan(lat, lon):
+        (IncidentReport.query
+         .filter(IncidentReport.created_at >= datetime.utcnow() - window,
+                 distance_km(IncidentReport.latitude, IncidentReport.longitude, lat, lon) <= radius_km)
+         .order_by(distance_km(IncidentReport.latitude, IncidentReport.longitude, lat, lon))
+         .first())
+
+    results = []
+    current = 0
+    for size in sizes:
+        current = grow(size, current, rng, days, surge, window)
+        row = {'incidents': size, 'indexed_ms': round(timed(indexed, points, repeat), 3),
+               'scan_ms': round(timed(scan, points, repeat), 3)}
+        results.append(row)
+        print(f"{size:>9} incidents  cluster lookup {row['indexed_ms']:8.3f}ms  "
+              f"incident scan {row['scan_ms']:9.3f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--radius-km', type=float, default=0.3)
+    parser.add_argument('--window-minutes', type=int, default=30)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--surge', type=float, default=0.02, help='share of rows inside the window')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ajali-cluster-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@ajali.com', password_hash='x'))
+        db.session.commit()
+        sizes = [int(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.repeat, args.radius_km, args.window_minutes, args.days,
+                      args.surge, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'cluster', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Synthetic data for benchmarks: users, incidents and everything hanging off them.
+
+Rows are written with set-based INSERTs in batches and carry explicit ids,
+so millions of incidents can be generated without holding them in memory.
+Denormalized counters, geohashes and resolved_at are filled in as the real
+write paths would; the analytics rollups are not, so call
+services.analytics.rebuild() afterwards. Run inside an app context against
+an empty or benchmark-only database.
+
+    cd server && python -m benchmarks.datagen --users 1000 --incidents 100000 --database bench.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, insert
+from werkzeug.security import generate_password_hash
+
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.incident_comment import IncidentComment
+from models.incident_reaction import IncidentReaction
+from models.incident_review import IncidentReview
+from models.notification import Notification
+from services.geo import encode_geohash
+import services.incident_feed  # noqa: F401  registers the incident child mappers
+import services.search  # noqa: F401  creates the full-text index alongside the tables
+from services.analytics import rebuild as rebuild_rollups
+
+PASSWORD = 'bench'
+
+# Incidents cluster around towns, with a uniform background across Kenya
+CITIES = [(-1.2921, 36.8219), (-4.0435, 39.6682), (-0.0917, 34.7680),
+          (-0.3031, 36.0800), (0.5143, 35.2698), (-1.0332, 37.0693)]
+KENYA = (-4.7, 33.9, 5.0, 41.9)
+
+STATUSES = ['pending', 'under investigation', 'resolved', 'rejected']
+STATUS_WEIGHTS = [45, 20, 30, 5]
+
+VEHICLES = ['Bus', 'Matatu', 'Lorry', 'Boda boda', 'Tanker', 'Car', 'Tuk tuk']
+EVENTS = ['overturned', 'collided with a car', 'caught fire', 'hit a pedestrian',
+          'stuck in floodwater', 'blocking the road', 'lost control']
+ROADS = ['Thika road', 'Mombasa road', 'Waiyaki Way', 'Ngong road', 'Jogoo road',
+         'Nakuru highway', 'Kisumu bypass', 'Outer ring road']
+REMARKS = ['Police are on site', 'Traffic is building up', 'Ambulance needed urgently',
+           'Avoid this route', 'Road cleared now', 'Passengers evacuated',
+           'Still blocked an hour later', 'I saw this too']
+
+
+def random_point(rng):
+    if rng.random() < 0.8:
+        lat, lon = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.08), lon + rng.gauss(0, 0.08)
+    min_lat, min_lon, max_lat, max_lon = KENYA
+    return rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+
+
+def describe(rng):
+    return f"{rng.choice(VEHICLES)} {rng.choice(EVENTS)} on {rng.choice(ROADS)}"
+
+
+def _count(rng, mean):
+    """Small non-negative count averaging `mean`, skewed like real engagement"""
+    return int(rng.expovariate(1 / mean) + 0.5) if mean > 0 else 0
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+class Batcher:
+    """Buffers rows per table and flushes them with one INSERT per batch"""
+
+    def __init__(self, size):
+        self.size = size
+        self.rows = {}
+
+    def add(self, model, row):
+        rows = self.rows.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.size:
+            self.flush()
+
+    def flush(self):
+        # Tables flush in first-seen order, so parents land before children
+        for model, rows in self.rows.items():
+            if rows:
+                db.session.execute(insert(model.__table__), rows)
+                self.rows[model] = []
+
+
+def generate(users=100, incidents=1000, comments=2.0, reactions=3.0, reviews=0.5,
+             notifications=10.0, days=90, admins=None, seed=42, batch=5000, log=print):
+    """Insert a synthetic dataset and return a summary of what was written.
+
+    comments/reactions/reviews are mean counts per incident and
+    notifications the mean per user. Users are named user<N> with password
+    'bench'; the first `admins` of them (default 1 in 50) are admins.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    admins = max(1, users // 50) if admins is None else admins
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    out = Batcher(batch)
+    started = time.perf_counter()
+
+    first_user = _next_id(User)
+    user_ids = list(range(first_user, first_user + users))
+    for i, user_id in enumerate(user_ids):
+        out.add(User, {'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@bench.ajali',
+                       'password_hash': password_hash, 'is_admin': i < admins, 'is_banned': False,
+                       'created_at': now - timedelta(days=days + 1)})
+    out.flush()
+
+    totals = {'users': users, 'admins': admins, 'incidents': incidents,
+              'comments': 0, 'reactions': 0, 'reviews': 0, 'notifications': 0}
+    next_ids = {model: _next_id(model) for model in (IncidentComment, IncidentReaction, IncidentReview)}
+    first_incident = _next_id(IncidentReport)
+    span = days * 86400
+
+    for incident_id in range(first_incident, first_incident + incidents):
+        created_at = now - timedelta(seconds=rng.uniform(0, span))
+        lat, lon = random_point(rng)
+        counters = {'like_count': 0, 'share_count': 0, 'comment_count': 0,
+                    'review_count': 0, 'rating_total': 0}
+        children = []
+        last_activity = created_at
+
+        for _ in range(_count(rng, comments)):
+            at = created_at + timedelta(minutes=rng.uniform(1, 600))
+            children.append((IncidentComment, {'content': rng.choice(REMARKS), 'created_at': at}))
+            counters['comment_count'] += 1
+            last_activity = max(last_activity, at)
+        for _ in range(_count(rng, reactions)):
+            reaction_type = 'like' if rng.random() < 0.8 else 'share'
+            children.append((IncidentReaction, {'reaction_type': reaction_type, 'created_at': created_at}))
+            counters[f'{reaction_type}_count'] += 1
+        for _ in range(_count(rng, reviews)):
+            rating = rng.randint(1, 5)
+            children.append((IncidentReview, {'rating': rating, 'content': rng.choice(REMARKS),
+                                              'created_at': created_at}))
+            counters['review_count'] += 1
+            counters['rating_total'] += rating
+
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        resolved_at = None
+        if status == 'resolved':
+            resolved_at = min(created_at + timedelta(hours=rng.expovariate(1 / 6)), now)
+            last_activity = max(last_activity, resolved_at)
+        out.add(IncidentReport, {'id': incident_id, 'description': describe(rng),
+                                 'latitude': lat, 'longitude': lon, 'geohash': encode_geohash(lat, lon),
+                                 'status': status, 'resolved_at': resolved_at,
+                                 'created_at': created_at, 'updated_at': min(last_activity, now),
+                                 'user_id': rng.choice(user_ids), **counters})
+        for model, row in children:
+            row.update(id=next_ids[model], user_id=rng.choice(user_ids), incident_id=incident_id)
+            next_ids[model] += 1
+            out.add(model, row)
+        totals['comments'] += counters['comment_count']
+        totals['reactions'] += counters['like_count'] + counters['share_count']
+        totals['reviews'] += counters['review_count']
+
+        done = incident_id - first_incident + 1
+        if done % (batch * 10) == 0:
+            out.flush()
+            db.session.commit()
+            log(f"  {done} incidents")
+    out.flush()
+
+    for user_id in user_ids:
+        for _ in range(_count(rng, notifications)):
+            out.add(Notification, {'user_id': user_id, 'message': f"Update on {describe(rng)}",
+                                   'type': rng.choice(['info', 'success', 'warning']),
+                                   'read': rng.random() < 0.6,
+                                   'created_at': now - timedelta(seconds=rng.uniform(0, span))})
+            totals['notifications'] += 1
+    out.flush()
+    db.session.commit()
+
+    totals['seconds'] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL or path of a SQLite file to fill')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--incidents', type=int, default=1000)
+    parser.add_argument('--comments', type=float, default=2.0, help='mean comments per incident')
+    parser.add_argument('--reactions', type=float, default=3.0, help='mean reactions per incident')
+    parser.add_argument('--reviews', type=float, default=0.5, help='mean reviews per incident')
+    parser.add_argument('--notifications', type=float, default=10.0, help='mean notifications per user')
+    parser.add_argument('--days', type=int, default=90, help='spread incidents over this many days')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else 'sqlite:///' + os.path.abspath(args.database)
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=url, SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        totals = generate(args.users, args.incidents, args.comments, args.reactions, args.reviews,
+                          args.notifications, args.days, seed=args.seed)
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+    print(totals)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Spatial query benchmark: geohash-indexed radius/bbox lookups vs a full scan.
+
+Grows an incident table to each size in --sizes and times the same radius
+and bounding-box queries through services.geo (index-driven) and through a
+plain haversine scan over every row. Indexed time should stay roughly flat
+while the scan grows linearly with the table.
+
+    cd server && python -m benchmarks.geo_bench --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.notification import Notification  # registers mappers User relates to
+from services.incident_feed import feed_query  # registers the incident child mappers
+from services.geo import encode_geohash, bbox_filter, radius_filter, distance_km
+from benchmarks.datagen import CITIES, random_point
+
+
+def grow(target, current, rng, batch=20000):
+    now = datetime.utcnow()
+    while current < target:
+        rows = []
+        for _ in range(min(batch, target - current)):
+            lat, lon = random_point(rng)
+            rows.append({'description': 'benchmark incident', 'latitude': lat,
+                         'longitude': lon, 'geohash': encode_geohash(lat, lon),
+                         'status': 'pending', 'created_at': now, 'updated_at': now,
+                         'user_id': 1})
+        db.session.execute(insert(IncidentReport.__table__), rows)
+        db.session.commit()
+        current += len(rows)
+    return current
+
+
+def timed(query, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = query.count()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), count
+
+
+def run(sizes, repeat, radius_km, seed):
+    rng = random.Random(seed)
+    lat, lon = CITIES[0]
+    box = (lat - 0.02, lon - 0.02, lat + 0.02, lon + 0.02)
+    queries = {
+        'radius_indexed': lambda: IncidentReport.query.filter(
+            radius_filter(IncidentReport, lat, lon, radius_km)),
+        'radius_scan': lambda: IncidentReport.query.filter(
+            distance_km(IncidentReport.latitude, IncidentReport.longitude, lat, lon) <= radius_km),
+        'bbox_indexed': lambda: IncidentReport.query.filter(bbox_filter(IncidentReport, *box)),
+        'bbox_scan': lambda: IncidentReport.query.filter(
+            IncidentReport.latitude.between(box[0], box[2]),
+            IncidentReport.longitude.between(box[1], box[3])),
+    }
+
+    results = []
+    current = 0
+    for size in sizes:
+        current = grow(size, current, rng)
+        row = {'incidents': size}
+        for name, build in queries.items():
+            row[f'{name}_ms'], row[f'{name}_matches'] = timed(build(), repeat)
+        results.append(row)
+        print(f"{size:>9} incidents  "
+              f"radius {row['radius_indexed_ms']:8.2f}ms indexed / {row['radius_scan_ms']:9.2f}ms scan  "
+              f"bbox {row['bbox_indexed_ms']:8.2f}ms indexed / {row['bbox_scan_ms']:9.2f}ms scan  "
+              f"({row['radius_indexed_matches']} in radius)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--radius-km', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ajali-geo-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@ajali.com', password_hash='x'))
+        db.session.commit()
+        sizes = [int(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.repeat, args.radius_km, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'geo', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
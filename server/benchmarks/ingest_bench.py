@@ -0,0 +1,140 @@
+"""Surge ingest benchmark: per-request commits vs the durable ingest queue.
+
+Fills a fresh SQLite database with benchmarks.datagen, then has
+--concurrency reporters post --reports incidents each (with a small image)
+to a threaded WSGI server as fast as they can, first on the default path
+that creates every incident in its own transaction, then with
+INGEST_QUEUE on. Reports acknowledgement latency (p50/p95/p99), accepted
+reports per second and, for the queue, how long until every report is
+written, which gives the end-to-end throughput of the group-committing
+writer. Admin notifications, media processing and event fan-out run as
+they do in production, so their writes compete for the lock too.
+
+    cd server && python -m benchmarks.ingest_bench --concurrency 32 --reports 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.api_bench import HttpSession, make_png, percentile
+from benchmarks.datagen import PASSWORD, describe, generate, random_point
+
+
+def reporter(port, user_id, reports, seed):
+    """Log in and post `reports` incidents; returns (ms, status) per post"""
+    rng = random.Random(seed)
+    session = HttpSession('127.0.0.1', port)
+    status, _, _ = session.request('POST', '/login', json={'email': f'user{user_id}@bench.ajali',
+                                                           'password': PASSWORD})
+    if status != 200:
+        raise RuntimeError(f'login failed for user{user_id}: {status}')
+    samples = []
+    for _ in range(reports):
+        lat, lon = random_point(rng)
+        form = {'description': describe(rng), 'latitude': lat, 'longitude': lon}
+        start = time.perf_counter()
+        status, _, _ = session.request('POST', '/incidents', form=form,
+                                       files=[('photo.png', make_png(rng), 'image/png')])
+        samples.append(((time.perf_counter() - start) * 1000, status))
+    return samples
+
+
+def surge(port, reporters, args):
+    with ThreadPoolExecutor(max_workers=len(reporters)) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(reporter, port, user_id, args.reports, args.seed + i)
+                   for i, user_id in enumerate(reporters)]
+        samples = [sample for future in futures for sample in future.result()]
+        wall = time.perf_counter() - start
+    return samples, wall, start
+
+
+def summarize(samples, wall):
+    ms = sorted(ms for ms, status in samples if status < 400)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status in samples if status >= 400),
+        'accepted_per_s': round(len(ms) / wall, 1),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--incidents', type=int, default=10000, help='incidents already in the database')
+    parser.add_argument('--concurrency', type=int, default=32, help='simultaneous reporters')
+    parser.add_argument('--reports', type=int, default=20, help='reports posted by each reporter')
+    parser.add_argument('--modes', default='direct,queue')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time
+    workdir = tempfile.mkdtemp(prefix='ajali-ingest-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    from app import app
+    from models.extensions import db
+    from models.user import User
+    from models.incident_report import IncidentReport
+    from services.ingest import ingest_queue
+    from werkzeug.serving import make_server
+
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    ingest_queue.path = os.path.join(workdir, 'ingest-queue.db')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with app.app_context():
+        db.create_all()
+        generate(args.users, args.incidents, 1.0, 1.0, 0.2, 5.0, seed=args.seed)
+        reporters = [user_id for user_id, in db.session.query(User.id)
+                     .filter(User.is_admin.is_(False)).order_by(User.id).limit(args.concurrency)]
+
+    def incident_count():
+        with app.app_context():
+            count = IncidentReport.query.count()
+            db.session.remove()
+            return count
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {}
+    try:
+        for mode in args.modes.split(','):
+            ingest_queue.enabled = mode == 'queue'
+            before = incident_count()
+            samples, wall, start = surge(server.server_port, reporters, args)
+            row = summarize(samples, wall)
+            if mode == 'queue':
+                while ingest_queue.depth():
+                    time.sleep(0.01)
+                row['written_s'] = round(time.perf_counter() - start, 3)
+            else:
+                row['written_s'] = round(wall, 3)
+            written = incident_count() - before
+            row['written_per_s'] = round(written / row['written_s'], 1)
+            results[mode] = row
+            print(f"{mode:>6}: {row['requests']} posts, {row['errors']} errors, "
+                  f"ack p50 {row['p50_ms']:.1f}ms p95 {row['p95_ms']:.1f}ms p99 {row['p99_ms']:.1f}ms, "
+                  f"{row['accepted_per_s']} accepted/s, {written} written in {row['written_s']}s "
+                  f"({row['written_per_s']}/s)")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'ingest', 'parameters': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Admin stats benchmark: rollup reads vs on-the-fly aggregation.
+
+Grows a synthetic incident table to each size in --sizes, rebuilds the
+rollups (the backfill cost) and then times GET /admin/stats' data two ways:
+services.analytics.snapshot(), which reads the bounded rollup table, and
+the same numbers computed with GROUP BY queries over every incident. The
+two results are compared so the benchmark also checks the rollups.
+
+    cd server && python -m benchmarks.stats_bench --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.analytics import (CELL_PRECISION, DAY_FORMAT, HOUR_FORMAT, day_bucket, heatmap,
+                                hour_bucket, rebuild, seconds_between, snapshot, time_series)
+from benchmarks.datagen import generate
+
+
+def live_snapshot(hours=48, days=30, now=None):
+    """snapshot() computed straight from incident_reports"""
+    now = now or datetime.utcnow()
+    first_hour = (now - timedelta(hours=hours - 1)).replace(minute=0, second=0, microsecond=0)
+    first_day = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    session = db.session
+
+    by_status = dict(session.query(IncidentReport.status, func.count())
+                     .group_by(IncidentReport.status).all())
+    hour = hour_bucket(IncidentReport.created_at)
+    by_hour = dict(session.query(hour, func.count())
+                   .filter(IncidentReport.created_at >= first_hour).group_by(hour).all())
+    day = day_bucket(IncidentReport.created_at)
+    by_day = dict(session.query(day, func.count())
+                  .filter(IncidentReport.created_at >= first_day).group_by(day).all())
+    cell = func.substr(IncidentReport.geohash, 1, CELL_PRECISION)
+    cells = session.query(cell, func.count()).group_by(cell).all()
+    resolved, total = session.query(
+        func.count(), func.sum(seconds_between(IncidentReport.created_at, IncidentReport.resolved_at))
+    ).filter(IncidentReport.status == 'resolved', IncidentReport.resolved_at.isnot(None)).one()
+
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'by_hour': time_series(by_hour, now, hours, timedelta(hours=1), HOUR_FORMAT),
+        'by_day': time_series(by_day, now, days, timedelta(days=1), DAY_FORMAT),
+        'cells': heatmap({key: count for key, count in cells if key}),
+        'resolution': {
+            'resolved': resolved,
+            'mean_seconds': round(total / resolved, 1) if resolved else None,
+        },
+    }
+
+
+def timed(f, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expire_all()
+        start = time.perf_counter()
+        result = f()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def run(sizes, repeat, seed):
+    results = []
+    current = 0
+    now = datetime.utcnow()
+    for size in sizes:
+        generate(users=20, incidents=size - current, comments=0, reactions=0, reviews=0,
+                 notifications=0, seed=seed + current, log=lambda message: None)
+        current = size
+
+        start = time.perf_counter()
+        with db.engine.begin() as connection:
+            rebuild(connection)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+
+        rollup_ms, from_rollups = timed(lambda: snapshot(now=now), repeat)
+        live_ms, from_scan = timed(lambda: live_snapshot(now=now), repeat)
+        # Means are summed in a different order, so allow float noise
+        mean = lambda s: s['resolution']['mean_seconds'] or 0
+        consistent = (abs(mean(from_rollups) - mean(from_scan)) < 1 and
+                      {**from_rollups, 'resolution': None} == {**from_scan, 'resolution': None})
+
+        row = {'incidents': size, 'rebuild_ms': round(rebuild_ms, 1), 'rollup_ms': round(rollup_ms, 2),
+               'live_ms': round(live_ms, 2), 'consistent': consistent}
+        results.append(row)
+        print(f"{size:>9} incidents  rollups {rollup_ms:8.2f}ms  live {live_ms:10.2f}ms  "
+              f"rebuild {rebuild_ms:10.1f}ms  {'consistent' if consistent else 'MISMATCH'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ajali-stats-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        sizes = [int(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'stats', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Wire format benchmark: bytes and encode time for a large incident feed.
+
+Fills a fresh SQLite database with benchmarks.datagen, serializes the
+newest --incidents incidents the way GET /incidents does, then encodes
+that payload every way services.wire can send it: Flask's default JSON
+encoder (the old path), msgspec JSON and MessagePack, each nested and in
+the normalized shape with users in a side table, and each uncompressed,
+gzipped and brotli-compressed. Times are medians over --repeat runs and
+include normalization and compression; normalization rewrites the payload
+in place, so every run gets a fresh copy made outside the timed section.
+
+    cd server && python -m benchmarks.wire_bench --incidents 10000
+"""
+import argparse
+import copy
+import gzip
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.notification import Notification  # registers mappers User relates to
+from services.incident_feed import feed_query, serialize_incidents
+from services.wire import MSGPACK, brotli, encode, normalize
+from benchmarks.datagen import generate
+
+
+def timed(f, repeat, setup=lambda: None):
+    samples = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        result = f(arg)
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def run(app, payload, repeat, gzip_level, brotli_quality):
+    stdlib = DefaultJSONProvider(app)
+    encoders = {
+        'json (flask default)': lambda p: stdlib.dumps(p).encode(),
+        'json (msgspec)': lambda p: encode(p),
+        'msgpack': lambda p: encode(p, MSGPACK),
+    }
+    compressions = {'none': lambda data: data,
+                    f'gzip-{gzip_level}': lambda data: gzip.compress(data, compresslevel=gzip_level)}
+    if brotli:
+        compressions[f'br-{brotli_quality}'] = lambda data: brotli.compress(data, quality=brotli_quality)
+
+    results = []
+    print(f"{'encoding':<22} {'shape':<11} {'compression':<11} {'bytes':>11} {'encode ms':>10}")
+    for name, encoder in encoders.items():
+        for shape in ('nested', 'normalized'):
+            shaped = (lambda p: p) if shape == 'nested' else normalize
+            for compression, compress in compressions.items():
+                data, ms = timed(lambda p: compress(encoder(shaped(p))), repeat,
+                                 setup=lambda: copy.deepcopy(payload))
+                row = {'encoding': name, 'shape': shape, 'compression': compression,
+                       'bytes': len(data), 'ms': round(ms, 2)}
+                results.append(row)
+                print(f"{name:<22} {shape:<11} {compression:<11} {len(data):>11,} {ms:>10.2f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--incidents', type=int, default=10000)
+    parser.add_argument('--comments', type=float, default=3.0)
+    parser.add_argument('--reviews', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--gzip-level', type=int, default=6)
+    parser.add_argument('--brotli-quality', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ajali-wire-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        generate(args.users, args.incidents, args.comments, 1.0, args.reviews, 0, seed=args.seed)
+        start = time.perf_counter()
+        incidents = feed_query().order_by(IncidentReport.created_at.desc()).all()
+        payload = serialize_incidents(incidents)
+        print(f"Serialized {len(payload)} incidents in {(time.perf_counter() - start) * 1000:.0f}ms\n")
+        results = run(app, payload, args.repeat, args.gzip_level, args.brotli_quality)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'wire', 'parameters': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
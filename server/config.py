@@ -6,6 +6,19 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'ajali-2'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ajali.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database engine tuning, see services/database.py
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms a writer waits for the lock
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # durable enough under WAL
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+    DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+
+    # Optional read replica for read-only handlers; a user's reads stay on the
+    # primary for this many seconds after their own write
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 10))
     
     # Session configuration
     SESSION_TYPE = 'filesystem'
@@ -21,11 +34,66 @@ class Config:
     CORS_ALLOW_HEADERS = ["Content-Type", "Authorization"]
     CORS_EXPOSE_HEADERS = ["Content-Range", "X-Content-Range"]
     
+    # Push events (unset keeps the in-process broker)
+    EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL')
+
+    # Notification fan-out: bursts arriving within this many seconds share one transaction
+    NOTIFICATION_BATCH_WINDOW = 0.25
+    NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 30))  # read ones, see `flask compact-notifications`
+
+    # Reports this close to an open cluster, within this many minutes of its
+    # latest report, are treated as duplicates at ingest
+    DUPLICATE_RADIUS_KM = float(os.environ.get('DUPLICATE_RADIUS_KM', 0.3))
+    DUPLICATE_WINDOW_MINUTES = int(os.environ.get('DUPLICATE_WINDOW_MINUTES', 30))
+
+    # Resolved and rejected incidents untouched this long move to the archive
+    # tables, see `flask archive-incidents`
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+
+    # Surge mode: POST /incidents queues reports durably and answers 202; one
+    # writer creates them in group-committed batches (see services/ingest.py)
+    INGEST_QUEUE = os.environ.get('INGEST_QUEUE') == '1'
+    INGEST_QUEUE_PATH = os.environ.get('INGEST_QUEUE_PATH')  # default: instance/ingest-queue.db
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 200))
+    INGEST_BATCH_WINDOW = 0.05  # seconds the writer waits for a burst to build up
+    INGEST_MAX_PENDING = int(os.environ.get('INGEST_MAX_PENDING', 5000))  # beyond this, 503 + Retry-After
+    INGEST_RETENTION_DAYS = 7  # receipts and failed submissions, see `flask prune-ingest`
+
+    # GET /incidents/changes re-reads this far behind a sync token, so writes
+    # that commit after their updated_at was passed are still delivered
+    CHANGES_OVERLAP_SECONDS = float(os.environ.get('CHANGES_OVERLAP_SECONDS', 5))
+
+    # Incident response cache (unset URL keeps the in-process LRU)
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_MAX_ENTRIES = 256
+
+    # Response compression: bodies this large or larger are brotli- or
+    # gzip-encoded for clients that accept it (see services/wire.py)
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+
     # File upload configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))  # background post-processing threads
+    MEDIA_PROCESSES = int(os.environ.get('MEDIA_PROCESSES', 2))  # thumbnail/transcode worker processes
+    MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', 3600))  # never collect files touched more recently
+
+    # Let a front proxy transfer media bytes after Flask authorizes the request
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')  # nginx internal location, e.g. /protected-uploads/
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'  # Apache/lighttpd
     
+    # Seconds a worker may reuse a loaded user for auth checks
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+
+    # Instrumentation: requests slower than this are logged with their top queries
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # bearer token for /metrics, open when unset
+
     # Admin configuration
     ADMIN_EMAIL = 'admin@ajali.com'
     ADMIN_PASSWORD = 'admin123'
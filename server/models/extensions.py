@@ -1,9 +1,23 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as BaseSession
 from flask_session import Session
 
+
+class RoutingSession(BaseSession):
+    """Session that reads from the 'replica' bind inside read-only handlers"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_replica'):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 server_session = Session()
 
 # Export both extensions
-__all__ = ['db', 'server_session']
\ No newline at end of file
+__all__ = ['db', 'server_session']
@@ -0,0 +1,40 @@
+from .extensions import db
+from .incident_report import IncidentReport
+from .incident_image import IncidentImage
+from .incident_video import IncidentVideo
+from .incident_comment import IncidentComment
+from .incident_reaction import IncidentReaction
+from .incident_review import IncidentReview
+
+
+def _mirror(model, parent_key, *extra):
+    """A cold-storage copy of `model`'s table with the same columns.
+
+    No foreign keys, so archived rows never block deletes elsewhere, and a
+    single index on the incident they belong to, which is all the by-id
+    lookups need. See services/archive.py.
+    """
+    source = model.__table__
+    columns = [db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+               for c in source.columns]
+    table = db.Table(f'archived_{source.name}', *columns, *extra,
+                     db.Index(f'ix_archived_{source.name}_{parent_key}', parent_key))
+    return type(f'Archived{model.__name__}', (db.Model,), {'__table__': table})
+
+
+ArchivedIncidentReport = _mirror(IncidentReport, 'user_id', db.Column('archived_at', db.DateTime))
+ArchivedIncidentImage = _mirror(IncidentImage, 'report_id')
+ArchivedIncidentVideo = _mirror(IncidentVideo, 'report_id')
+ArchivedIncidentComment = _mirror(IncidentComment, 'incident_id')
+ArchivedIncidentReaction = _mirror(IncidentReaction, 'incident_id')
+ArchivedIncidentReview = _mirror(IncidentReview, 'incident_id')
+
+# Live model -> archive model; children come first so they are copied before their incident
+ARCHIVES = {
+    IncidentComment: ArchivedIncidentComment,
+    IncidentReaction: ArchivedIncidentReaction,
+    IncidentReview: ArchivedIncidentReview,
+    IncidentImage: ArchivedIncidentImage,
+    IncidentVideo: ArchivedIncidentVideo,
+    IncidentReport: ArchivedIncidentReport,
+}
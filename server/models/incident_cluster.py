@@ -0,0 +1,44 @@
+from .extensions import db
+from datetime import datetime
+from services.geo import encode_geohash
+
+CELL_PRECISION = 6  # ~1.2 x 0.6 km, comfortably larger than the duplicate radius
+
+class IncidentCluster(db.Model):
+    """Reports of what is probably the same event, grouped at ingest.
+
+    Anchored at the first report's coordinates; later reports within
+    DUPLICATE_RADIUS_KM of the anchor and DUPLICATE_WINDOW_MINUTES of the
+    cluster's latest report join it. See services/clustering.py.
+    """
+    __tablename__ = 'incident_clusters'
+    __table_args__ = (
+        # Ingest looks up recently active clusters in the cells around a point:
+        # equality on the cell, then a range on time, so old clusters are never read
+        db.Index('ix_incident_clusters_cell_last', 'cell', 'last_reported_at'),
+        # The admin listing walks (last_reported_at, id) newest first
+        db.Index('ix_incident_clusters_last_id', 'last_reported_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    cell = db.Column(db.String(CELL_PRECISION))  # geohash prefix of the anchor
+    report_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    first_reported_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_reported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'report_count': self.report_count,
+            'first_reported_at': self.first_reported_at.isoformat(),
+            'last_reported_at': self.last_reported_at.isoformat()
+        }
+
+
+@db.event.listens_for(IncidentCluster, 'before_insert')
+def _index_location(mapper, connection, target):
+    target.cell = encode_geohash(target.latitude, target.longitude, CELL_PRECISION)
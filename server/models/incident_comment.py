@@ -3,6 +3,14 @@ from datetime import datetime
 
 class IncidentComment(db.Model):
     __tablename__ = 'incident_comments'
+    __table_args__ = (
+        # Thread pages and the per-incident preview walk (created_at, id) newest first
+        db.Index('ix_incident_comments_incident_created', 'incident_id', 'created_at'),
+        # Per-user last activity, and deleting a user's comments
+        db.Index('ix_incident_comments_user_created', 'user_id', 'created_at'),
+        # Never reuse ids on SQLite: archived rows keep theirs, see models/incident_archive.py
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -10,6 +18,9 @@ class IncidentComment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     incident_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False)
 
+    # Relationships
+    user = db.relationship('User', lazy=True)
+
     def to_dict(self):
         return {
             'id': self.id,
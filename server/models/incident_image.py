@@ -3,16 +3,27 @@ from datetime import datetime
 
 class IncidentImage(db.Model):
     __tablename__ = 'incident_images'
+    # Never reuse ids on SQLite: archived rows keep theirs, see models/incident_archive.py
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = db.Column(db.Integer, primary_key=True)
     image_url = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), index=True)  # sha256, also the stored file name
+    thumbnail_url = db.Column(db.String(255))  # downscaled variant, set by the media pipeline
+    status = db.Column(db.String(20), default='processing')  # processing, ready, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    report_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
             'id': self.id,
             'image_url': self.image_url,
+            'thumbnail_url': self.thumbnail_url,
+            'status': self.status,
             'created_at': self.created_at.isoformat(),
             'report_id': self.report_id
-        }
\ No newline at end of file
+        }
+
+    @property
+    def filename(self):
+        return self.image_url
\ No newline at end of file
@@ -3,12 +3,18 @@ from datetime import datetime
 
 class IncidentReaction(db.Model):
     __tablename__ = 'incident_reactions'
+    __table_args__ = (
+        # Per-user last activity, and deleting a user's reactions
+        db.Index('ix_incident_reactions_user_created', 'user_id', 'created_at'),
+        # Never reuse ids on SQLite: archived rows keep theirs, see models/incident_archive.py
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     reaction_type = db.Column(db.String(20), nullable=False)  # 'like', 'share'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    incident_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
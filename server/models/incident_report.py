@@ -1,17 +1,45 @@
 from .extensions import db
 from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from services.geo import encode_geohash
+from .incident_cluster import IncidentCluster  # noqa: F401  target of cluster_id
+from .incident_comment import IncidentComment
+from .incident_review import IncidentReview
+
+PREVIEW_SIZE = 3  # comments/reviews inlined in the incident payload; the rest are paged
 
 class IncidentReport(db.Model):
     __tablename__ = 'incident_reports'
+    __table_args__ = (
+        # Keyset pagination of the feed walks (created_at, id) newest first
+        db.Index('ix_incident_reports_created_at_id', 'created_at', 'id'),
+        # The changes feed walks (updated_at, id) oldest first
+        db.Index('ix_incident_reports_updated_at_id', 'updated_at', 'id'),
+        # Per-user counts and last activity, and deleting a user's reports
+        db.Index('ix_incident_reports_user_created', 'user_id', 'created_at'),
+        # Never reuse ids on SQLite: archived rows keep theirs, see models/incident_archive.py
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.Text, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    geohash = db.Column(db.String(12), index=True)  # spatial index key, see services/geo.py
     status = db.Column(db.String(50), default='pending')  # pending, under investigation, rejected, resolved
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)  # set while status is 'resolved'
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    cluster_id = db.Column(db.Integer, db.ForeignKey('incident_clusters.id'), index=True)  # probable duplicates
+
+    # Denormalized counters, kept in step by touch() and rebuilt by `flask rebuild-counters`
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    share_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     images = db.relationship('IncidentImage', backref='incident', lazy=True, cascade='all, delete-orphan')
@@ -29,13 +57,96 @@ class IncidentReport(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'cluster_id': self.cluster_id,
             'user': self.user.to_dict(),
             'images': [image.to_dict() for image in self.images],
             'videos': [video.to_dict() for video in self.videos],
-            'comments': [comment.to_dict() for comment in self.comments],
+            'comments': [comment.to_dict() for comment in self.previews['comments']],
+            'comment_count': self.comment_count,
             'reactions': {
-                'like': len([r for r in self.reactions if r.reaction_type == 'like']),
-                'share': len([r for r in self.reactions if r.reaction_type == 'share'])
+                'like': self.like_count,
+                'share': self.share_count
             },
-            'reviews': [review.to_dict() for review in self.reviews]
-        }
\ No newline at end of file
+            'reviews': [review.to_dict() for review in self.previews['reviews']],
+            'review_stats': {
+                'count': self.review_count,
+                'average_rating': self.average_rating
+            }
+        }
+
+    # Newest comments and reviews by thread name, see load_previews()
+    _previews = None
+
+    @property
+    def previews(self):
+        if self._previews is None:
+            IncidentReport.load_previews([self])
+        return self._previews
+
+    @staticmethod
+    def load_previews(incidents, size=PREVIEW_SIZE):
+        """Attach the newest `size` comments and reviews to each incident.
+
+        One statement per thread for the whole batch: ROW_NUMBER() ranks
+        rows per incident inside a subquery restricted to these incidents,
+        so only the (incident_id, created_at) index ranges of the batch are
+        read however long the threads are. Authors load in one more batch.
+        """
+        if not incidents:
+            return
+        ids = [incident.id for incident in incidents]
+        for incident in incidents:
+            incident._previews = {'comments': [], 'reviews': []}
+        by_id = {incident.id: incident for incident in incidents}
+        for name, model in (('comments', IncidentComment), ('reviews', IncidentReview)):
+            ranked = select(
+                model.id,
+                func.row_number().over(
+                    partition_by=model.incident_id,
+                    order_by=(model.created_at.desc(), model.id.desc())
+                ).label('position')
+            ).where(model.incident_id.in_(ids)).subquery()
+            rows = (model.query.options(selectinload(model.user))
+                    .join(ranked, ranked.c.id == model.id)
+                    .filter(ranked.c.position <= size)
+                    .order_by(model.created_at.desc(), model.id.desc()))
+            for row in rows:
+                by_id[row.incident_id]._previews[name].append(row)
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_total / self.review_count, 2)
+
+    @staticmethod
+    def touch(incident_id, **counters):
+        """Bump updated_at, and any counters given as deltas, in a single UPDATE.
+
+        touch(5, like_count=1) is an atomic `like_count = like_count + 1`, so
+        concurrent reactions never lose an increment. updated_at moves so the
+        changes feed picks up child-row writes.
+        """
+        values = {'updated_at': datetime.utcnow()}
+        for name, delta in counters.items():
+            column = getattr(IncidentReport, name)
+            values[column] = column + delta
+        return IncidentReport.query.filter_by(id=incident_id).update(
+            values, synchronize_session=False
+        )
+
+
+@db.event.listens_for(IncidentReport, 'before_insert')
+@db.event.listens_for(IncidentReport, 'before_update')
+def _index_location(mapper, connection, target):
+    target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+@db.event.listens_for(IncidentReport, 'before_insert')
+@db.event.listens_for(IncidentReport, 'before_update')
+def _track_resolution(mapper, connection, target):
+    if target.status != 'resolved':
+        target.resolved_at = None
+    elif target.resolved_at is None:
+        target.resolved_at = datetime.utcnow()
@@ -0,0 +1,15 @@
+from .extensions import db
+
+class IncidentRollup(db.Model):
+    """One precomputed incident aggregate, maintained by services/analytics.py.
+
+    kind is 'status', 'hour', 'day', 'cell' or 'resolution'; key is the
+    status, the UTC bucket, the geohash prefix or 'all'. total holds the
+    summed pending-to-resolved seconds for the resolution row.
+    """
+    __tablename__ = 'incident_rollups'
+
+    kind = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total = db.Column(db.Float, nullable=False, default=0, server_default='0')
@@ -0,0 +1,16 @@
+from .extensions import db
+from datetime import datetime
+
+class IncidentTombstone(db.Model):
+    """Marker left behind by a deleted incident so sync clients can drop it"""
+    __tablename__ = 'incident_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    incident_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.incident_id,
+            'deleted_at': self.deleted_at.isoformat()
+        }
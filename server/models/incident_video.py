@@ -3,16 +3,29 @@ from datetime import datetime
 
 class IncidentVideo(db.Model):
     __tablename__ = 'incident_videos'
+    # Never reuse ids on SQLite: archived rows keep theirs, see models/incident_archive.py
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = db.Column(db.Integer, primary_key=True)
     video_url = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), index=True)  # sha256, also the stored file name
+    poster_url = db.Column(db.String(255))  # still frame, set by the media pipeline
+    preview_url = db.Column(db.String(255))  # short low-bitrate clip, set by the media pipeline
+    status = db.Column(db.String(20), default='processing')  # processing, ready, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    report_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('incident_reports.id'), nullable=False, index=True)
 
     def to_dict(self):
         return {
             'id': self.id,
             'video_url': self.video_url,
+            'poster_url': self.poster_url,
+            'preview_url': self.preview_url,
+            'status': self.status,
             'created_at': self.created_at.isoformat(),
             'report_id': self.report_id
-        }
\ No newline at end of file
+        }
+
+    @property
+    def filename(self):
+        return self.video_url
\ No newline at end of file
@@ -0,0 +1,14 @@
+from .extensions import db
+from datetime import datetime
+
+class IngestReceipt(db.Model):
+    """Incident created from a queued submission, written in the same transaction.
+
+    Lets the ingest writer skip submissions it already created when it
+    replays the queue after a crash, and answers status lookups by ticket.
+    """
+    __tablename__ = 'ingest_receipts'
+
+    ticket = db.Column(db.String(32), primary_key=True)
+    incident_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
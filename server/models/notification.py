@@ -3,6 +3,12 @@ from datetime import datetime
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Unread counts and unread-only inbox pages
+        db.Index('ix_notifications_user_read_created', 'user_id', 'read', 'created_at'),
+        # Keyset pages of the whole inbox, newest first
+        db.Index('ix_notifications_user_created_id', 'user_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(255), nullable=False)
@@ -22,12 +28,26 @@ class Notification(db.Model):
         }
 
     @staticmethod
-    def create_notification(user_id, message, type='info'):
+    def create_notification(user_id, message, type='info', commit=True):
+        """Create one notification; use services.notifications for audiences"""
         notification = Notification(
             user_id=user_id,
             message=message,
             type=type
         )
         db.session.add(notification)
-        db.session.commit()
-        return notification
\ No newline at end of file
+        if commit:
+            db.session.commit()
+        return notification
+
+    @staticmethod
+    def unread_count(user_id):
+        return Notification.query.filter_by(user_id=user_id, read=False).count()
+
+    @staticmethod
+    def mark_read(user_id, ids=None):
+        """Mark the user's notifications (all, or just `ids`) read in one UPDATE"""
+        query = Notification.query.filter_by(user_id=user_id, read=False)
+        if ids is not None:
+            query = query.filter(Notification.id.in_(ids))
+        return query.update({'read': True}, synchronize_session=False)
\ No newline at end of file
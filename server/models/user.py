@@ -3,6 +3,13 @@ from datetime import datetime
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # The admin directory walks (created_at, id) newest first
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+        # Case-insensitive prefix search, see services/users.py
+        db.Index('ix_users_username_lower', db.text('lower(username)')),
+        db.Index('ix_users_email_lower', db.text('lower(email)')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -11,6 +18,8 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     is_banned = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Part of the incidents cache watermark, since incidents embed their author
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     incidents = db.relationship('IncidentReport', backref='user', lazy=True)
@@ -0,0 +1,271 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, event, func, inspect, insert, literal, or_, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Float, String
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.incident_rollup import IncidentRollup
+from models.incident_archive import ArchivedIncidentReport
+from services.geo import geohash_center
+
+CELL_PRECISION = 4  # ~20x40km heatmap cells, a few thousand at most for Kenya
+HOUR_FORMAT = '%Y-%m-%dT%H'
+DAY_FORMAT = '%Y-%m-%d'
+
+# Columns an incident's rollup contributions depend on
+TRACKED = ('status', 'created_at', 'geohash', 'resolved_at')
+# connection.info key under which deferred() collects contributions
+_DEFERRED = 'analytics_deferred'
+
+
+# SQL counterparts of the Python bucketing, for rebuilds and live queries
+
+class hour_bucket(FunctionElement):
+    type = String()
+    inherit_cache = True
+
+
+class day_bucket(FunctionElement):
+    type = String()
+    inherit_cache = True
+
+
+class seconds_between(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(hour_bucket)
+def _compile_hour_bucket(element, compiler, **kw):
+    return f"strftime('{HOUR_FORMAT}', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(hour_bucket, 'postgresql')
+def _compile_hour_bucket_postgresql(element, compiler, **kw):
+    return f"""to_char({compiler.process(element.clauses, **kw)}, 'YYYY-MM-DD"T"HH24')"""
+
+
+@compiles(day_bucket)
+def _compile_day_bucket(element, compiler, **kw):
+    return f"strftime('{DAY_FORMAT}', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(day_bucket, 'postgresql')
+def _compile_day_bucket_postgresql(element, compiler, **kw):
+    return f"to_char({compiler.process(element.clauses, **kw)}, 'YYYY-MM-DD')"
+
+
+@compiles(seconds_between)
+def _compile_seconds_between(element, compiler, **kw):
+    start, end = (compiler.process(c, **kw) for c in element.clauses)
+    return f'((julianday({end}) - julianday({start})) * 86400.0)'
+
+
+@compiles(seconds_between, 'postgresql')
+def _compile_seconds_between_postgresql(element, compiler, **kw):
+    start, end = (compiler.process(c, **kw) for c in element.clauses)
+    return f'extract(epoch from ({end} - {start}))'
+
+
+# Incremental maintenance
+
+def contributions(status, created_at, geohash, resolved_at):
+    """The (kind, key, count, total) rollup rows one incident counts towards"""
+    rows = []
+    if status:
+        rows.append(('status', status, 1, 0.0))
+    if created_at:
+        rows.append(('hour', created_at.strftime(HOUR_FORMAT), 1, 0.0))
+        rows.append(('day', created_at.strftime(DAY_FORMAT), 1, 0.0))
+    if geohash:
+        rows.append(('cell', geohash[:CELL_PRECISION], 1, 0.0))
+    if status == 'resolved' and resolved_at and created_at:
+        rows.append(('resolution', 'all', 1, (resolved_at - created_at).total_seconds()))
+    return rows
+
+
+def apply(connection, added=(), removed=()):
+    """Add `added` and subtract `removed` contributions with one upsert.
+
+    Deltas are netted per rollup row first, so an update that leaves a
+    bucket unchanged writes nothing for it. Runs on the caller's
+    connection, inside the transaction that changed the incidents.
+    """
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for kind, key, count, total in rows:
+            current = deltas.get((kind, key), (0, 0.0))
+            deltas[(kind, key)] = (current[0] + sign * count, current[1] + sign * total)
+    rows = [{'kind': kind, 'key': key, 'count': count, 'total': total}
+            for (kind, key), (count, total) in deltas.items() if count or total]
+    if not rows:
+        return
+
+    table = IncidentRollup.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        upsert = (sqlite if dialect == 'sqlite' else postgresql).insert(table).values(rows)
+        connection.execute(upsert.on_conflict_do_update(
+            index_elements=['kind', 'key'],
+            set_={'count': table.c.count + upsert.excluded.count,
+                  'total': table.c.total + upsert.excluded.total}
+        ))
+        return
+    for row in rows:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.kind == row['kind'], table.c.key == row['key'])
+            .values(count=table.c.count + row['count'], total=table.c.total + row['total'])
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table).values(**row))
+
+
+@contextmanager
+def deferred(session):
+    """Fold the listeners' rollup changes for a block of flushes into one upsert.
+
+    For writers that insert many incidents per transaction: each flush only
+    records its contributions on the connection, and they are netted and
+    applied once when the block exits without an error.
+    """
+    connection = session.connection()
+    pending = connection.info[_DEFERRED] = ([], [])
+    try:
+        yield
+        session.flush()
+    finally:
+        connection.info.pop(_DEFERRED, None)
+    apply(connection, added=pending[0], removed=pending[1])
+
+
+def _record(connection, added=(), removed=()):
+    pending = connection.info.get(_DEFERRED)
+    if pending is None:
+        apply(connection, added, removed)
+        return
+    pending[0].extend(added)
+    pending[1].extend(removed)
+
+
+def _current(target):
+    return contributions(*(getattr(target, name) for name in TRACKED))
+
+
+def _previous(target):
+    state = inspect(target)
+    values = []
+    for name in TRACKED:
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(target, name))
+    return contributions(*values)
+
+
+@event.listens_for(IncidentReport, 'after_insert')
+def _incident_inserted(mapper, connection, target):
+    _record(connection, added=_current(target))
+
+
+@event.listens_for(IncidentReport, 'after_update')
+def _incident_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TRACKED):
+        _record(connection, added=_current(target), removed=_previous(target))
+
+
+@event.listens_for(IncidentReport, 'after_delete')
+def _incident_deleted(mapper, connection, target):
+    _record(connection, removed=_current(target))
+
+
+# Keep the old value of tracked columns around when they are assigned, so
+# after_update can subtract exactly what the row used to count towards
+for _name in TRACKED:
+    event.listen(getattr(IncidentReport, _name), 'set', lambda *args: None, active_history=True)
+
+
+# Reading and rebuilding
+
+def snapshot(hours=48, days=30, now=None):
+    """Everything GET /admin/stats serves, read from a bounded set of rows"""
+    now = now or datetime.utcnow()
+    first_hour = (now - timedelta(hours=hours - 1)).strftime(HOUR_FORMAT)
+    first_day = (now - timedelta(days=days - 1)).strftime(DAY_FORMAT)
+    rows = db.session.query(
+        IncidentRollup.kind, IncidentRollup.key, IncidentRollup.count, IncidentRollup.total
+    ).filter(or_(
+        IncidentRollup.kind.in_(('status', 'cell', 'resolution')),
+        and_(IncidentRollup.kind == 'hour', IncidentRollup.key >= first_hour),
+        and_(IncidentRollup.kind == 'day', IncidentRollup.key >= first_day),
+    )).all()
+
+    counts, totals = {}, {}
+    for row in rows:
+        if row.count:
+            counts.setdefault(row.kind, {})[row.key] = row.count
+            totals[(row.kind, row.key)] = row.total
+    by_status = counts.get('status', {})
+    resolved = counts.get('resolution', {}).get('all', 0)
+
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'by_hour': time_series(counts.get('hour', {}), now, hours, timedelta(hours=1), HOUR_FORMAT),
+        'by_day': time_series(counts.get('day', {}), now, days, timedelta(days=1), DAY_FORMAT),
+        'cells': heatmap(counts.get('cell', {})),
+        'resolution': {
+            'resolved': resolved,
+            'mean_seconds': round(totals[('resolution', 'all')] / resolved, 1) if resolved else None,
+        },
+    }
+
+
+def heatmap(counts):
+    """Grid cells with their centre point, for a heatmap layer"""
+    cells = []
+    for key, count in sorted(counts.items()):
+        lat, lon = geohash_center(key)
+        cells.append({'geohash': key, 'latitude': lat, 'longitude': lon, 'count': count})
+    return cells
+
+
+def time_series(counts, now, length, step, fmt):
+    """Contiguous oldest-first buckets ending at `now`, zero-filled"""
+    keys = [(now - step * i).strftime(fmt) for i in reversed(range(length))]
+    return [{'bucket': key, 'count': counts.get(key, 0)} for key in keys]
+
+
+def rebuild(connection):
+    """Recompute every rollup row from incident_reports with set-based queries.
+
+    Archived incidents still count, so the archive table is read too.
+    """
+    reports = union_all(*(
+        select(*(table.c[name] for name in TRACKED))
+        for table in (IncidentReport.__table__, ArchivedIncidentReport.__table__)
+    )).subquery()
+    table = IncidentRollup.__table__
+    count = func.count()
+    zero = literal(0.0)
+    hour, day = hour_bucket(reports.c.created_at), day_bucket(reports.c.created_at)
+    cell = func.substr(reports.c.geohash, 1, CELL_PRECISION)
+    queries = [
+        select(literal('status'), reports.c.status, count, zero)
+        .where(reports.c.status.isnot(None)).group_by(reports.c.status),
+        select(literal('hour'), hour, count, zero)
+        .where(reports.c.created_at.isnot(None)).group_by(hour),
+        select(literal('day'), day, count, zero)
+        .where(reports.c.created_at.isnot(None)).group_by(day),
+        select(literal('cell'), cell, count, zero)
+        .where(reports.c.geohash.isnot(None)).group_by(cell),
+        select(literal('resolution'), literal('all'), count,
+               func.coalesce(func.sum(seconds_between(reports.c.created_at, reports.c.resolved_at)), 0.0))
+        .where(reports.c.status == 'resolved', reports.c.resolved_at.isnot(None))
+        .having(count > 0),
+    ]
+    connection.execute(delete(table))
+    for query in queries:
+        connection.execute(insert(table).from_select(['kind', 'key', 'count', 'total'], query))
@@ -0,0 +1,182 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport, PREVIEW_SIZE
+from models.incident_image import IncidentImage
+from models.incident_video import IncidentVideo
+from models.incident_comment import IncidentComment
+from models.incident_review import IncidentReview
+from models.incident_archive import (ARCHIVES, ArchivedIncidentReport, ArchivedIncidentImage,
+                                     ArchivedIncidentVideo, ArchivedIncidentComment,
+                                     ArchivedIncidentReview)
+from services.media_gc import ARCHIVED_MEDIA_FILES
+from services.analytics import TRACKED, apply, contributions
+from services.moderation import delete_rows, release_clusters
+from services.pagination import paginate
+
+TERMINAL_STATUSES = ('resolved', 'rejected')
+
+
+def _parent_key(table):
+    """Column tying a row of `table` to its incident"""
+    for name in ('incident_id', 'report_id', 'id'):
+        if name in table.c:
+            return table.c[name]
+
+
+def archivable(cutoff, limit, statuses=TERMINAL_STATUSES):
+    """Ids of up to `limit` terminal incidents untouched since `cutoff`, oldest first.
+
+    Any write to an incident or its threads bumps updated_at, so an old
+    report that is still being discussed stays hot. Walks the
+    (updated_at, id) index.
+    """
+    return list(db.session.scalars(
+        select(IncidentReport.id)
+        .where(IncidentReport.updated_at < cutoff, IncidentReport.status.in_(statuses))
+        .order_by(IncidentReport.updated_at, IncidentReport.id)
+        .limit(limit)
+    ))
+
+
+def archive_batch(ids):
+    """Move incidents and their child rows into the archive tables.
+
+    Each table is copied with one INSERT ... SELECT and then emptied through
+    services.moderation.delete_rows(), which also leaves tombstones for sync
+    clients and takes the incidents out of the search index. The dashboard
+    rollups and cluster counts keep counting them: archiving is not a
+    delete. Media files stay on disk: the archive rows still reference
+    them. Returns (id, user_id) pairs; the caller commits.
+    """
+    if not ids:
+        return []
+    now = datetime.utcnow()
+    for model, archived in ARCHIVES.items():
+        source = model.__table__
+        names = [column.name for column in source.columns]
+        rows = select(*source.columns).where(_parent_key(source).in_(ids))
+        if model is IncidentReport:
+            names.append('archived_at')
+            rows = rows.add_columns(literal(now))
+        db.session.execute(insert(archived.__table__).from_select(names, rows))
+    moved, _ = delete_rows(ids)
+    return [(row.id, row.user_id) for row in moved]
+
+
+def archive_incidents(older_than_days, batch_size, statuses=TERMINAL_STATUSES):
+    """Archive every eligible incident, committing after each batch.
+
+    A generator yielding the ids moved by each committed batch, so the
+    caller can report progress and invalidate caches as it goes.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    while True:
+        ids = archivable(cutoff, batch_size, statuses)
+        if not ids:
+            return
+        archive_batch(ids)
+        db.session.commit()
+        yield ids
+
+
+def purge_archived(user_id):
+    """Delete a user's archived incidents and their archived child rows.
+
+    They still count towards the rollups and their clusters, so those are
+    adjusted, and clusters left empty are deleted. Returns the media file names they referenced, for the media
+    collector once the transaction has committed; the caller commits.
+    """
+    ids = select(ArchivedIncidentReport.id).where(ArchivedIncidentReport.user_id == user_id)
+    rows = db.session.execute(
+        select(ArchivedIncidentReport.cluster_id, *(getattr(ArchivedIncidentReport, name) for name in TRACKED))
+        .where(ArchivedIncidentReport.user_id == user_id)
+    ).all()
+    release_clusters(Counter(row.cluster_id for row in rows if row.cluster_id is not None))
+    apply(db.session.connection(), removed=[c for row in rows for c in contributions(*row[1:])])
+    files = [name for model, columns in ARCHIVED_MEDIA_FILES for column in columns
+             for name in db.session.scalars(select(column).where(model.report_id.in_(ids))) if name]
+    for archived in ARCHIVES.values():
+        table = archived.__table__
+        db.session.execute(delete(table).where(_parent_key(table).in_(ids)))
+    return list(dict.fromkeys(files))
+
+
+# Reading archived incidents back
+
+def _users(user_ids):
+    users = User.query.filter(User.id.in_(set(user_ids))).all() if user_ids else []
+    return {user.id: user.to_dict() for user in users}
+
+
+def _thread_item(row, users):
+    """An archived comment or review in the shape of its live to_dict()"""
+    item = {column.name: getattr(row, column.name) for column in row.__table__.columns
+            if column.name != 'user_id'}
+    item['created_at'] = item['created_at'].isoformat()
+    item['user'] = users.get(row.user_id)
+    return item
+
+
+def _latest(archived, incident_id, size=PREVIEW_SIZE):
+    return (archived.query.filter_by(incident_id=incident_id)
+            .order_by(archived.created_at.desc(), archived.id.desc())
+            .limit(size).all())
+
+
+def archived_incident(incident_id):
+    """An archived incident in the shape of IncidentReport.to_dict(), or None"""
+    report = db.session.get(ArchivedIncidentReport, incident_id)
+    if report is None:
+        return None
+    images = ArchivedIncidentImage.query.filter_by(report_id=incident_id).all()
+    videos = ArchivedIncidentVideo.query.filter_by(report_id=incident_id).all()
+    comments = _latest(ArchivedIncidentComment, incident_id)
+    reviews = _latest(ArchivedIncidentReview, incident_id)
+    users = _users([report.user_id] + [row.user_id for row in comments + reviews])
+
+    return {
+        'id': report.id,
+        'description': report.description,
+        'latitude': report.latitude,
+        'longitude': report.longitude,
+        'status': report.status,
+        'created_at': report.created_at.isoformat(),
+        'updated_at': report.updated_at.isoformat(),
+        'resolved_at': report.resolved_at.isoformat() if report.resolved_at else None,
+        'archived_at': report.archived_at.isoformat(),
+        'cluster_id': report.cluster_id,
+        'user': users.get(report.user_id),
+        # Same columns as the live tables, so the live serializers apply
+        'images': [IncidentImage.to_dict(image) for image in images],
+        'videos': [IncidentVideo.to_dict(video) for video in videos],
+        'comments': [_thread_item(row, users) for row in comments],
+        'comment_count': report.comment_count,
+        'reactions': {
+            'like': report.like_count,
+            'share': report.share_count
+        },
+        'reviews': [_thread_item(row, users) for row in reviews],
+        'review_stats': {
+            'count': report.review_count,
+            'average_rating': round(report.rating_total / report.review_count, 2) if report.review_count else None
+        }
+    }
+
+
+def archived_thread(model, incident_id, limit, cursor):
+    """A page of an archived incident's comments or reviews: (items, next_cursor, count) or None"""
+    counter = {IncidentComment: 'comment_count', IncidentReview: 'review_count'}[model]
+    count = (db.session.query(getattr(ArchivedIncidentReport, counter))
+             .filter(ArchivedIncidentReport.id == incident_id).scalar())
+    if count is None:
+        return None
+    archived = ARCHIVES[model]
+    rows, next_cursor = paginate(
+        archived.query.filter(archived.incident_id == incident_id),
+        (archived.created_at, archived.id), limit, cursor, types=(datetime, int)
+    )
+    users = _users([row.user_id for row in rows])
+    return [_thread_item(row, users) for row in rows], next_cursor, count
@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from services.wire import negotiate, render
+
+
+class LRUCacheBackend:
+    """In-process LRU with per-entry TTL; the default backend"""
+
+    def __init__(self, max_entries=256):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._entries.get(key, (0, None))[0] or 0) + 1
+            self._entries[key] = (value, None)
+            self._entries.move_to_end(key)
+            return value
+
+
+class RedisCacheBackend:
+    """Cache shared by every worker process through Redis"""
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._redis.set(key, value, ex=ttl or None)
+
+    def incr(self, key):
+        return self._redis.incr(key)
+
+
+class ResponseCache:
+    """Caches GET response bodies keyed by scope, data version and URL.
+
+    A scope's data version combines an explicit generation, bumped by
+    invalidate() on every write path, with an optional watermark read
+    from the database. The watermark keeps workers that use the default
+    in-process backend from serving another worker's stale data. Because
+    the ETag is derived from the version, If-None-Match can be answered
+    with 304 before any body is built. RESPONSE_CACHE_URL (redis://...)
+    switches to a shared store.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.watermarks = {}
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('RESPONSE_CACHE_URL')
+        if url:
+            self.backend = RedisCacheBackend(url)
+        else:
+            self.backend = LRUCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+        app.extensions['response_cache'] = self
+
+    def watermark(self, scope):
+        """Register f() returning a cheap database fingerprint for `scope`"""
+        def decorator(f):
+            self.watermarks[scope] = f
+            return f
+        return decorator
+
+    def version(self, scope):
+        generation = int(self.backend.get(f'version:{scope}') or 0)
+        watermark = self.watermarks[scope]() if scope in self.watermarks else ''
+        return f'{generation}.{watermark}'
+
+    def invalidate(self, *scopes):
+        for scope in scopes:
+            self.backend.incr(f'version:{scope}')
+        self._count('invalidations', len(scopes))
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def cached(self, scope):
+        """Decorator for Resource GET methods whose output depends only on the URL"""
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                # One entry per representation the client negotiated
+                mimetype = negotiate()
+                key = f'{scope}:{self.version(scope)}:{mimetype}:{request.full_path}'
+                etag = hashlib.sha1(key.encode()).hexdigest()
+
+                # Weak match: compression turns the ETag weak
+                if request.if_none_match.contains_weak(etag):
+                    self._count('not_modified')
+                    return self._response(b'', 304, etag, mimetype)
+
+                body = self.backend.get(f'body:{key}')
+                if body is not None:
+                    self._count('hits')
+                    return self._response(body, 200, etag, mimetype)
+
+                self._count('misses')
+                body, status = _body(f(*args, **kwargs))
+                if status != 200:
+                    return current_app.response_class(body, status=status, mimetype=mimetype)
+                self.backend.set(f'body:{key}', body, self.ttl)
+                return self._response(body, 200, etag, mimetype)
+            return decorated
+        return decorator
+
+    def _response(self, body, status, etag, mimetype):
+        response = current_app.response_class(body, status=status, mimetype=mimetype)
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        # Browsers may keep the body but must revalidate it on every use
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+
+def _body(result):
+    """Turn a Resource return value into (encoded bytes, status)"""
+    status = 200
+    if isinstance(result, tuple):
+        result, status = result[0], result[1]
+    if isinstance(result, current_app.response_class):
+        return result.get_data(), result.status_code
+    return render(result)[0], status
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,54 @@
+from datetime import datetime
+from sqlalchemy import case
+from models.extensions import db
+from models.incident_cluster import CELL_PRECISION, IncidentCluster
+from services.geo import cells_at, distance_km, radius_bbox
+
+
+def assign_cluster(incident, radius_km, window):
+    """Attach a new, unflushed incident to a nearby recent cluster or start one.
+
+    Candidates come from the (cell, last_reported_at) index on the cluster
+    table: only clusters with a report in the last `window`, in the handful
+    of cells around the point, are read, so the lookup stays flat however
+    many incidents exist. The closest one wins. Returns (cluster, created);
+    created is True when the incident starts a cluster.
+    """
+    if incident.created_at is None:
+        incident.created_at = datetime.utcnow()
+    now = incident.created_at
+
+    with db.session.no_autoflush:
+        cluster = find_cluster(incident.latitude, incident.longitude, radius_km, now - window)
+    if cluster is None:
+        cluster = IncidentCluster(latitude=incident.latitude, longitude=incident.longitude,
+                                  first_reported_at=now, last_reported_at=now, report_count=1)
+        db.session.add(cluster)
+        db.session.flush()
+        incident.cluster_id = cluster.id
+        return cluster, True
+
+    # Atomic bump, so concurrent duplicates never lose a count; a queued
+    # report written late never moves last_reported_at backwards
+    IncidentCluster.query.filter_by(id=cluster.id).update({
+        IncidentCluster.report_count: IncidentCluster.report_count + 1,
+        IncidentCluster.last_reported_at: case(
+            (IncidentCluster.last_reported_at < now, now), else_=IncidentCluster.last_reported_at
+        )
+    }, synchronize_session=False)
+    incident.cluster_id = cluster.id
+    return cluster, False
+
+
+def find_cluster(latitude, longitude, radius_km, since):
+    """The closest cluster within radius_km that has a report after `since`"""
+    cells = cells_at(*radius_bbox(latitude, longitude, radius_km), CELL_PRECISION)
+    distance = distance_km(IncidentCluster.latitude, IncidentCluster.longitude, latitude, longitude)
+    return (
+        IncidentCluster.query
+        .filter(IncidentCluster.cell.in_(cells),
+                IncidentCluster.last_reported_at >= since,
+                distance <= radius_km)
+        .order_by(distance)
+        .first()
+    )
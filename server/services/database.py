@@ -0,0 +1,84 @@
+import sqlite3
+import time
+from functools import wraps
+from flask import g, request, session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# Session key holding when the user last wrote; their reads stay on the
+# primary until the replica has had DATABASE_REPLICA_STICKY_SECONDS to catch up
+LAST_WRITE_KEY = 'db_last_write'
+
+
+class DatabaseEngines:
+    """Builds engine settings from config before db.init_app() reads them.
+
+    SQLite gets WAL journaling, a busy timeout and synchronous=NORMAL on
+    every connection, so readers no longer block behind a writer and
+    concurrent writers wait instead of failing with "database is locked".
+    Server databases get a sized, pre-pinged connection pool. With
+    DATABASE_REPLICA_URL set, handlers wrapped in read_only() query the
+    replica, except for users who wrote recently.
+    """
+
+    def __init__(self, app=None):
+        self.sqlite_pragmas = ()
+        self.sticky_seconds = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_backend_name() == 'sqlite':
+            self.sqlite_pragmas = (
+                ('journal_mode', 'WAL'),
+                ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT', 5000))),
+                ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+            )
+        else:
+            options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('pool_size', config.get('DATABASE_POOL_SIZE', 10))
+            options.setdefault('max_overflow', config.get('DATABASE_MAX_OVERFLOW', 20))
+            options.setdefault('pool_pre_ping', config.get('DATABASE_POOL_PRE_PING', True))
+            options.setdefault('pool_recycle', config.get('DATABASE_POOL_RECYCLE', 1800))
+
+        replica_url = config.get('DATABASE_REPLICA_URL')
+        if replica_url:
+            config.setdefault('SQLALCHEMY_BINDS', {})['replica'] = replica_url
+            self.sticky_seconds = config.get('DATABASE_REPLICA_STICKY_SECONDS', 10)
+            app.after_request(self._remember_write)
+        app.extensions['database_engines'] = self
+
+    def _remember_write(self, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            session[LAST_WRITE_KEY] = time.time()
+        return response
+
+    def use_replica(self):
+        """Whether the current user's reads may be served by the replica"""
+        return time.time() - session.get(LAST_WRITE_KEY, 0) > self.sticky_seconds
+
+
+engines = DatabaseEngines()
+
+
+def read_only(f):
+    """Route the handler's queries to the replica bind when one is configured"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_replica = engines.use_replica()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.db_replica = False
+    return decorated
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        for name, value in engines.sqlite_pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
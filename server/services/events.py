@@ -0,0 +1,147 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+
+# Channel every signed-in client listens on for incident events
+INCIDENTS_CHANNEL = 'incidents'
+
+
+def user_channel(user_id):
+    """Private channel carrying one user's notifications"""
+    return f'user:{user_id}'
+
+
+class InMemoryBackend:
+    """Fans events out to subscribers inside this process.
+
+    Enough for a single worker and for tests; deployments running several
+    worker processes should use RedisBackend so every worker sees every
+    event.
+    """
+
+    def __init__(self, max_queue=256):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._max_queue = max_queue
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers[channel])
+        for inbox in subscribers:
+            try:
+                inbox.put_nowait(message)
+            except queue.Full:
+                # A stalled client must not block writers; it resyncs on reconnect
+                pass
+
+    def subscribe(self, channels):
+        inbox = queue.Queue(maxsize=self._max_queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(inbox)
+        return _QueueSubscription(self, channels, inbox)
+
+    def _unsubscribe(self, channels, inbox):
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].discard(inbox)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class _QueueSubscription:
+    def __init__(self, backend, channels, inbox):
+        self._backend = backend
+        self._channels = channels
+        self._inbox = inbox
+
+    def get(self, timeout=None):
+        try:
+            return self._inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._backend._unsubscribe(self._channels, self._inbox)
+
+
+class RedisBackend:
+    """Fans events out across worker processes through Redis pub/sub"""
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._redis.publish(channel, message)
+
+    def subscribe(self, channels):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*channels)
+        return _RedisSubscription(pubsub)
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout=None):
+        message = self._pubsub.get_message(timeout=timeout or 0)
+        if message is None:
+            return None
+        data = message['data']
+        return data.decode() if isinstance(data, bytes) else data
+
+    def close(self):
+        self._pubsub.close()
+
+
+class EventBroker:
+    """Publishes JSON events to named channels on a pluggable backend.
+
+    EVENT_BROKER_URL selects the backend: unset for the in-process stand-in,
+    or a redis:// URL to share events between workers.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('EVENT_BROKER_URL')
+        if url:
+            self.backend = RedisBackend(url)
+        else:
+            self.backend = InMemoryBackend()
+        app.extensions['event_broker'] = self
+
+    def publish(self, channel, event, data):
+        message = json.dumps({'event': event, 'data': data})
+        try:
+            self.backend.publish(channel, message)
+        except Exception as e:
+            # Push is best-effort; clients still converge through /incidents/changes
+            print(f"Error publishing {event}: {str(e)}")
+
+    def subscribe(self, channels):
+        return self.backend.subscribe(channels)
+
+    def stream(self, channels, heartbeat=15):
+        """Yield Server-Sent Events for `channels` until the client goes away"""
+        subscription = self.subscribe(channels)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keepalive\n\n'
+                    continue
+                event = json.loads(message)['event']
+                yield f'event: {event}\ndata: {message}\n\n'
+        finally:
+            subscription.close()
+
+
+broker = EventBroker()
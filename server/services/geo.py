@@ -0,0 +1,198 @@
+import math
+import sqlite3
+from sqlalchemy import and_, event, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Float
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # ~5m cells, stored on every incident
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell at `precision`"""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _from_cell(lat_index, lon_index, precision):
+    """Geohash of the cell at integer (lat_index, lon_index)"""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    value = 0
+    for i in range(bits):
+        # Geohash interleaves bits starting with longitude
+        if i % 2 == 0:
+            lon_bits -= 1
+            bit = (lon_index >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (lat_index >> lat_bits) & 1
+        value = (value << 1) | bit
+    return ''.join(
+        _BASE32[(value >> (5 * (precision - 1 - i))) & 31] for i in range(precision)
+    )
+
+
+def _cell_index(lat, lon, precision):
+    height, width = _cell_size(precision)
+    rows, cols = round(180.0 / height), round(360.0 / width)
+    lat_index = min(int((lat + 90.0) / height), rows - 1)
+    lon_index = min(int((lon + 180.0) / width), cols - 1)
+    return lat_index, lon_index
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    return _from_cell(*_cell_index(lat, lon, precision), precision)
+
+
+def geohash_center(geohash):
+    """(lat, lon) at the middle of a geohash cell"""
+    value = 0
+    for char in geohash:
+        value = (value << 5) | _BASE32.index(char)
+    bits = 5 * len(geohash)
+    lat_index = lon_index = 0
+    for i in range(bits):
+        bit = (value >> (bits - 1 - i)) & 1
+        if i % 2 == 0:
+            lon_index = (lon_index << 1) | bit
+        else:
+            lat_index = (lat_index << 1) | bit
+    height, width = _cell_size(len(geohash))
+    return -90.0 + (lat_index + 0.5) * height, -180.0 + (lon_index + 0.5) * width
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=64):
+    """Geohash prefixes whose cells together cover the bounding box.
+
+    Uses the finest precision that needs at most `max_cells` prefixes, so a
+    query touches a bounded number of contiguous index ranges whatever the size
+    of the box.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        south, west = _cell_index(min_lat, min_lon, precision)
+        north, east = _cell_index(max_lat, max_lon, precision)
+        if (north - south + 1) * (east - west + 1) <= max_cells:
+            return cells_at(min_lat, min_lon, max_lat, max_lon, precision)
+    return ['']  # box spans the globe; every row is a candidate
+
+
+def cells_at(min_lat, min_lon, max_lat, max_lon, precision):
+    """Every geohash cell of `precision` the bounding box touches"""
+    south, west = _cell_index(min_lat, min_lon, precision)
+    north, east = _cell_index(max_lat, max_lon, precision)
+    return [
+        _from_cell(lat_index, lon_index, precision)
+        for lat_index in range(south, north + 1)
+        for lon_index in range(west, east + 1)
+    ]
+
+
+def radius_bbox(lat, lon, radius_km):
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) around a circle"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-9 or abs(lat) + dlat >= 90.0:
+        return max(lat - dlat, -90.0), -180.0, min(lat + dlat, 90.0), 180.0
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (max(lat - dlat, -90.0), max(lon - dlon, -180.0),
+            min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class distance_km(FunctionElement):
+    """SQL great-circle distance between two (lat, lon) pairs in km"""
+    type = Float()
+    inherit_cache = True
+    name = 'haversine_km'
+
+
+@compiles(distance_km)
+def _compile_distance(element, compiler, **kw):
+    # SQLite has no trig functions by default; see _register_sqlite_functions
+    return f'haversine_km({compiler.process(element.clauses, **kw)})'
+
+
+@compiles(distance_km, 'postgresql')
+def _compile_distance_postgresql(element, compiler, **kw):
+    lat1, lon1, lat2, lon2 = (compiler.process(c, **kw) for c in element.clauses)
+    return (
+        f'(2 * {EARTH_RADIUS_KM} * asin(least(1.0, sqrt('
+        f'power(sin(radians({lat2} - {lat1}) / 2), 2) + '
+        f'cos(radians({lat1})) * cos(radians({lat2})) * '
+        f'power(sin(radians({lon2} - {lon1}) / 2), 2)))))'
+    )
+
+
+@event.listens_for(Engine, 'connect')
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('haversine_km', 4, haversine_km, deterministic=True)
+
+
+def _candidate_filter(geohash_column, lat_column, lon_column, min_lat, min_lon, max_lat, max_lon):
+    prefixes = covering_cells(min_lat, min_lon, max_lat, max_lon)
+    # '{' sorts right after 'z', so [p, p + '{') is every hash starting with p
+    cells = or_(*(
+        and_(geohash_column >= prefix, geohash_column < prefix + '{')
+        for prefix in prefixes
+    ))
+    return and_(
+        cells,
+        lat_column.between(min_lat, max_lat),
+        lon_column.between(min_lon, max_lon),
+    )
+
+
+def bbox_filter(model, min_lat, min_lon, max_lat, max_lon):
+    """Rows of `model` inside the box, driven by the geohash index"""
+    return _candidate_filter(model.geohash, model.latitude, model.longitude,
+                             min_lat, min_lon, max_lat, max_lon)
+
+
+def radius_filter(model, lat, lon, radius_km):
+    """Rows of `model` within `radius_km` of (lat, lon).
+
+    The geohash index narrows the search to cells around the circle; the
+    exact haversine distance is only evaluated for those candidates.
+    """
+    candidates = _candidate_filter(model.geohash, model.latitude, model.longitude,
+                                   *radius_bbox(lat, lon, radius_km))
+    return and_(candidates,
+                distance_km(model.latitude, model.longitude, lat, lon) <= radius_km)
+
+
+def parse_bbox(raw):
+    """Parse ?bbox=min_lon,min_lat,max_lon,max_lat"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in raw.split(','))
+    except ValueError:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise ValueError('bbox is out of range')
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def parse_near(raw, radius_km):
+    """Parse ?near=lat,lon&radius_km=..."""
+    try:
+        lat, lon = (float(v) for v in raw.split(','))
+        radius_km = float(radius_km if radius_km not in (None, '') else 1)
+    except ValueError:
+        raise ValueError('near must be lat,lon and radius_km a number')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_km <= 0:
+        raise ValueError('near/radius_km is out of range')
+    return lat, lon, radius_km
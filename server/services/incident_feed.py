@@ -0,0 +1,262 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, true
+from sqlalchemy.orm import joinedload, selectinload
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.incident_image import IncidentImage
+from models.incident_video import IncidentVideo
+from models.incident_tombstone import IncidentTombstone
+from models.user import User
+from services.pagination import paginate, encode_cursor, decode_cursor, keyset_after
+
+
+def feed_query():
+    """Incident query that eager-loads everything IncidentReport.to_dict() touches.
+
+    The whole graph is fetched in a fixed number of SELECTs (one for the
+    incidents and their authors, one per media collection, and the thread
+    previews serialize_incidents() batches) no matter how many incidents
+    are returned. Only the newest few comments and reviews are inlined;
+    reactions are never loaded, to_dict() reads the counter columns.
+    """
+    return IncidentReport.query.options(
+        joinedload(IncidentReport.user),
+        selectinload(IncidentReport.images),
+        selectinload(IncidentReport.videos),
+    )
+
+
+def serialize_incidents(incidents):
+    """Serialize incidents loaded through feed_query(), with their thread previews"""
+    IncidentReport.load_previews(incidents)
+    return [incident.to_dict() for incident in incidents]
+
+
+def _count(model, foreign_key, *criteria):
+    return (
+        select(func.count(model.id))
+        .where(foreign_key == IncidentReport.id, *criteria)
+        .correlate(IncidentReport)
+        .scalar_subquery()
+    )
+
+
+# Columns the list view needs, without nested comment/review arrays
+SUMMARY_FIELDS = {
+    'id': IncidentReport.id,
+    'description': IncidentReport.description,
+    'latitude': IncidentReport.latitude,
+    'longitude': IncidentReport.longitude,
+    'status': IncidentReport.status,
+    'created_at': IncidentReport.created_at,
+    'updated_at': IncidentReport.updated_at,
+    'user_id': IncidentReport.user_id,
+    'cluster_id': IncidentReport.cluster_id,
+    'image_count': _count(IncidentImage, IncidentImage.report_id),
+    'video_count': _count(IncidentVideo, IncidentVideo.report_id),
+    'comment_count': IncidentReport.comment_count,
+    'review_count': IncidentReport.review_count,
+    'like_count': IncidentReport.like_count,
+    'share_count': IncidentReport.share_count,
+    'average_rating': func.round(
+        IncidentReport.rating_total * 1.0 / func.nullif(IncidentReport.review_count, 0), 2
+    ),
+}
+
+# Sort key of the feed; always selected so a cursor can be built
+FEED_ORDER = (IncidentReport.created_at, IncidentReport.id)
+
+
+def parse_fields(raw):
+    """Resolve a ?fields= value to summary field names, or None for full rows"""
+    if not raw:
+        return None
+    if raw == 'summary':
+        return list(SUMMARY_FIELDS)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SUMMARY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def summary_query(fields):
+    """Query selecting only `fields` (plus the sort key) for each incident"""
+    names = list(dict.fromkeys(['id', 'created_at', *fields]))
+    return db.session.query(*(SUMMARY_FIELDS[name].label(name) for name in names))
+
+
+def serialize_summaries(rows, fields):
+    return [
+        {name: _plain(getattr(row, name)) for name in fields}
+        for row in rows
+    ]
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def feed_page(limit, cursor=None, fields=None, filters=()):
+    """One keyset page of the feed, newest first.
+
+    Full rows go through feed_query(); a `fields` projection selects only
+    the requested summary columns, so the page costs a single statement.
+    """
+    if fields is None:
+        query = feed_query().filter(*filters)
+        incidents, next_cursor = paginate(query, FEED_ORDER, limit, cursor,
+                                          types=(datetime, int))
+        items = serialize_incidents(incidents)
+    else:
+        query = summary_query(fields).filter(*filters)
+        rows, next_cursor = paginate(query, FEED_ORDER, limit, cursor,
+                                     types=(datetime, int))
+        items = serialize_summaries(rows, fields)
+    return {'incidents': items, 'next_cursor': next_cursor}
+
+
+# Order of the changes feed; the watermark is the last (updated_at, id) seen
+CHANGES_ORDER = (IncidentReport.updated_at, IncidentReport.id)
+# Rows are stamped with updated_at before they commit, so a slow transaction
+# can become visible after the watermark has passed its timestamp. Each sync
+# re-reads this far behind the watermark to pick such rows up.
+CHANGES_OVERLAP = timedelta(seconds=5)
+# Most versions a token lists as already sent. A burst larger than this
+# shrinks the re-read window to the newest timestamps that still fit.
+CHANGES_SEEN_MAX = 1000
+
+
+def _recent(groups):
+    """Validate the token's [[microseconds behind the watermark, id, ...], ...] list"""
+    if not isinstance(groups, list):
+        raise ValueError
+    return [[int(value) for value in group] for group in groups if group]
+
+
+def _encode_recent(seen, updated_at):
+    groups = {}
+    for incident_id, stamp in seen:
+        offset = (updated_at - stamp) // timedelta(microseconds=1)
+        groups.setdefault(offset, []).append(incident_id)
+    return [[offset, *ids] for offset, ids in sorted(groups.items())]
+
+
+def _decode_changes(token):
+    """(updated_at, id, tombstone id, recent, window) from any token version"""
+    types = (datetime, int, int, _recent, int)
+    # Older tokens lack the window, or the window and the versions sent in it
+    for count in (5, 4, 3):
+        try:
+            values = decode_cursor(token, *types[:count])
+        except ValueError:
+            continue
+        return values + [[], None][count - 3:]
+    raise ValueError('Invalid cursor')
+
+
+def _behind(updated_at, overlap):
+    """Start of the re-read window; a token from an empty table sits at datetime.min"""
+    return updated_at - overlap if updated_at - datetime.min > overlap else datetime.min
+
+
+def _cap_seen(seen, window_start):
+    """Trim `seen` to CHANGES_SEEN_MAX versions, whole timestamps at a time.
+
+    Returns (seen, window_start) with the window moved up to the newest
+    timestamp that had to be dropped; rows at or before it are only
+    reached through the (updated_at, id) keyset from then on.
+    """
+    if len(seen) <= CHANGES_SEEN_MAX:
+        return seen, window_start
+    counts = Counter(stamp for _, stamp in seen)
+    kept = 0
+    for stamp in sorted(counts, reverse=True):
+        kept += counts[stamp]
+        if kept > CHANGES_SEEN_MAX:
+            window_start = stamp
+            break
+    return {(i, stamp) for i, stamp in seen if stamp > window_start}, window_start
+
+
+def changes_since(token, limit, fields=None, overlap=CHANGES_OVERLAP):
+    """Incidents written and deleted after the watermark in `token`.
+
+    The token encodes (updated_at, id) of the last incident returned, the
+    last tombstone id, and which (id, updated_at) versions within `overlap`
+    of the watermark the client already has. Every sync re-reads that
+    window and returns only versions it has not sent, so a write that
+    commits late is still delivered, exactly once. After a burst of more
+    than CHANGES_SEEN_MAX versions the window is narrowed (see
+    _cap_seen()) so the token stays small. A sync client can page
+    through a large backlog and then keep polling with the latest token.
+    Without a token every live incident is returned and deletions start
+    from "now".
+    """
+    seen = set()
+    if token:
+        updated_at, incident_id, tombstone_id, recent, window = _decode_changes(token)
+        for offset, *ids in recent:
+            stamp = updated_at - timedelta(microseconds=offset)
+            seen.update((i, stamp) for i in ids)
+        window_start = _behind(updated_at, overlap)
+        if window is not None:
+            window_start = max(window_start, updated_at - timedelta(microseconds=window))
+        watermark = or_(keyset_after(CHANGES_ORDER, (updated_at, incident_id), descending=False),
+                        IncidentReport.updated_at > window_start)
+    else:
+        updated_at, incident_id = datetime.min, 0
+        tombstone_id = db.session.query(func.max(IncidentTombstone.id)).scalar() or 0
+        window_start = datetime.min
+        watermark = true()
+
+    query = feed_query() if fields is None else summary_query(['updated_at', *fields])
+    # Versions the client already has are dropped after the fetch
+    rows = (query.filter(watermark)
+            .order_by(*(c.asc() for c in CHANGES_ORDER))
+            .limit(limit + 1 + len(seen)).all())
+    rows = [row for row in rows if (row.id, row.updated_at) not in seen]
+    tombstones = (IncidentTombstone.query
+                  .filter(IncidentTombstone.id > tombstone_id)
+                  .order_by(IncidentTombstone.id)
+                  .limit(limit + 1).all())
+
+    has_more = len(rows) > limit or len(tombstones) > limit
+    rows, tombstones = rows[:limit], tombstones[:limit]
+    if rows and (rows[-1].updated_at, rows[-1].id) > (updated_at, incident_id):
+        updated_at, incident_id = rows[-1].updated_at, rows[-1].id
+    if tombstones:
+        tombstone_id = tombstones[-1].id
+    window_start = max(window_start, _behind(updated_at, overlap))
+    seen.update((row.id, row.updated_at) for row in rows)
+    seen = {(i, stamp) for i, stamp in seen if stamp > window_start}
+    seen, window_start = _cap_seen(seen, window_start)
+
+    if fields is None:
+        items = serialize_incidents(rows)
+    else:
+        items = serialize_summaries(rows, fields)
+    return {
+        'incidents': items,
+        'deleted': [t.to_dict() for t in tombstones],
+        'since': encode_cursor(updated_at, incident_id, tombstone_id, _encode_recent(seen, updated_at),
+                               (updated_at - window_start) // timedelta(microseconds=1)),
+        'has_more': has_more
+    }
+
+
+def feed_watermark():
+    """Fingerprint that changes whenever any incident is written or deleted.
+
+    It includes the newest users.updated_at as well: incidents embed their
+    author, and a role or ban change in one worker must reach the cached
+    responses of the others.
+    """
+    updated_at, tombstone_id, user_updated_at = db.session.query(
+        select(func.max(IncidentReport.updated_at)).scalar_subquery(),
+        select(func.max(IncidentTombstone.id)).scalar_subquery(),
+        select(func.max(User.updated_at)).scalar_subquery(),
+    ).one()
+    return '.'.join([updated_at.isoformat() if updated_at else '', str(tombstone_id or 0),
+                     user_updated_at.isoformat() if user_updated_at else ''])
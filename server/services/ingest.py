@@ -0,0 +1,365 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import inspect, select
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.incident_image import IncidentImage
+from models.incident_video import IncidentVideo
+from models.ingest_receipt import IngestReceipt
+from services.analytics import deferred as deferred_rollups
+from services.clustering import assign_cluster
+from services.incident_feed import feed_query
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process drains, receipts keep it exactly-once
+    fcntl = None
+
+# Upload kind -> media model and the column holding its file name
+MEDIA_KINDS = {
+    'image': (IncidentImage, 'image_url'),
+    'video': (IncidentVideo, 'video_url'),
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    error TEXT
+)
+'''
+
+
+def create_incident(user_id, description, latitude, longitude, media=(), created_at=None):
+    """Add a new pending incident and its media rows to the session.
+
+    `media` lists (filename, content_hash, kind) for uploads store_upload()
+    has already written. `created_at` defaults to now; queued reports pass
+    the time they were submitted, so a backlog does not shift them. Returns
+    (incident, media rows, whether the report opened a new duplicate
+    cluster); the caller commits.
+    """
+    incident = IncidentReport(
+        description=description,
+        latitude=latitude,
+        longitude=longitude,
+        user_id=user_id,
+        status='pending',
+        created_at=created_at
+    )
+    # Reports close in space and time join one cluster and one admin review
+    _, new_cluster = assign_cluster(
+        incident, current_app.config['DUPLICATE_RADIUS_KM'],
+        timedelta(minutes=current_app.config['DUPLICATE_WINDOW_MINUTES'])
+    )
+    db.session.add(incident)
+    db.session.flush()
+
+    items = []
+    for filename, content_hash, kind in media:
+        model, column = MEDIA_KINDS[kind]
+        item = model(**{column: filename}, content_hash=content_hash, report_id=incident.id)
+        db.session.add(item)
+        items.append(item)
+    return incident, items, new_cluster
+
+
+class QueueFull(Exception):
+    """Raised by append() when INGEST_MAX_PENDING submissions are already waiting"""
+
+    def __init__(self, depth, retry_after):
+        super().__init__(f"Ingest queue is full ({depth} reports waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class IngestQueue:
+    """Durable write-ahead queue for incident reports during a surge.
+
+    With INGEST_QUEUE on, POST /incidents stores the uploads, appends the
+    submission to a local SQLite file (WAL, synchronous=FULL, so it
+    survives a crash once acknowledged) and answers 202 with a provisional
+    ticket. A single writer, elected with a file lock so only one process
+    drains even with several workers, creates up to INGEST_BATCH_SIZE
+    queued reports per transaction on the main database: one commit and
+    one hold of its write lock per batch instead of per report. Each
+    incident leaves an IngestReceipt in the same transaction, which makes
+    replay after a crash exactly-once and answers status lookups. Appends
+    are refused with QueueFull past INGEST_MAX_PENDING waiting reports.
+    INGEST_SYNC drains inline for tests.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.committed_callbacks = []
+        self.rate = None  # reports/s written by this process's writer, smoothed
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._worker = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('INGEST_QUEUE', False)
+        self.sync = app.config.get('INGEST_SYNC', False)
+        self.path = app.config.get('INGEST_QUEUE_PATH') or os.path.join(app.instance_path, 'ingest-queue.db')
+        self.batch_size = app.config.get('INGEST_BATCH_SIZE', 200)
+        self.batch_window = app.config.get('INGEST_BATCH_WINDOW', 0.05)
+        self.max_pending = app.config.get('INGEST_MAX_PENDING', 5000)
+        app.extensions['ingest_queue'] = self
+
+    def on_committed(self, f):
+        """Register f(incident, media, new_cluster) to run for each incident after its batch commits"""
+        self.committed_callbacks.append(f)
+        return f
+
+    # Queue file
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def depth(self):
+        """Submissions waiting to be written"""
+        return self._connection().execute(
+            'SELECT count(*) FROM submissions WHERE error IS NULL'
+        ).fetchone()[0]
+
+    def retry_after(self, depth):
+        """Seconds a refused client should wait, from the observed drain rate"""
+        if not self.rate:
+            return 5
+        return max(1, math.ceil(depth / self.rate))
+
+    def append(self, user_id, description, latitude, longitude, media=()):
+        """Durably queue a report; returns (ticket, depth including it) or raises QueueFull"""
+        payload = json.dumps({'user_id': user_id, 'description': description, 'latitude': latitude,
+                              'longitude': longitude, 'media': list(media)})
+        ticket = uuid.uuid4().hex
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            depth = connection.execute('SELECT count(*) FROM submissions WHERE error IS NULL').fetchone()[0]
+            if depth >= self.max_pending:
+                raise QueueFull(depth, self.retry_after(depth))
+            connection.execute('INSERT INTO submissions (ticket, payload, queued_at) VALUES (?, ?, ?)',
+                               (ticket, payload, time.time()))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        if self.sync:
+            self.drain()
+        else:
+            self._start()
+            self._wake.set()
+        return ticket, depth + 1
+
+    def status(self, ticket):
+        """{'state': 'queued'|'failed'|'created', ...} for a ticket, or None"""
+        self._start()
+        connection = self._connection()
+        row = connection.execute('SELECT seq, error FROM submissions WHERE ticket = ?', (ticket,)).fetchone()
+        if row is not None:
+            seq, error = row
+            if error is not None:
+                return {'state': 'failed', 'error': error}
+            ahead = connection.execute(
+                'SELECT count(*) FROM submissions WHERE error IS NULL AND seq < ?', (seq,)
+            ).fetchone()[0]
+            return {'state': 'queued', 'position': ahead + 1}
+        receipt = db.session.get(IngestReceipt, ticket)
+        if receipt is None:
+            return None
+        return {'state': 'created', 'incident_id': receipt.incident_id}
+
+    def stats(self):
+        self._start()
+        connection = self._connection()
+        depth, failed, oldest = connection.execute(
+            'SELECT count(*) FILTER (WHERE error IS NULL), count(error), '
+            'min(queued_at) FILTER (WHERE error IS NULL) FROM submissions'
+        ).fetchone()
+        return {
+            'enabled': self.enabled,
+            'depth': depth,
+            'failed': failed,
+            'max_pending': self.max_pending,
+            'oldest_seconds': round(time.time() - oldest, 3) if oldest else None,
+            'rate': round(self.rate, 1) if self.rate else None,
+        }
+
+    def queued_files(self):
+        """Upload names still referenced only by waiting submissions"""
+        names = set()
+        if not os.path.exists(self.path):
+            return names
+        for (payload,) in self._connection().execute('SELECT payload FROM submissions WHERE error IS NULL'):
+            names.update(filename for filename, _, _ in json.loads(payload)['media'])
+        return names
+
+    def discard(self, user_id):
+        """Drop a user's submissions, waiting or failed; returns the upload names they held"""
+        if not os.path.exists(self.path):
+            return []
+        connection = self._connection()
+        match = "json_extract(payload, '$.user_id') = ?"
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            payloads = connection.execute(f'SELECT payload FROM submissions WHERE {match}',
+                                          (user_id,)).fetchall()
+            connection.execute(f'DELETE FROM submissions WHERE {match}', (user_id,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return [filename for (payload,) in payloads for filename, _, _ in json.loads(payload)['media']]
+
+    # Writer
+
+    def _start(self):
+        """Run the writer thread; also resumes a queue left over by a previous process"""
+        if self.sync or not self.enabled:
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='ingest', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        lock = open(self.path + '.lock', 'w')
+        while fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(1)  # another process is the writer; take over if it dies
+        while True:
+            self._wake.wait(1)
+            self._wake.clear()
+            # Let a burst build up so it shares one commit
+            time.sleep(self.batch_window)
+            try:
+                while self.drain() == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Error writing queued incidents: {str(e)}")
+
+    def drain(self):
+        """Write the oldest batch of queued reports in one transaction; returns how many were taken"""
+        rows = self._connection().execute(
+            'SELECT ticket, payload, queued_at FROM submissions WHERE error IS NULL ORDER BY seq LIMIT ?',
+            (self.batch_size,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        with self.app.app_context():
+            tickets = [row[0] for row in rows]
+            # Already written before a crash or by a racing writer
+            done = set(db.session.scalars(
+                select(IngestReceipt.ticket).where(IngestReceipt.ticket.in_(tickets))
+            ))
+            pending = [row for row in rows if row[0] not in done]
+            try:
+                created = self._write(pending)
+                done.update(row[0] for row in pending)
+            except Exception:
+                # Retry one by one so a single bad report cannot block the batch
+                db.session.rollback()
+                created = []
+                for row in pending:
+                    try:
+                        created.extend(self._write([row]))
+                        done.add(row[0])
+                    except Exception as e:
+                        db.session.rollback()
+                        self._fail(row[0], getattr(e, 'orig', None) or e)
+
+            self._forget(done)
+            self._committed(created)
+            db.session.remove()
+
+        rate = len(rows) / (time.perf_counter() - started)
+        self.rate = rate if self.rate is None else 0.8 * self.rate + 0.2 * rate
+        return len(rows)
+
+    def _write(self, rows):
+        created = []
+        submissions = [json.loads(payload) for _, payload, _ in rows]
+        # A user deleted since their report was read by this writer
+        users = {submission['user_id'] for submission in submissions}
+        missing = users - set(db.session.scalars(select(User.id).where(User.id.in_(users))))
+        if missing:
+            raise ValueError(f"User {min(missing)} no longer exists")
+        # One rollup upsert for the whole batch instead of one per incident
+        with deferred_rollups(db.session):
+            for (ticket, _, queued_at), submission in zip(rows, submissions):
+                incident, media, new_cluster = create_incident(
+                    submission['user_id'], submission['description'], submission['latitude'],
+                    submission['longitude'], submission['media'], datetime.utcfromtimestamp(queued_at)
+                )
+                db.session.add(IngestReceipt(ticket=ticket, incident_id=incident.id))
+                created.append((incident, media, new_cluster))
+        db.session.commit()
+        return created
+
+    def _committed(self, created):
+        if not created:
+            return
+        # Reload the batch with what to_dict() needs in a fixed number of queries
+        ids = [inspect(incident).identity[0] for incident, _, _ in created]
+        incidents = feed_query().filter(IncidentReport.id.in_(ids)).all()
+        IncidentReport.load_previews(incidents)
+        for incident, media, new_cluster in created:
+            for callback in self.committed_callbacks:
+                try:
+                    callback(incident, media, new_cluster)
+                except Exception as e:
+                    print(f"Error after ingesting incident {incident.id}: {str(e)}")
+
+    def _fail(self, ticket, error):
+        self._connection().execute('UPDATE submissions SET error = ? WHERE ticket = ?', (str(error), ticket))
+
+    def _forget(self, tickets):
+        if tickets:
+            tickets = list(tickets)
+            self._connection().execute(
+                f"DELETE FROM submissions WHERE ticket IN ({','.join('?' * len(tickets))})", tickets
+            )
+
+    def prune(self, older_than):
+        """Drop failed submissions and receipts older than `older_than` (a timedelta)"""
+        cutoff = datetime.utcnow() - older_than
+        self._connection().execute(
+            'DELETE FROM submissions WHERE error IS NOT NULL AND queued_at < ?',
+            (time.time() - older_than.total_seconds(),)
+        )
+        removed = IngestReceipt.query.filter(IngestReceipt.created_at < cutoff).delete()
+        db.session.commit()
+        return removed
+
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,234 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request, send_file, abort
+from flask.wrappers import Request
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from sqlalchemy.orm.exc import StaleDataError
+from models.extensions import db
+from services.media_gc import storage_lock
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingUpload:
+    """Upload part streamed straight into UPLOAD_FOLDER while it is hashed.
+
+    Werkzeug's multipart parser writes each chunk here as it arrives, so a
+    large video is never held in memory and never copied a second time:
+    store_upload() just renames the finished temp file to its content hash.
+    Anything not stored by the end of the request is removed on close().
+    """
+
+    def __init__(self, folder):
+        fd, self.path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.stored = False
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.stored and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadRequest(Request):
+    """Request class that streams file parts through HashingUpload"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUpload(current_app.config['UPLOAD_FOLDER'])
+
+
+def file_extension(filename):
+    filename = secure_filename(filename or '')
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def allowed_file(filename):
+    return file_extension(filename) in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def store_upload(file):
+    """Move an uploaded file into content-addressed storage.
+
+    Files are named <sha256>.<ext>, so identical uploads share one file on
+    disk and two uploads called "image.jpg" can no longer overwrite each
+    other. Returns (filename, content_hash).
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    stream = file.stream
+    if not isinstance(stream, HashingUpload):
+        # Small or in-memory parts: copy in chunks, hashing as we go
+        stream = HashingUpload(folder)
+        while True:
+            chunk = file.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            stream.write(chunk)
+
+    stream.flush()
+    digest = stream.hexdigest()
+    filename = f"{digest}.{file_extension(file.filename)}"
+    target = os.path.join(folder, filename)
+    with storage_lock(folder):
+        if os.path.exists(target):
+            stream.close()  # duplicate upload, keep the existing copy
+            os.utime(target)  # and tell the media collector it is in use again
+        else:
+            os.replace(stream.path, target)
+            stream.stored = True
+            stream.close()
+    return filename, digest
+
+
+_CONTENT_HASH = re.compile(r'^([0-9a-f]{64})\.')
+
+# Content-addressed files never change, so clients may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 3600
+
+
+def send_media(filename):
+    """Serve a file from UPLOAD_FOLDER after the caller has been authorized.
+
+    Hash-named files get a strong ETag equal to their content hash and an
+    immutable Cache-Control; If-None-Match/Range/If-Range are answered by
+    Werkzeug, which hands the body to wsgi.file_wrapper (sendfile) when the
+    server offers it. With MEDIA_ACCEL_REDIRECT set (e.g. '/protected-uploads/')
+    Flask only answers with an X-Accel-Redirect header and nginx transfers
+    the bytes; USE_X_SENDFILE does the same for Apache/lighttpd.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    match = _CONTENT_HASH.match(os.path.basename(filename))
+    etag = match.group(1) if match else True
+    max_age = IMMUTABLE_MAX_AGE if match else LEGACY_MAX_AGE
+
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+        if match:
+            response.set_etag(etag)
+        response = response.make_conditional(request)
+    else:
+        response = send_file(os.path.abspath(path), conditional=True, etag=etag, max_age=max_age)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.public = False  # media sits behind login
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    if match:
+        response.cache_control.immutable = True
+    return response
+
+
+class MediaPipeline:
+    """Runs media post-processing on a background worker pool.
+
+    Requests only store the upload and enqueue its row; processors flip the
+    row from 'processing' to 'ready' (or 'failed') later. MEDIA_PIPELINE_SYNC
+    runs jobs inline, which keeps tests deterministic.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.processors = []
+        self.done_callbacks = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.sync = app.config.get('MEDIA_PIPELINE_SYNC', False)
+        if not self.sync:
+            self.executor = ThreadPoolExecutor(
+                max_workers=app.config.get('MEDIA_WORKERS', 2),
+                thread_name_prefix='media'
+            )
+        app.extensions['media_pipeline'] = self
+
+    def processor(self, f):
+        """Register f(media) to run for every uploaded image or video"""
+        self.processors.append(f)
+        return f
+
+    def submit(self, model, media_id):
+        if self.sync:
+            self._run(model, media_id)
+        else:
+            self.executor.submit(self._run, model, media_id)
+
+    def _run(self, model, media_id):
+        with self.app.app_context():
+            media = db.session.get(model, media_id)
+            if media is None:
+                return
+            try:
+                for process in self.processors:
+                    process(media)
+                media.status = 'ready'
+            except Exception as e:
+                print(f"Error processing {model.__tablename__} {media_id}: {str(e)}")
+                db.session.rollback()
+                media = db.session.get(model, media_id)
+                if media is None:
+                    return  # deleted while it was being processed
+                media.status = 'failed'
+            try:
+                db.session.commit()
+            except StaleDataError:
+                db.session.rollback()
+                return  # deleted while it was being processed
+            for callback in self.done_callbacks:
+                callback(media)
+
+    def on_done(self, f):
+        """Register f(media) to run after a job's final status is committed"""
+        self.done_callbacks.append(f)
+        return f
+
+
+pipeline = MediaPipeline()
+
+
+@pipeline.processor
+def verify_file(media):
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.filename)
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        raise ValueError(f"{media.filename} is missing or empty")
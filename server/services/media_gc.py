@@ -0,0 +1,196 @@
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import or_, select
+from models.extensions import db
+from models.incident_image import IncidentImage
+from models.incident_video import IncidentVideo
+from models.incident_archive import ArchivedIncidentImage, ArchivedIncidentVideo
+
+# Columns naming files in UPLOAD_FOLDER, originals and generated variants
+MEDIA_FILES = (
+    (IncidentImage, (IncidentImage.image_url, IncidentImage.thumbnail_url)),
+    (IncidentVideo, (IncidentVideo.video_url, IncidentVideo.poster_url, IncidentVideo.preview_url)),
+)
+# Archived media keeps its files too
+ARCHIVED_MEDIA_FILES = (
+    (ArchivedIncidentImage, (ArchivedIncidentImage.image_url, ArchivedIncidentImage.thumbnail_url)),
+    (ArchivedIncidentVideo, (ArchivedIncidentVideo.video_url, ArchivedIncidentVideo.poster_url,
+                             ArchivedIncidentVideo.preview_url)),
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock below only covers this process
+    fcntl = None
+
+# <sha256>.<ext> originals and their <sha256>.thumb.jpg style variants
+_HASHED = re.compile(r'^([0-9a-f]{64})\.')
+TEMP_PREFIX = '.upload-'
+LOCK_NAME = '.media-gc.lock'
+CHECK_BATCH = 500
+
+_process_lock = threading.Lock()
+
+
+@contextmanager
+def storage_lock(folder, exclusive=False):
+    """Lock UPLOAD_FOLDER against the collector, across processes.
+
+    store_upload() holds it shared while it reuses or creates a file; the
+    collector holds it exclusively from its last reference check to the
+    unlink, so a duplicate upload either finds the file gone and writes a
+    new copy or refreshes its mtime before the collector looks at it.
+    """
+    if fcntl is None:
+        with _process_lock:
+            yield
+        return
+    with open(os.path.join(folder, LOCK_NAME), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def referenced(names):
+    """The subset of `names` that some live or archived image or video row still points at.
+
+    Uploads are content-addressed, so several incidents can share one file
+    and its variants: a hash-named file stays while any row carries its
+    content hash. Older, non-hashed names are matched against every column
+    that can hold them.
+    """
+    names = set(names)
+    hashes = {match.group(1) for match in map(_HASHED.match, names) if match}
+    kept = set()
+    for model, columns in MEDIA_FILES + ARCHIVED_MEDIA_FILES:
+        if hashes:
+            live = set(db.session.scalars(
+                select(model.content_hash).where(model.content_hash.in_(hashes)).distinct()
+            ))
+            kept.update(name for name in names if (match := _HASHED.match(name)) and match.group(1) in live)
+        legacy = names - kept
+        if legacy:
+            for row in db.session.execute(select(*columns).where(or_(*(c.in_(legacy) for c in columns)))):
+                kept.update(value for value in row if value in legacy)
+    return kept
+
+
+class MediaCollector:
+    """Removes media files that no incident references any more.
+
+    Deletes only queue file names, which a background thread checks and
+    unlinks after the deleting transaction has committed, so requests never
+    wait on the filesystem. sweep() walks the whole UPLOAD_FOLDER for files
+    nothing points at, including temp files left by interrupted uploads;
+    run it with `flask sweep-media`. Files modified within
+    MEDIA_GC_GRACE_SECONDS are never removed, which protects an upload
+    whose row is not committed yet (store_upload() refreshes the mtime of
+    a deduplicated file), and names returned by keep() callbacks are never
+    removed either. References are re-checked under storage_lock(), so a
+    duplicate upload cannot slip in between the check and the unlink.
+    MEDIA_GC_SYNC collects inline for tests.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.queue = queue.Queue()
+        self.keepers = []
+        self._worker = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.sync = app.config.get('MEDIA_GC_SYNC', False)
+        self.grace_seconds = app.config.get('MEDIA_GC_GRACE_SECONDS', 3600)
+        app.extensions['media_collector'] = self
+
+    def keep(self, f):
+        """Register f() returning file names in use that no media row points at yet"""
+        self.keepers.append(f)
+        return f
+
+    def _kept(self, names):
+        # A fresh snapshot, so rows committed since the last check count
+        db.session.rollback()
+        kept = referenced(names)
+        for f in self.keepers:
+            kept.update(f())
+        return kept
+
+    def collect(self, names):
+        """Queue files from deleted media rows; call after the commit"""
+        names = [name for name in names if name]
+        if not names:
+            return
+        job = (names, time.time())
+        if self.sync:
+            self._remove(*job)
+            return
+        self.queue.put(job)
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='media-gc', daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._remove(*job)
+            except Exception as e:
+                print(f"Error collecting media: {str(e)}")
+
+    def _remove(self, names, queued_at):
+        with self.app.app_context():
+            folder = self.app.config['UPLOAD_FOLDER']
+            removed = 0
+            with storage_lock(folder, exclusive=True):
+                for name in set(names) - self._kept(names):
+                    # A duplicate upload since the delete touched the file: keep it
+                    removed += self._unlink(os.path.join(folder, name), queued_at)
+            db.session.remove()
+        return removed
+
+    def sweep(self):
+        """Remove every unreferenced file in UPLOAD_FOLDER; returns how many went"""
+        with self.app.app_context():
+            folder = self.app.config['UPLOAD_FOLDER']
+            cutoff = time.time() - self.grace_seconds
+            removed = 0
+            candidates = []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                        continue
+                    if entry.name.startswith(TEMP_PREFIX):
+                        removed += self._unlink(entry.path, cutoff)
+                    elif not entry.name.startswith('.'):
+                        candidates.append(entry.name)
+            for start in range(0, len(candidates), CHECK_BATCH):
+                batch = candidates[start:start + CHECK_BATCH]
+                with storage_lock(folder, exclusive=True):
+                    for name in set(batch) - self._kept(batch):
+                        removed += self._unlink(os.path.join(folder, name), cutoff)
+            db.session.remove()
+            return removed
+
+    @staticmethod
+    def _unlink(path, older_than):
+        try:
+            if os.stat(path).st_mtime >= older_than:
+                return 0
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+
+collector = MediaCollector()
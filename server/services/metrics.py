@@ -0,0 +1,186 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from services.principal import current_principal
+
+# Latency histogram bucket bounds in seconds (Prometheus `le` labels)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_COUNT = 5
+PROFILE_LINES = 40
+
+
+class Series:
+    """Accumulated measurements for one (resource, method) pair"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def observe(self, seconds, status, queries, db_seconds, response_bytes):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.db_seconds += db_seconds
+        self.response_bytes += response_bytes
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class RequestMetrics:
+    """Per-resource latency, SQL and size metrics for every request.
+
+    Each request counts its SQL statements and their time through engine
+    cursor events, then folds them into a Series keyed by Flask-RESTful
+    resource and HTTP method. Requests slower than SLOW_REQUEST_MS (0
+    disables it) are logged with their most expensive statements. Numbers are kept per
+    process; with several workers, scrape each one. Admins can add
+    ?__profile=1 to any request to get a cProfile summary instead of the
+    normal response.
+    """
+
+    def __init__(self, app=None):
+        self.series = {}
+        self._lock = threading.Lock()
+        self.slow_request_ms = 500
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS', 500)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['request_metrics'] = self
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = []
+        if request.args.get('__profile') == '1':
+            principal = current_principal()
+            if principal is not None and principal.is_admin:
+                g.metrics_profiler = cProfile.Profile()
+                g.metrics_profiler.enable()
+
+    def _finish(self, response):
+        if 'metrics_started' not in g:
+            return response
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - g.metrics_started
+        queries = g.metrics_queries
+        db_seconds = sum(duration for _, duration in queries)
+        resource = _resource_name()
+
+        with self._lock:
+            series = self.series.get((resource, request.method))
+            if series is None:
+                series = self.series[(resource, request.method)] = Series()
+            series.observe(seconds, response.status_code, len(queries), db_seconds,
+                           response.content_length or 0)
+
+        if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+            top = sorted(queries, key=lambda query: query[1], reverse=True)[:SLOW_QUERY_COUNT]
+            current_app.logger.warning(
+                "Slow request %s %s took %.0fms with %d queries (%.0fms in DB)%s",
+                request.method, request.full_path.rstrip('?'), seconds * 1000, len(queries), db_seconds * 1000,
+                ''.join(f"\n  {duration * 1000:8.1f}ms  {' '.join(statement.split())[:300]}"
+                        for statement, duration in top)
+            )
+
+        if profiler is not None:
+            return self._profile_response(profiler, response, seconds, queries, db_seconds)
+        return response
+
+    def _profile_response(self, profiler, response, seconds, queries, db_seconds):
+        out = io.StringIO()
+        out.write(f"{request.method} {request.full_path} -> {response.status_code}\n")
+        out.write(f"{seconds * 1000:.1f}ms total, {len(queries)} queries, {db_seconds * 1000:.1f}ms in DB\n\n")
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return current_app.response_class(out.getvalue(), mimetype='text/plain')
+
+    def render(self):
+        """All series in the Prometheus text exposition format"""
+        with self._lock:
+            snapshot = sorted(self.series.items())
+            lines = []
+            _header(lines, 'ajali_request_duration_seconds', 'histogram', 'Request latency by resource and method')
+            for (resource, method), series in snapshot:
+                labels = f'resource="{resource}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, series.buckets):
+                    cumulative += count
+                    lines.append(f'ajali_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'ajali_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series.count}')
+                lines.append(f'ajali_request_duration_seconds_sum{{{labels}}} {series.seconds:.6f}')
+                lines.append(f'ajali_request_duration_seconds_count{{{labels}}} {series.count}')
+
+            _header(lines, 'ajali_requests_total', 'counter', 'Requests by resource, method and status')
+            for (resource, method), series in snapshot:
+                for status, count in sorted(series.statuses.items()):
+                    lines.append(f'ajali_requests_total{{resource="{resource}",method="{method}",'
+                                 f'status="{status}"}} {count}')
+
+            totals = (
+                ('ajali_request_sql_queries_total', 'SQL statements issued', 'queries', '{}'),
+                ('ajali_request_db_seconds_total', 'Time spent executing SQL', 'db_seconds', '{:.6f}'),
+                ('ajali_response_bytes_total', 'Response body bytes', 'response_bytes', '{}'),
+            )
+            for name, help_text, attribute, number in totals:
+                _header(lines, name, 'counter', help_text)
+                for (resource, method), series in snapshot:
+                    value = number.format(getattr(series, attribute))
+                    lines.append(f'{name}{{resource="{resource}",method="{method}"}} {value}')
+
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            _header(lines, 'ajali_response_cache_events_total', 'counter', 'Response cache outcomes')
+            for outcome, count in sorted(cache.stats.items()):
+                lines.append(f'ajali_response_cache_events_total{{outcome="{outcome}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _resource_name():
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, 'view_class', None)
+    if view_class is not None:
+        return view_class.__name__
+    return request.endpoint or 'unmatched'
+
+
+metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_started'].pop()
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries.append((statement, time.perf_counter() - started))
+
+
+@event.listens_for(Engine, 'handle_error')
+def _query_failed(context):
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
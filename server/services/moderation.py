@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import delete, insert, select, update
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.incident_image import IncidentImage
+from models.incident_video import IncidentVideo
+from models.incident_comment import IncidentComment
+from models.incident_reaction import IncidentReaction
+from models.incident_review import IncidentReview
+from models.incident_tombstone import IncidentTombstone
+from models.incident_cluster import IncidentCluster
+from services.analytics import TRACKED, apply, contributions
+from services.media_gc import MEDIA_FILES
+from services.search import remove_from_index
+
+STATUSES = ('pending', 'under investigation', 'resolved', 'rejected')
+MAX_BATCH = 500
+
+# Child tables and the column pointing at their incident
+CHILDREN = (
+    (IncidentComment, IncidentComment.incident_id),
+    (IncidentReaction, IncidentReaction.incident_id),
+    (IncidentReview, IncidentReview.incident_id),
+    (IncidentImage, IncidentImage.report_id),
+    (IncidentVideo, IncidentVideo.report_id),
+)
+
+
+def parse_ids(raw, maximum=MAX_BATCH, kind='incident'):
+    """Validate a JSON list of `kind` ids, dropping duplicates but keeping order"""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError('Provide a non-empty "ids" list')
+    if len(raw) > maximum:
+        raise ValueError(f"At most {maximum} {kind}s per request")
+    try:
+        return list(dict.fromkeys(int(i) for i in raw))
+    except (TypeError, ValueError):
+        raise ValueError(f"{kind.capitalize()} ids must be integers")
+
+
+def _tracked(ids):
+    columns = [IncidentReport.id, IncidentReport.user_id, IncidentReport.cluster_id]
+    columns += [getattr(IncidentReport, name) for name in TRACKED]
+    return db.session.execute(select(*columns).where(IncidentReport.id.in_(ids))).all()
+
+
+def _contributions(row):
+    return contributions(*(getattr(row, name) for name in TRACKED))
+
+
+def update_status(ids, status):
+    """Set `status` on every listed incident with one UPDATE.
+
+    Incidents already in that status are left alone. The statements bypass
+    ORM events, so the analytics rollups are adjusted here with the same
+    netted upsert the mapper listeners use. Returns the changed rows as
+    (id, user_id) pairs; the caller commits.
+    """
+    if status not in STATUSES:
+        raise ValueError(f"Status must be one of: {', '.join(STATUSES)}")
+    rows = [row for row in _tracked(ids) if row.status != status]
+    if not rows:
+        return []
+
+    now = datetime.utcnow()
+    resolved_at = now if status == 'resolved' else None
+    db.session.execute(
+        update(IncidentReport)
+        .where(IncidentReport.id.in_([row.id for row in rows]))
+        .values(status=status, resolved_at=resolved_at, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    apply(
+        db.session.connection(),
+        added=[c for row in rows
+               for c in contributions(status, row.created_at, row.geohash, resolved_at)],
+        removed=[c for row in rows for c in _contributions(row)],
+    )
+    return [(row.id, row.user_id) for row in rows]
+
+
+def delete_rows(ids):
+    """Delete incidents and their child rows with one DELETE per table.
+
+    Leaves a tombstone per incident for sync clients. The search rows go
+    first, so the comment triggers have nothing left to rebuild. Cluster
+    counts and the analytics rollups are left as they are, which is what
+    archiving wants; delete_incidents() adjusts both. Returns (the
+    deleted incidents' _tracked() rows, their media file names).
+    """
+    rows = _tracked(ids)
+    if not rows:
+        return [], []
+    found = [row.id for row in rows]
+
+    files = []
+    media = [
+        select(column).where(model.report_id.in_(found))
+        for model, columns in MEDIA_FILES for column in columns
+    ]
+    for name in db.session.scalars(media[0].union_all(*media[1:])):
+        if name:
+            files.append(name)
+
+    remove_from_index(db.session.connection(), found)
+    for model, column in CHILDREN:
+        db.session.execute(delete(model).where(column.in_(found)).execution_options(synchronize_session=False))
+    db.session.execute(
+        delete(IncidentReport).where(IncidentReport.id.in_(found)).execution_options(synchronize_session=False)
+    )
+    now = datetime.utcnow()
+    db.session.execute(insert(IncidentTombstone), [{'incident_id': i, 'deleted_at': now} for i in found])
+    return rows, list(dict.fromkeys(files))
+
+
+def release_clusters(clustered):
+    """Take {cluster_id: reports removed} off the cluster counts.
+
+    A cluster left with no reports is deleted, so neither the admin
+    listing nor a new report nearby finds it again.
+    """
+    for cluster_id, count in clustered.items():
+        db.session.execute(
+            update(IncidentCluster).where(IncidentCluster.id == cluster_id)
+            .values(report_count=IncidentCluster.report_count - count)
+        )
+    if clustered:
+        db.session.execute(
+            delete(IncidentCluster)
+            .where(IncidentCluster.id.in_(list(clustered)), IncidentCluster.report_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def delete_incidents(ids):
+    """Delete incidents for good: delete_rows() plus their clusters and rollups.
+
+    Files are not touched: returns ((id, user_id) pairs, media file names)
+    so the caller can hand the names to the media collector once the
+    transaction has committed.
+    """
+    rows, files = delete_rows(ids)
+    release_clusters(Counter(row.cluster_id for row in rows if row.cluster_id is not None))
+    if rows:
+        apply(db.session.connection(), removed=[c for row in rows for c in _contributions(row)])
+    return [(row.id, row.user_id) for row in rows], files
+
+
+def owner_messages(changed, describe, exclude_user_id=None):
+    """One (user_id, message) per owner; describe(ids) phrases it for their incidents"""
+    by_owner = defaultdict(list)
+    for incident_id, user_id in changed:
+        if user_id != exclude_user_id:
+            by_owner[user_id].append(incident_id)
+    return [(user_id, describe(ids)) for user_id, ids in by_owner.items()]
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import distinct, false, insert, literal, select
+from models.extensions import db
+from models.user import User
+from models.incident_report import IncidentReport
+from models.notification import Notification
+from services.events import broker, user_channel
+from services.geo import radius_filter
+
+# audience is 'users', 'admins', 'near' or 'each'; params is a hashable tuple
+# for it ('each' carries (user_id, message) pairs and no shared message).
+# Jobs sharing a coalesce key and audience within one batch collapse into a
+# single notification built from `summary` (formatted with {count}).
+Job = namedtuple('Job', 'audience params message type coalesce summary')
+
+
+class NotificationDispatcher:
+    """Writes notifications for whole audiences off the request path.
+
+    Requests only enqueue a Job. A single background thread drains the
+    queue in batches, folds bursts of coalescible jobs together and writes
+    each audience with one INSERT ... SELECT, so the cost of a request no
+    longer depends on how many people are notified. The queue is in-memory:
+    jobs still waiting when the process dies are lost, which is acceptable
+    for notifications. NOTIFICATION_DISPATCH_SYNC writes inline for tests.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.sync = app.config.get('NOTIFICATION_DISPATCH_SYNC', False)
+        self.batch_window = app.config.get('NOTIFICATION_BATCH_WINDOW', 0.25)
+        app.extensions['notification_dispatcher'] = self
+
+    # Audiences
+
+    def notify_users(self, user_ids, message, type='info', coalesce=None, summary=None):
+        self._submit(Job('users', tuple(sorted(set(user_ids))), message, type, coalesce, summary))
+
+    def notify_admins(self, message, type='info', coalesce=None, summary=None):
+        self._submit(Job('admins', (), message, type, coalesce, summary))
+
+    def notify_each(self, messages, type='info'):
+        """A different message per user, from (user_id, message) pairs, in one INSERT"""
+        if messages:
+            self._submit(Job('each', tuple(messages), None, type, None, None))
+
+    def notify_near(self, latitude, longitude, radius_km, message, type='info',
+                    days=30, exclude_user_id=None, coalesce=None, summary=None):
+        """Notify everyone who reported an incident within radius_km in the last `days`"""
+        params = (latitude, longitude, radius_km, days, exclude_user_id)
+        self._submit(Job('near', params, message, type, coalesce, summary))
+
+    # Queue handling
+
+    def _submit(self, job):
+        if self.sync:
+            self.write([job])
+            return
+        self.queue.put(job)
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='notifications', daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            jobs = [self.queue.get()]
+            # Give a burst a moment to arrive so it lands in one transaction
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    jobs.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.write(jobs)
+            except Exception as e:
+                print(f"Error dispatching notifications: {str(e)}")
+
+    def write(self, jobs):
+        """Insert notifications for a batch of jobs in one transaction"""
+        with self.app.app_context():
+            created = []
+            for job, count in coalesce(jobs):
+                if job.audience == 'each':
+                    created.extend(self._insert_each(job.params, job.type))
+                    continue
+                message = job.summary.format(count=count) if count > 1 and job.summary else job.message
+                audience = self._audience(job)
+                if audience is None:
+                    continue
+                created.extend(self._insert(audience, message, job.type))
+            db.session.commit()
+            for notification in created:
+                broker.publish(user_channel(notification['user_id']), 'notification', notification)
+
+    def _audience(self, job):
+        if job.audience == 'admins':
+            return select(User.id).where(User.is_admin.is_(True))
+        if job.audience == 'users':
+            return select(User.id).where(User.id.in_(job.params)) if job.params else None
+        if job.audience == 'near':
+            latitude, longitude, radius_km, days, exclude_user_id = job.params
+            query = select(distinct(IncidentReport.user_id)).where(
+                radius_filter(IncidentReport, latitude, longitude, radius_km),
+                IncidentReport.created_at >= datetime.utcnow() - timedelta(days=days)
+            )
+            if exclude_user_id is not None:
+                query = query.where(IncidentReport.user_id != exclude_user_id)
+            return query
+        raise ValueError(f"Unknown audience {job.audience}")
+
+    def _insert(self, audience, message, type):
+        audience = audience.subquery()
+        now = datetime.utcnow()
+        rows = select(
+            audience.c[0], literal(message), literal(type), false(), literal(now)
+        )
+        stmt = (
+            insert(Notification)
+            .from_select(['user_id', 'message', 'type', 'read', 'created_at'], rows)
+            .returning(Notification.id, Notification.user_id)
+        )
+        return [
+            {'id': row.id, 'message': message, 'type': type, 'read': False,
+             'created_at': now.isoformat(), 'user_id': row.user_id}
+            for row in db.session.execute(stmt)
+        ]
+
+    def _insert_each(self, messages, type):
+        # Recipients deleted since the job was queued are skipped
+        existing = set(db.session.scalars(
+            select(User.id).where(User.id.in_({user_id for user_id, _ in messages}))
+        ))
+        now = datetime.utcnow()
+        rows = [{'user_id': user_id, 'message': message, 'type': type, 'read': False, 'created_at': now}
+                for user_id, message in messages if user_id in existing]
+        if not rows:
+            return []
+        stmt = insert(Notification).values(rows).returning(
+            Notification.id, Notification.user_id, Notification.message
+        )
+        return [
+            {'id': row.id, 'message': row.message, 'type': type, 'read': False,
+             'created_at': now.isoformat(), 'user_id': row.user_id}
+            for row in db.session.execute(stmt)
+        ]
+
+
+def coalesce(jobs):
+    """Fold jobs that share (audience, params, type, coalesce key).
+
+    Yields (job, count) in first-seen order; jobs without a coalesce key
+    are never merged.
+    """
+    groups = {}
+    for i, job in enumerate(jobs):
+        key = (job.audience, job.params, job.type, job.coalesce) if job.coalesce else i
+        if key in groups:
+            groups[key][1] += 1
+        else:
+            groups[key] = [job, 1]
+    for job, count in groups.values():
+        yield job, count
+
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_limit(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ?limit= value, clamped to [1, maximum]"""
+    if raw in (None, ''):
+        return default
+    limit = int(raw)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, *types):
+    """Decode a token from encode_cursor(), coercing each value to its type"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if len(payload) != len(types):
+            raise ValueError
+        return [datetime.fromisoformat(v) if t is datetime else t(v)
+                for v, t in zip(payload, types)]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_after(columns, values, descending=True):
+    """Filter selecting rows strictly after `values` in (columns...) order.
+
+    Expanded into OR/AND terms rather than a row-value comparison so every
+    backend can drive it from a composite index on the same columns.
+    """
+    terms = []
+    for i, column in enumerate(columns):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        step = column < values[i] if descending else column > values[i]
+        terms.append(and_(*equal, step))
+    return or_(*terms)
+
+
+def paginate(query, columns, limit, cursor=None, types=None, descending=True):
+    """Apply keyset pagination to `query`.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    `columns` must form a unique sort key, e.g. (created_at, id).
+    """
+    if cursor:
+        values = decode_cursor(cursor, *types)
+        query = query.filter(keyset_after(columns, values, descending))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*(getattr(last, c.key) for c in columns))
+    return rows, next_cursor
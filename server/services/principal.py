@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import namedtuple
+from flask import g, session
+from models.extensions import db
+from models.user import User
+
+# What authorization checks need to know about the signed-in user
+Principal = namedtuple('Principal', 'id username is_admin is_banned')
+
+
+class PrincipalCache:
+    """Loads the signed-in user once and shares it between checks.
+
+    The principal is memoized on flask.g for the rest of the request and in
+    a small process-wide map for PRINCIPAL_CACHE_TTL seconds, so decorators
+    and handlers stop issuing identical user SELECTs. Role, ban and delete
+    changes call invalidate(); other worker processes pick them up when
+    their TTL runs out.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._entries = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('PRINCIPAL_CACHE_TTL', 30)
+        app.extensions['principal_cache'] = self
+
+    def load(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        row = db.session.query(
+            User.id, User.username, User.is_admin, User.is_banned
+        ).filter(User.id == user_id).first()
+        principal = Principal(row.id, row.username, bool(row.is_admin), bool(row.is_banned)) if row else None
+        with self._lock:
+            self._entries[user_id] = (principal, now + self.ttl)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if g.get('principal_user_id') == user_id:
+            g.pop('principal', None)
+
+
+principals = PrincipalCache()
+
+_MISSING = object()
+
+
+def current_principal():
+    """Principal for the session's user, or None when signed out or deleted"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    principal = g.get('principal', _MISSING)
+    if principal is _MISSING or g.principal_user_id != user_id:
+        principal = g.principal = principals.load(user_id)
+        g.principal_user_id = user_id
+    return principal
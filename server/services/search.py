@@ -0,0 +1,218 @@
+import re
+from sqlalchemy import delete, event, func, literal_column, text
+from sqlalchemy.sql import column, table
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.incident_feed import feed_query, serialize_incidents, summary_query, serialize_summaries
+from services.pagination import encode_cursor, decode_cursor
+
+MAX_TERMS = 16
+
+# One row per incident: rowid/incident_id is the incident id, the document
+# holds its description and the text of all of its comments. Triggers keep
+# it in step with every insert, update and delete in the same transaction.
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS incident_search
+       USING fts5(description, comments, tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_report_insert
+       AFTER INSERT ON incident_reports BEGIN
+         INSERT INTO incident_search (rowid, description, comments)
+         VALUES (new.id, new.description, '');
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_report_update
+       AFTER UPDATE OF description ON incident_reports BEGIN
+         UPDATE incident_search SET description = new.description WHERE rowid = new.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_report_delete
+       AFTER DELETE ON incident_reports BEGIN
+         DELETE FROM incident_search WHERE rowid = old.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_comment_insert
+       AFTER INSERT ON incident_comments BEGIN
+         UPDATE incident_search SET comments = comments || ' ' || new.content
+         WHERE rowid = new.incident_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_comment_update
+       AFTER UPDATE OF content, incident_id ON incident_comments BEGIN
+         UPDATE incident_search SET comments = coalesce(
+           (SELECT group_concat(content, ' ') FROM incident_comments WHERE incident_id = incident_search.rowid), '')
+         WHERE rowid IN (old.incident_id, new.incident_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS incident_search_comment_delete
+       AFTER DELETE ON incident_comments BEGIN
+         UPDATE incident_search SET comments = coalesce(
+           (SELECT group_concat(content, ' ') FROM incident_comments WHERE incident_id = incident_search.rowid), '')
+         WHERE rowid = old.incident_id;
+       END""",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM incident_search",
+    """INSERT INTO incident_search (rowid, description, comments)
+       SELECT r.id, r.description, coalesce(
+         (SELECT group_concat(c.content, ' ') FROM incident_comments c WHERE c.incident_id = r.id), '')
+       FROM incident_reports r""",
+]
+
+# Description terms (weight A) outrank comment terms (weight B)
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('english', coalesce(r.description, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(
+      (SELECT string_agg(c.content, ' ') FROM incident_comments c WHERE c.incident_id = r.id), '')), 'B')
+"""
+
+POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS incident_search (
+         incident_id integer PRIMARY KEY REFERENCES incident_reports (id) ON DELETE CASCADE,
+         document tsvector NOT NULL
+       )""",
+    "CREATE INDEX IF NOT EXISTS ix_incident_search_document ON incident_search USING gin (document)",
+    f"""CREATE OR REPLACE FUNCTION incident_search_refresh(target integer) RETURNS void AS $$
+         INSERT INTO incident_search (incident_id, document)
+         SELECT r.id, {POSTGRES_DOCUMENT} FROM incident_reports r WHERE r.id = target
+         ON CONFLICT (incident_id) DO UPDATE SET document = excluded.document;
+       $$ LANGUAGE sql""",
+    # Comment changes only refresh an existing row, so a bulk delete that
+    # drops the row first (remove_from_index) skips the per-comment work
+    f"""CREATE OR REPLACE FUNCTION incident_search_update(target integer) RETURNS void AS $$
+         UPDATE incident_search SET document = {POSTGRES_DOCUMENT}
+         FROM incident_reports r WHERE incident_search.incident_id = target AND r.id = target;
+       $$ LANGUAGE sql""",
+    """CREATE OR REPLACE FUNCTION incident_search_report_changed() RETURNS trigger AS $$
+       BEGIN
+         PERFORM incident_search_refresh(NEW.id);
+         RETURN NULL;
+       END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION incident_search_comment_changed() RETURNS trigger AS $$
+       BEGIN
+         IF TG_OP <> 'INSERT' THEN PERFORM incident_search_update(OLD.incident_id); END IF;
+         IF TG_OP <> 'DELETE' THEN PERFORM incident_search_update(NEW.incident_id); END IF;
+         RETURN NULL;
+       END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS incident_search_report ON incident_reports",
+    """CREATE TRIGGER incident_search_report AFTER INSERT OR UPDATE OF description
+       ON incident_reports FOR EACH ROW EXECUTE FUNCTION incident_search_report_changed()""",
+    "DROP TRIGGER IF EXISTS incident_search_comment ON incident_comments",
+    """CREATE TRIGGER incident_search_comment AFTER INSERT OR UPDATE OR DELETE
+       ON incident_comments FOR EACH ROW EXECUTE FUNCTION incident_search_comment_changed()""",
+]
+
+POSTGRES_REBUILD = [
+    "TRUNCATE incident_search",
+    f"INSERT INTO incident_search (incident_id, document) SELECT r.id, {POSTGRES_DOCUMENT} FROM incident_reports r",
+]
+
+_sqlite_index = table('incident_search', column('rowid'))
+_postgres_index = table('incident_search', column('incident_id'), column('document'))
+
+
+def _dialect(connection):
+    return connection.dialect.name
+
+
+def create_search_index(connection):
+    """Create the index table and its triggers if they do not exist yet"""
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(_dialect(connection), [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def rebuild_search_index(connection):
+    """Create the index if needed and refill it from the source tables"""
+    create_search_index(connection)
+    statements = {'sqlite': SQLITE_REBUILD, 'postgresql': POSTGRES_REBUILD}.get(_dialect(connection), [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def remove_from_index(connection, ids):
+    """Drop the index rows of incidents about to be deleted in bulk.
+
+    The comment triggers rebuild an incident's whole comment text on every
+    comment deleted, but only while its index row exists; removing it first
+    keeps a set-based delete linear in the number of comments.
+    """
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        connection.execute(delete(_sqlite_index).where(_sqlite_index.c.rowid.in_(ids)))
+    elif dialect == 'postgresql':
+        connection.execute(delete(_postgres_index).where(_postgres_index.c.incident_id.in_(ids)))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _before_drop(target, connection, **kw):
+    if _dialect(connection) in ('sqlite', 'postgresql'):
+        connection.execute(text("DROP TABLE IF EXISTS incident_search"))
+
+
+def parse_terms(q):
+    """Split free text into at most MAX_TERMS lowercase word terms"""
+    terms = re.findall(r'\w+', (q or '').lower())[:MAX_TERMS]
+    if not terms:
+        raise ValueError('Search query is required')
+    return terms
+
+
+def _ranked(terms):
+    """(id, rank) subquery of matching incidents; lower rank sorts first.
+
+    Every term must match and the last one is treated as a prefix, so
+    "bus overturned thi" already finds "Thika". User input never reaches
+    the engine's query syntax: terms are bare \\w+ words.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        index = literal_column('incident_search')
+        return (
+            db.session.query(
+                _sqlite_index.c.rowid.label('id'),
+                func.bm25(index, 1.0, 0.5).label('rank')
+            )
+            .select_from(_sqlite_index)
+            .filter(index.op('MATCH')(match))
+            .subquery()
+        )
+    if dialect == 'postgresql':
+        query = func.to_tsquery('english', ' & '.join(terms[:-1] + [f'{terms[-1]}:*']))
+        return (
+            db.session.query(
+                _postgres_index.c.incident_id.label('id'),
+                (-func.ts_rank(_postgres_index.c.document, query)).label('rank')
+            )
+            .filter(_postgres_index.c.document.op('@@')(query))
+            .subquery()
+        )
+    # No inverted index on other backends: unranked substring match
+    return (
+        db.session.query(IncidentReport.id.label('id'), literal_column('0').label('rank'))
+        .filter(*(IncidentReport.description.ilike(f'%{term}%') for term in terms))
+        .subquery()
+    )
+
+
+def search_incidents(q, limit, cursor=None, fields=None, filters=()):
+    """One page of incidents matching `q`, best match first.
+
+    The cursor is the offset of the next page: relevance scores are not
+    stable sort keys across writes, and search pages are rarely deep.
+    """
+    hits = _ranked(parse_terms(q))
+    offset = decode_cursor(cursor, int)[0] if cursor else 0
+
+    query = feed_query() if fields is None else summary_query(fields)
+    rows = (query.join(hits, hits.c.id == IncidentReport.id)
+            .filter(*filters)
+            .order_by(hits.c.rank, IncidentReport.id.desc())
+            .offset(offset).limit(limit + 1).all())
+
+    next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+    rows = rows[:limit]
+    items = serialize_incidents(rows) if fields is None else serialize_summaries(rows, fields)
+    return {'incidents': items, 'next_cursor': next_cursor}
@@ -0,0 +1,124 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images simply get no thumbnail
+    Image = None
+
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_WIDTH = 480
+PREVIEW_SECONDS = 4
+
+
+# Workers run in separate processes, so these take plain paths and must not
+# touch the app, the session or any model instance.
+
+def make_thumbnail(source, target, size=THUMBNAIL_SIZE):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target, 'JPEG', quality=80, optimize=True)
+
+
+def make_poster(source, target):
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-ss', '1', '-i', source, '-frames:v', '1',
+         '-vf', f'scale={PREVIEW_WIDTH}:-2', target],
+        check=True, timeout=60
+    )
+
+
+def make_preview(source, target):
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-i', source, '-t', str(PREVIEW_SECONDS), '-an',
+         '-vf', f'scale={PREVIEW_WIDTH}:-2', '-c:v', 'libx264', '-preset', 'veryfast',
+         '-crf', '30', '-movflags', '+faststart', target],
+        check=True, timeout=300
+    )
+
+
+def _variant(content_hash, suffix):
+    return f'{content_hash}.{suffix}'
+
+
+class VariantGenerator:
+    """Creates downscaled variants of uploaded media on a process pool.
+
+    Registered as a MediaPipeline processor: the pipeline thread hands the
+    CPU-heavy resize/transcode to a worker process and waits for it, so
+    neither the GIL nor the request workers are held up. Variants are
+    named after the original's content hash and stored next to it, so a
+    duplicate upload reuses them. Images need Pillow and videos need an
+    ffmpeg binary on PATH; without them the variant is skipped.
+
+    Variants are an optimization: one that fails to build is logged and
+    left unset, and the original is still served. The pool is started on
+    first use, and replaced if a worker process dies.
+    """
+
+    def __init__(self, app=None, pipeline=None):
+        self.executor = None
+        self.processes = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, pipeline)
+
+    def init_app(self, app, pipeline):
+        if not app.config.get('MEDIA_PIPELINE_SYNC', False):
+            self.processes = app.config.get('MEDIA_PROCESSES', 2)
+        app.extensions['media_variants'] = self
+        pipeline.processor(self.generate)
+
+    def _run(self, f, *args):
+        if not self.processes:
+            return f(*args)
+        with self._lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.processes)
+            executor = self.executor
+        try:
+            return executor.submit(f, *args).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise
+
+    def _build(self, f, source, filename):
+        """Create a variant unless it exists; its name, or None when it could not be made"""
+        folder = current_app.config['UPLOAD_FOLDER']
+        target = os.path.join(folder, filename)
+        if not os.path.exists(target):
+            try:
+                self._run(f, os.path.join(folder, source), target)
+            except Exception as e:
+                print(f"Error creating {filename} from {source}: {str(e)}")
+                if os.path.exists(target):
+                    os.remove(target)  # partial output
+                return None
+        # ffmpeg exits 0 without output when, say, a clip ends before the poster frame
+        return filename if os.path.exists(target) else None
+
+    def generate(self, media):
+        if not media.content_hash:
+            return
+        if hasattr(media, 'thumbnail_url'):
+            if Image is not None:
+                media.thumbnail_url = self._build(
+                    make_thumbnail, media.filename, _variant(media.content_hash, 'thumb.jpg'))
+        elif shutil.which('ffmpeg'):
+            media.poster_url = self._build(
+                make_poster, media.filename, _variant(media.content_hash, 'poster.jpg'))
+            media.preview_url = self._build(
+                make_preview, media.filename, _variant(media.content_hash, 'preview.mp4'))
+
+
+variants = VariantGenerator()
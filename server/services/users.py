@@ -0,0 +1,163 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import and_, bindparam, case, delete, func, literal, or_, select, union_all, update
+from models.extensions import db
+from models.user import User
+from models.notification import Notification
+from models.incident_report import IncidentReport
+from models.incident_comment import IncidentComment
+from models.incident_reaction import IncidentReaction
+from models.incident_review import IncidentReview
+from models.incident_archive import ARCHIVES
+from services.archive import purge_archived
+from services.ingest import ingest_queue
+from services.moderation import MAX_BATCH, delete_incidents
+from services.pagination import paginate
+
+FLAGS = {'1': True, 'true': True, '0': False, 'false': False}
+COUNTERS = ('comment_count', 'review_count', 'rating_total', 'like_count', 'share_count')
+
+
+def parse_flag(raw, name):
+    """Parse ?is_admin=/?is_banned= as 1/0/true/false; None when absent"""
+    if raw in (None, ''):
+        return None
+    try:
+        return FLAGS[raw.lower()]
+    except KeyError:
+        raise ValueError(f"{name} must be 1 or 0")
+
+
+def _prefix(column, prefix):
+    """lower(column) starts with `prefix`, as a range the lower() index can drive.
+
+    A LIKE 'prefix%' only uses an index on SQLite with a NOCASE column and
+    on Postgres with a pattern operator class; the range works on both.
+    """
+    prefix = prefix.lower()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    expression = func.lower(column)
+    return and_(expression >= prefix, expression < upper)
+
+
+def directory_query(q=None, is_admin=None, is_banned=None):
+    """Users whose username or email starts with `q`, optionally by role and ban"""
+    query = User.query
+    if q:
+        query = query.filter(or_(_prefix(User.username, q), _prefix(User.email, q)))
+    if is_admin is not None:
+        query = query.filter(User.is_admin.is_(is_admin))
+    if is_banned is not None:
+        query = query.filter(User.is_banned.is_(is_banned))
+    return query
+
+
+def activity(user_ids):
+    """{user_id: (incident count, last activity)} in one grouped query.
+
+    Last activity is the newest report, comment, review or reaction. Each
+    branch of the UNION ALL reads the (user_id, created_at) index of its
+    table for just these users.
+    """
+    if not user_ids:
+        return {}
+    branches = [
+        select(model.user_id.label('user_id'), literal(int(model is IncidentReport)).label('incident'),
+               model.created_at.label('at')).where(model.user_id.in_(user_ids))
+        for model in (IncidentReport, IncidentComment, IncidentReview, IncidentReaction)
+    ]
+    rows = union_all(*branches).subquery()
+    statement = (select(rows.c.user_id, func.sum(rows.c.incident), func.max(rows.c.at))
+                 .group_by(rows.c.user_id))
+    result = {}
+    for user_id, incidents, last in db.session.execute(statement):
+        # max() over a UNION loses the column type on SQLite
+        if isinstance(last, str):
+            last = datetime.fromisoformat(last)
+        result[user_id] = (incidents, last)
+    return result
+
+
+def directory_page(limit, cursor=None, q=None, is_admin=None, is_banned=None):
+    """A keyset page of the directory, newest first, each user with their aggregates"""
+    users, next_cursor = paginate(
+        directory_query(q, is_admin, is_banned), (User.created_at, User.id),
+        limit, cursor, types=(datetime, int)
+    )
+    stats = activity([user.id for user in users])
+    page = []
+    for user in users:
+        incidents, last = stats.get(user.id, (0, None))
+        page.append(dict(user.to_dict(), incident_count=incidents,
+                         last_active_at=last.isoformat() if last else None))
+    return {'users': page, 'next_cursor': next_cursor}
+
+
+def _remove_contributions(user_id, archived=False):
+    """Delete a user's comments, reviews and reactions on other people's incidents.
+
+    The counters on those incidents come down by one executemany UPDATE,
+    which on live incidents also bumps updated_at so sync clients refetch
+    them. `archived` does the same for the archive tables. Returns the ids
+    of the incidents touched.
+    """
+    comment, review, reaction, report = (ARCHIVES[model] if archived else model for model in
+                                         (IncidentComment, IncidentReview, IncidentReaction, IncidentReport))
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    grouped = (
+        (comment, {'comment_count': func.count()}),
+        (review, {'review_count': func.count(), 'rating_total': func.sum(review.rating)}),
+        (reaction, {
+            'like_count': func.sum(case((reaction.reaction_type == 'like', 1), else_=0)),
+            'share_count': func.sum(case((reaction.reaction_type == 'share', 1), else_=0)),
+        }),
+    )
+    for model, counters in grouped:
+        statement = (select(model.incident_id, *counters.values())
+                     .where(model.user_id == user_id).group_by(model.incident_id))
+        for incident_id, *values in db.session.execute(statement):
+            deltas[incident_id].update(zip(counters, values))
+        db.session.execute(delete(model).where(model.user_id == user_id)
+                           .execution_options(synchronize_session=False))
+    if not deltas:
+        return []
+
+    table = report.__table__
+    values = {name: table.c[name] - bindparam(f'minus_{name}') for name in COUNTERS}
+    if not archived:
+        values['updated_at'] = datetime.utcnow()
+    db.session.connection().execute(
+        update(table).where(table.c.id == bindparam('incident')).values(**values),
+        [dict({f'minus_{name}': value for name, value in counters.items()}, incident=incident_id)
+         for incident_id, counters in deltas.items()]
+    )
+    return list(deltas)
+
+
+def delete_user(user_id):
+    """Delete a user and everything they own, set-based and in one transaction.
+
+    Their incidents go MAX_BATCH at a time through
+    services.moderation.delete_incidents() (tombstones, clusters, rollups,
+    child rows), their archived incidents through purge_archived(), then
+    their comments, reviews and reactions elsewhere, live and archived,
+    their notifications and finally the user row. Reports still waiting in
+    the ingest queue are dropped first; one a writer already holds is
+    refused there once the user is gone. Returns (deleted (id, user_id)
+    pairs, ids of live incidents whose counters changed, media file
+    names); the caller commits and hands the files to the media collector.
+    """
+    files = ingest_queue.discard(user_id)
+    ids = list(db.session.scalars(select(IncidentReport.id).where(IncidentReport.user_id == user_id)))
+    deleted = []
+    for start in range(0, len(ids), MAX_BATCH):
+        pairs, names = delete_incidents(ids[start:start + MAX_BATCH])
+        deleted.extend(pairs)
+        files.extend(names)
+    files.extend(purge_archived(user_id))
+    touched = _remove_contributions(user_id)
+    _remove_contributions(user_id, archived=True)
+    db.session.execute(delete(Notification).where(Notification.user_id == user_id)
+                       .execution_options(synchronize_session=False))
+    db.session.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
+    return deleted, touched, list(dict.fromkeys(files))
@@ -0,0 +1,166 @@
+import gzip
+import json
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgspec
+except ImportError:  # fall back to the standard library encoder and JSON only
+    msgspec = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+# What a client may ask for in Accept, best first on a tie
+MEDIA_TYPES = (JSON, MSGPACK) if msgspec else (JSON,)
+COMPRESSIBLE = {JSON, MSGPACK, 'text/plain', 'text/html', 'text/csv'}
+# Fields of an embedded user kept in the normalized side table
+PUBLIC_USER_FIELDS = ('id', 'username', 'is_admin')
+
+
+def _fallback(obj):
+    # Whatever msgspec cannot encode natively goes through Flask's rules
+    return DefaultJSONProvider.default(obj)
+
+
+if msgspec:
+    _json_encoder = msgspec.json.Encoder(enc_hook=_fallback)
+    _msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=_fallback)
+
+
+def encode_json(obj):
+    """JSON bytes for `obj`, through msgspec when it is installed"""
+    if msgspec:
+        return _json_encoder.encode(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def encode(obj, mimetype=JSON):
+    if mimetype == MSGPACK:
+        return _msgpack_encoder.encode(obj)
+    return encode_json(obj)
+
+
+def negotiate():
+    """The response media type the current request's Accept header prefers"""
+    if not has_request_context():
+        return JSON
+    return request.accept_mimetypes.best_match(MEDIA_TYPES, default=JSON)
+
+
+def wants_normalized():
+    return has_request_context() and request.args.get('shape') == 'normalized'
+
+
+def normalize(payload):
+    """Replace every embedded user with user_id and collect them in a side table.
+
+    Works on any nesting of incidents, comments and reviews, rewriting the
+    freshly serialized payload in place. A list payload becomes
+    {"items": [...]}; the users table maps str(id) to the PUBLIC_USER_FIELDS
+    of each user, sent once however often they appear.
+    """
+    users = {}
+
+    def walk(records):
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            user = record.get('user')
+            if isinstance(user, dict):
+                del record['user']
+                record['user_id'] = user_id = user['id']
+                key = str(user_id)
+                if key not in users:
+                    users[key] = {field: user.get(field) for field in PUBLIC_USER_FIELDS}
+            # Users only appear on records and on records nested in lists
+            for value in record.values():
+                if isinstance(value, list):
+                    walk(value)
+
+    walk(payload if isinstance(payload, list) else [payload])
+    body = payload if isinstance(payload, dict) else {'items': payload}
+    body['users'] = users
+    return body
+
+
+def render(payload):
+    """(body bytes, mimetype) for a payload in the shape and format the request asked for"""
+    if wants_normalized():
+        payload = normalize(payload)
+    mimetype = negotiate()
+    return encode(payload, mimetype), mimetype
+
+
+class WireJSONProvider(DefaultJSONProvider):
+    """jsonify() through render(): msgspec encoding, MessagePack and the
+    normalized shape whenever the request asks for them."""
+
+    def dumps(self, obj, **kwargs):
+        if msgspec and not kwargs:
+            return encode_json(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        body, mimetype = render(self._prepare_response_obj(args, kwargs))
+        response = self._app.response_class(body, mimetype=mimetype)
+        response.vary.add('Accept')
+        return response
+
+
+def output(data, code, headers=None):
+    """Flask-RESTful representation for resources that return plain dicts"""
+    body, mimetype = render(data)
+    response = current_app.response_class(body, status=code, mimetype=mimetype, headers=headers)
+    response.vary.add('Accept')
+    return response
+
+
+class Compressor:
+    """Compresses responses of at least COMPRESS_MIN_BYTES for clients that accept it.
+
+    Brotli when the `brotli` package is installed and the client lists
+    `br`, gzip otherwise. Streamed responses (events, exports) and media
+    files are left alone. The ETag becomes weak, since the bytes now
+    depend on the encoding but the content does not.
+    """
+
+    def __init__(self, app=None):
+        self.min_bytes = 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_bytes = app.config.get('COMPRESS_MIN_BYTES', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+        self.encodings = ('br', 'gzip') if brotli else ('gzip',)
+        app.after_request(self.compress)
+        app.extensions['compressor'] = self
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_bytes:
+            return response
+        if encoding == 'br':
+            data = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(data, compresslevel=self.gzip_level)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = Compressor()
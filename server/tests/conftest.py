@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time
+_workdir = tempfile.mkdtemp(prefix='ajali-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'test.db')
+os.environ.pop('DATABASE_REPLICA_URL', None)
+
+from app import app as flask_app  # noqa: E402
+from models.extensions import db  # noqa: E402
+from services.ingest import ingest_queue  # noqa: E402
+from services.media import pipeline  # noqa: E402
+from services.media_gc import collector  # noqa: E402
+from services.notifications import dispatcher  # noqa: E402
+from services.principal import principals  # noqa: E402
+
+# Background writers run inline, so nothing outlives the test's tables
+for _worker in (dispatcher, pipeline, collector, ingest_queue):
+    _worker.sync = True
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, UPLOAD_FOLDER=os.path.join(_workdir, 'uploads'))
+    os.makedirs(flask_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Ids restart with every database; drop principals cached for another test's users
+    principals._entries.clear()
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def statements(app):
+    """Records every SQL statement the app's engine runs while the test does"""
+    from sqlalchemy import event
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'after_cursor_execute', record)
+
+
+@pytest.fixture
+def make_user(app):
+    """make_user(name, admin=False) -> a test client signed in as a new user, and the user"""
+    from werkzeug.security import generate_password_hash
+    from models.user import User
+
+    def make(name, admin=False):
+        user = User(username=name, email=f'{name}@test.ajali', is_admin=admin,
+                    password_hash=generate_password_hash('pw', method='pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+        response = client.post('/login', json={'email': user.email, 'password': 'pw'})
+        assert response.status_code == 200, response.data
+        return client, user
+    return make
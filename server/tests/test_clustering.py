@@ -0,0 +1,42 @@
+from models.extensions import db
+from models.incident_cluster import IncidentCluster
+from services.archive import archive_batch
+
+
+def report(client):
+    response = client.post('/incidents', data={'description': 'bus overturned', 'latitude': '-1.28',
+                                               'longitude': '36.8'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def clusters(admin):
+    return admin.get('/incidents/clusters?min_reports=1').get_json()['clusters']
+
+
+def test_nearby_reports_share_a_cluster_until_both_are_deleted(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, _ = make_user('alice')
+    first, second = report(alice), report(alice)
+    [cluster] = clusters(admin)
+    assert cluster['report_count'] == 2 and cluster['incident_ids'] == [first, second]
+
+    assert alice.delete(f'/incidents/{first}').status_code == 204
+    [cluster] = clusters(admin)
+    assert cluster['report_count'] == 1 and cluster['incident_ids'] == [second]
+
+    assert admin.delete('/incidents/batch', json={'ids': [second]}).status_code == 200
+    assert clusters(admin) == []
+    assert IncidentCluster.query.count() == 0
+
+
+def test_cluster_of_purged_archived_reports_is_deleted(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, user = make_user('alice')
+    incident_id = report(alice)
+    archive_batch([incident_id])
+    db.session.commit()
+    assert clusters(admin)[0]['report_count'] == 1  # archived reports still count
+
+    assert admin.delete(f'/users/{user.id}').status_code == 204
+    assert IncidentCluster.query.count() == 0
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.pagination import decode_cursor, encode_cursor
+
+
+def add_incidents(user, count, updated_at=None):
+    incidents = [IncidentReport(description=f'incident {i}', latitude=-1.28, longitude=36.8, user_id=user.id)
+                 for i in range(count)]
+    db.session.add_all(incidents)
+    db.session.commit()
+    if updated_at is not None:
+        IncidentReport.query.filter(IncidentReport.id.in_([i.id for i in incidents])).update(
+            {'updated_at': updated_at}, synchronize_session=False
+        )
+        db.session.commit()
+    return [incident.id for incident in incidents]
+
+
+def sync(client, token=None, limit=100):
+    """Page until has_more is false; returns (incident ids received, last token)"""
+    received = []
+    while True:
+        query = f'/incidents/changes?limit={limit}' + (f'&since={token}' if token else '')
+        body = client.get(query).get_json()
+        received.extend(incident['id'] for incident in body['incidents'])
+        token = body['since']
+        if not body['has_more']:
+            return received, token
+
+
+def test_paging_a_burst_with_one_timestamp_returns_each_row_once(make_user):
+    client, user = make_user('alice')
+    ids = add_incidents(user, 250, updated_at=datetime.utcnow())
+    received, token = sync(client, limit=100)
+    assert sorted(received) == sorted(ids)
+    assert sync(client, token)[0] == []
+
+
+def test_late_commit_behind_the_watermark_is_delivered_once(make_user):
+    client, user = make_user('alice')
+    add_incidents(user, 3)
+    _, token = sync(client)
+
+    # Stamped before the token was issued, committed after it
+    late = add_incidents(user, 1, updated_at=datetime.utcnow() - timedelta(seconds=2))
+    received, token = sync(client, token)
+    assert received == late
+    assert sync(client, token)[0] == []
+
+    updated = add_incidents(user, 1)
+    assert sync(client, token)[0] == updated
+
+
+def test_tokens_without_an_overlap_window_are_accepted(make_user):
+    client, user = make_user('alice')
+    add_incidents(user, 2)
+    _, token = sync(client)
+    old_token = encode_cursor(datetime.utcnow() - timedelta(minutes=1), 0, 0)
+    assert len(sync(client, old_token)[0]) == 2
+    assert client.get('/incidents/changes?since=garbage').status_code == 400
+
+
+def test_token_stays_bounded_through_a_burst_larger_than_the_cap(make_user, monkeypatch):
+    from services import incident_feed
+    monkeypatch.setattr(incident_feed, 'CHANGES_SEEN_MAX', 50)
+    client, user = make_user('alice')
+    now = datetime.utcnow()
+    ids = add_incidents(user, 150, updated_at=now - timedelta(seconds=1)) + add_incidents(user, 30, updated_at=now)
+
+    received, token = sync(client, limit=40)
+    assert sorted(received) == sorted(ids)
+    _, _, _, recent, _ = decode_cursor(token, datetime, int, int, list, int)
+    assert sum(len(group) - 1 for group in recent) <= 50
+    assert sync(client, token)[0] == []
+
+    updated = add_incidents(user, 1)
+    assert sync(client, token)[0] == updated
+
+
+def test_tokens_from_before_the_cap_are_accepted(make_user):
+    client, user = make_user('alice')
+    add_incidents(user, 2)
+    old_token = encode_cursor(datetime.utcnow() - timedelta(minutes=1), 0, 0, [])
+    assert len(sync(client, old_token)[0]) == 2
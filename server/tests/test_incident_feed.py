@@ -0,0 +1,21 @@
+from benchmarks.datagen import generate
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.incident_feed import feed_query, serialize_incidents
+
+
+def feed_statements(statements, limit):
+    """SQL statements needed to load and serialize the newest `limit` incidents"""
+    db.session.expunge_all()
+    statements.clear()
+    incidents = feed_query().order_by(IncidentReport.created_at.desc()).limit(limit).all()
+    payload = serialize_incidents(incidents)
+    assert len(payload) == limit
+    return len(statements)
+
+
+def test_feed_statement_count_does_not_grow_with_incidents(app, statements):
+    generate(users=20, incidents=200, comments=3.0, reactions=2.0, reviews=1.0, notifications=0,
+             seed=1, log=lambda *args: None)
+    small, large = feed_statements(statements, 20), feed_statements(statements, 200)
+    assert small == large
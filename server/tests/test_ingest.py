@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.ingest import ingest_queue
+
+
+@pytest.fixture
+def queue(app, tmp_path, monkeypatch):
+    """The ingest queue on a fresh file, enabled, draining only when the test says so"""
+    monkeypatch.setattr(ingest_queue, 'path', os.path.join(tmp_path, 'ingest-queue.db'))
+    monkeypatch.setattr(ingest_queue, '_local', threading.local())
+    monkeypatch.setattr(ingest_queue, 'enabled', True)
+    monkeypatch.setattr(ingest_queue, 'sync', False)
+    monkeypatch.setattr(ingest_queue, '_start', lambda: None)  # no writer thread
+    return ingest_queue
+
+
+def backdate(queue, ticket, seconds):
+    with sqlite3.connect(queue.path) as connection:
+        connection.execute('UPDATE submissions SET queued_at = queued_at - ? WHERE ticket = ?', (seconds, ticket))
+
+
+def test_queued_report_is_acknowledged_then_written(queue, make_user):
+    client, _ = make_user('alice')
+    response = client.post('/incidents', data={'description': 'bus overturned', 'latitude': '-1.28',
+                                                'longitude': '36.8'})
+    assert response.status_code == 202
+    ticket = response.get_json()['provisional_id']
+    assert client.get(f'/incidents/ingest/{ticket}').get_json() == {'state': 'queued', 'position': 1}
+    assert IncidentReport.query.count() == 0
+
+    assert queue.drain() == 1
+    status = client.get(f'/incidents/ingest/{ticket}').get_json()
+    assert status['state'] == 'created'
+    assert db.session.get(IncidentReport, status['incident_id']).description == 'bus overturned'
+    assert queue.depth() == 0
+
+
+def test_drained_reports_keep_their_submission_time(queue, make_user):
+    _, user = make_user('alice')
+    # Same spot an hour apart: outside the duplicate window, even if both drain now
+    early, _ = queue.append(user.id, 'first report', -1.28, 36.8)
+    backdate(queue, early, 3600)
+    late, _ = queue.append(user.id, 'second report', -1.28, 36.8)
+    submitted = datetime.utcnow()
+
+    assert queue.drain() == 2
+    first = IncidentReport.query.filter_by(description='first report').one()
+    second = IncidentReport.query.filter_by(description='second report').one()
+    assert abs(first.created_at - (submitted - timedelta(hours=1))) < timedelta(seconds=5)
+    assert abs(second.created_at - submitted) < timedelta(seconds=5)
+    assert first.cluster_id != second.cluster_id
+
+
+def test_deleting_a_user_drops_their_queued_reports(queue, make_user):
+    admin, _ = make_user('admin', admin=True)
+    _, user = make_user('alice')
+    _, other = make_user('bob')
+    queue.append(user.id, 'first report', -1.28, 36.8)
+    kept, _ = queue.append(other.id, 'second report', -1.1, 36.9)
+
+    assert admin.delete(f'/users/{user.id}').status_code == 204
+    assert queue.depth() == 1
+    assert queue.drain() == 1
+    assert [incident.user_id for incident in IncidentReport.query.all()] == [other.id]
+
+
+def test_report_of_a_user_deleted_mid_drain_is_refused(queue, make_user):
+    _, user = make_user('alice')
+    ticket, _ = queue.append(user.id, 'first report', -1.28, 36.8)
+    db.session.delete(user)
+    db.session.commit()  # as if the delete ran after the writer read the queue
+
+    assert queue.drain() == 1
+    assert IncidentReport.query.count() == 0
+    assert queue.status(ticket)['state'] == 'failed'
@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+from services.media import IMMUTABLE_MAX_AGE
+
+
+def store(app, content, extension='mp4'):
+    name = f'{hashlib.sha256(content).hexdigest()}.{extension}'
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], name), 'wb') as f:
+        f.write(content)
+    return name
+
+
+def test_media_supports_ranges_and_revalidation(app, make_user):
+    client, _ = make_user('alice')
+    content = bytes(range(256)) * 4
+    name = store(app, content)
+
+    response = client.get(f'/uploads/{name}')
+    assert response.status_code == 200 and response.data == content
+    assert response.headers['ETag'] == f'"{name.split(".")[0]}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.cache_control.private and response.cache_control.immutable
+    assert response.cache_control.max_age == IMMUTABLE_MAX_AGE
+
+    partial = client.get(f'/uploads/{name}', headers={'Range': 'bytes=100-199'})
+    assert partial.status_code == 206 and partial.data == content[100:200]
+    assert partial.headers['Content-Range'] == f'bytes 100-199/{len(content)}'
+
+    etag = response.headers['ETag']
+    assert client.get(f'/uploads/{name}', headers={'If-None-Match': etag}).status_code == 304
+    stale = client.get(f'/uploads/{name}', headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+    assert stale.status_code == 200 and stale.data == content
+
+
+def test_media_can_be_handed_to_the_front_end_server(app, make_user, monkeypatch):
+    client, _ = make_user('alice')
+    name = store(app, b'video bytes')
+    monkeypatch.setitem(app.config, 'MEDIA_ACCEL_REDIRECT', '/protected-uploads/')
+
+    response = client.get(f'/uploads/{name}')
+    assert response.status_code == 200 and response.data == b''
+    assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/{name}'
+    assert response.mimetype == 'video/mp4'
+    assert client.get(f'/uploads/{name}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_media_needs_a_session_and_stays_inside_the_upload_folder(app, make_user):
+    name = store(app, b'secret')
+    assert app.test_client().get(f'/uploads/{name}').status_code == 401
+    client, _ = make_user('alice')
+    assert client.get('/uploads/../test.db').status_code == 404
+    assert client.get('/uploads/missing.png').status_code == 404
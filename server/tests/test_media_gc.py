@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+from sqlalchemy import delete
+
+from models.extensions import db
+from models.incident_image import IncidentImage
+from models.incident_report import IncidentReport
+from services.media import pipeline
+from services.media_gc import collector, storage_lock
+
+
+def add_image(user, filename='missing.png'):
+    incident = IncidentReport(description='crash', latitude=-1.28, longitude=36.8, user_id=user.id)
+    db.session.add(incident)
+    db.session.flush()
+    image = IncidentImage(image_url=filename, report_id=incident.id)
+    db.session.add(image)
+    db.session.commit()
+    return image.id
+
+
+def test_collector_rechecks_under_the_upload_lock(app):
+    folder = app.config['UPLOAD_FOLDER']
+    name = 'a' * 64 + '.png'
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(b'png')
+    queued_at = time.time() + 1  # the file predates the delete
+    os.utime(path, (queued_at - 10, queued_at - 10))
+
+    worker = threading.Thread(target=collector._remove, args=([name], queued_at))
+    with storage_lock(folder):
+        worker.start()
+        time.sleep(0.2)
+        assert worker.is_alive()  # waiting for the upload to finish
+        os.utime(path, (queued_at + 1, queued_at + 1))  # store_upload() reusing the file
+    worker.join(5)
+    assert os.path.exists(path)
+
+    os.utime(path, (queued_at - 10, queued_at - 10))
+    assert collector._remove([name], queued_at) == 1
+
+
+def test_pipeline_skips_media_deleted_while_processing(app, make_user):
+    _, user = make_user('alice')
+
+    image_id = add_image(user)
+    db.session.execute(delete(IncidentImage).where(IncidentImage.id == image_id))
+    db.session.commit()
+    pipeline._run(IncidentImage, image_id)
+
+    image_id = add_image(user)
+
+    def delete_midway(media):
+        with db.engine.begin() as connection:
+            connection.execute(delete(IncidentImage.__table__).where(IncidentImage.id == media.id))
+
+    pipeline.processors.insert(0, delete_midway)
+    try:
+        pipeline._run(IncidentImage, image_id)  # fails on the missing file, then finds no row
+    finally:
+        pipeline.processors.remove(delete_midway)
+    assert db.session.get(IncidentImage, image_id) is None
+
+
+def test_pipeline_skips_media_deleted_before_it_is_marked_ready(app, make_user):
+    _, user = make_user('alice')
+    image_id = add_image(user)
+
+    def delete_midway(media):
+        with db.engine.begin() as connection:
+            connection.execute(delete(IncidentImage.__table__).where(IncidentImage.id == media.id))
+
+    processors, pipeline.processors = pipeline.processors, [delete_midway]
+    try:
+        pipeline._run(IncidentImage, image_id)
+    finally:
+        pipeline.processors = processors
+    assert db.session.get(IncidentImage, image_id) is None
@@ -0,0 +1,58 @@
+from models.extensions import db
+from models.incident_comment import IncidentComment
+from models.incident_report import IncidentReport
+from models.incident_tombstone import IncidentTombstone
+from models.notification import Notification
+
+
+def add_incidents(user, count):
+    incidents = [IncidentReport(description=f'incident {i}', latitude=-1.28, longitude=36.8, user_id=user.id)
+                 for i in range(count)]
+    db.session.add_all(incidents)
+    db.session.commit()
+    return [incident.id for incident in incidents]
+
+
+def test_batch_status_update_notifies_each_owner_once(make_user):
+    admin, _ = make_user('admin', admin=True)
+    _, alice = make_user('alice')
+    _, bob = make_user('bob')
+    ids = add_incidents(alice, 3) + add_incidents(bob, 1)
+
+    response = admin.put('/incidents/batch', json={'ids': ids + [999], 'status': 'resolved'})
+    assert response.status_code == 200
+    assert sorted(response.get_json()['updated']) == ids
+    assert {incident.status for incident in IncidentReport.query} == {'resolved'}
+    assert sorted(n.message for n in Notification.query) == [
+        '3 of your incident reports are now resolved', f'Your incident report #{ids[3]} is now resolved'
+    ]
+    # Already resolved: nothing changes and nobody is told again
+    assert admin.put('/incidents/batch', json={'ids': ids, 'status': 'resolved'}).get_json() == {'updated': []}
+    assert Notification.query.count() == 2
+
+
+def test_batch_delete_removes_incidents_and_their_threads(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, user = make_user('alice')
+    ids = add_incidents(user, 3)
+    assert alice.post(f'/incidents/{ids[0]}/comments', json={'content': 'seen it'}).status_code == 201
+
+    response = admin.delete('/incidents/batch', json={'ids': ids[:2]})
+    assert response.status_code == 200
+    assert sorted(response.get_json()['deleted']) == ids[:2]
+    assert [incident.id for incident in IncidentReport.query] == ids[2:]
+    assert IncidentComment.query.count() == 0
+    assert sorted(t.incident_id for t in IncidentTombstone.query) == ids[:2]
+
+
+def test_batch_endpoints_are_admin_only_and_validate_input(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, user = make_user('alice')
+    ids = add_incidents(user, 1)
+    assert alice.put('/incidents/batch', json={'ids': ids, 'status': 'resolved'}).status_code == 403
+    assert alice.delete('/incidents/batch', json={'ids': ids}).status_code == 403
+    for body in ({'ids': ids, 'status': 'done'}, {'ids': [], 'status': 'resolved'},
+                 {'ids': list(range(501)), 'status': 'resolved'}):
+        assert admin.put('/incidents/batch', json=body).status_code == 400
+    assert admin.delete('/incidents/batch', json={'ids': 'x'}).status_code == 400
+    assert IncidentReport.query.one().status == 'pending'
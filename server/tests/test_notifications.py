@@ -0,0 +1,46 @@
+import json
+
+from models.notification import Notification
+
+
+def test_mark_read_validates_ids(make_user):
+    client, user = make_user('alice')
+    for _ in range(2):
+        Notification.create_notification(user.id, 'hello')
+
+    for body in ({'ids': ['x']}, {'ids': 'x'}, {'ids': []}, {'ids': list(range(501))}, {}):
+        assert client.put('/notifications', json=body).status_code == 400
+
+    response = client.put('/notifications', json={'ids': [n.id for n in Notification.query]})
+    assert response.status_code == 200
+    assert response.get_json() == {'updated': 2, 'unread_count': 0}
+
+
+def test_new_incident_fans_out_to_every_admin_once(make_user, statements):
+    from services.events import broker, user_channel
+    from services.notifications import Job, dispatcher
+
+    admins = [make_user(f'admin{i}', admin=True)[1] for i in range(3)]
+    client, user = make_user('alice')
+    subscription = broker.subscribe([user_channel(admins[0].id), user_channel(user.id)])
+    try:
+        statements.clear()
+        response = client.post('/incidents', data={'description': 'bus overturned', 'latitude': '-1.28',
+                                                   'longitude': '36.8'})
+        assert response.status_code == 201
+        # One INSERT ... SELECT for the whole audience
+        assert sum('INSERT INTO notifications' in s for s in statements) == 1
+        assert sorted(n.user_id for n in Notification.query) == sorted(a.id for a in admins)
+        event = json.loads(subscription.get(timeout=1))
+        assert event['event'] == 'notification' and event['data']['user_id'] == admins[0].id
+        assert subscription.get(timeout=0.1) is None  # nothing for the reporter
+
+        # A burst sharing a coalesce key lands as one summary per admin
+        job = Job('admins', (), 'New incident requires review', 'warning', 'new-incident',
+                  '{count} new incidents require review')
+        dispatcher.write([job] * 4)
+        assert sorted(n.message for n in Notification.query.filter_by(user_id=admins[1].id)) == [
+            '4 new incidents require review', 'New incident reported by alice requires review'
+        ]
+    finally:
+        subscription.close()
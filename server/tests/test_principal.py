@@ -0,0 +1,28 @@
+def user_selects(statements):
+    return sum('FROM users' in s for s in statements)
+
+
+def test_signed_in_user_is_loaded_once_across_requests(make_user, statements):
+    client, _ = make_user('alice')
+    statements.clear()
+    for _ in range(3):
+        assert client.get('/notifications/unread_count').status_code == 200
+    assert user_selects(statements) == 1  # the first request, then the cache
+
+
+def test_ban_and_delete_take_effect_on_the_next_request(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, user = make_user('alice')
+    user_id = user.id
+    assert alice.get('/notifications/unread_count').status_code == 200
+
+    assert admin.put(f'/users/{user_id}/ban', json={'is_banned': True}).status_code == 200
+    assert alice.get('/notifications/unread_count').status_code == 403
+    assert admin.put(f'/users/{user_id}/ban', json={'is_banned': False}).status_code == 200
+    assert alice.get('/notifications/unread_count').status_code == 200
+
+    assert admin.put(f'/users/{user_id}', json={'is_admin': True}).status_code == 200
+    assert alice.get('/incidents/clusters').status_code == 200
+
+    assert admin.delete(f'/users/{user_id}').status_code == 204
+    assert alice.get('/notifications/unread_count').status_code == 401
@@ -0,0 +1,48 @@
+from sqlalchemy import update
+
+import pytest
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.user import User
+from services.cache import LRUCacheBackend, response_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, 'backend', LRUCacheBackend())
+    return response_cache
+
+
+def revalidate(client, etag):
+    return client.get('/incidents?limit=10', headers={'If-None-Match': etag})
+
+
+def test_etag_answers_304_until_an_incident_changes(make_user, cache):
+    client, user = make_user('alice')
+    db.session.add(IncidentReport(description='crash', latitude=-1.28, longitude=36.8, user_id=user.id))
+    db.session.commit()
+
+    first = client.get('/incidents?limit=10')
+    assert first.status_code == 200 and first.headers['ETag']
+    etag = first.headers['ETag']
+    assert revalidate(client, etag).status_code == 304
+
+    response = client.post('/incidents/1/comments', json={'content': 'on my way'})
+    assert response.status_code == 201
+    changed = revalidate(client, etag)
+    assert changed.status_code == 200
+    assert changed.get_json()['incidents'][0]['comment_count'] == 1
+
+
+def test_ban_made_by_another_worker_changes_the_etag(make_user, cache):
+    client, user = make_user('alice')
+    _, bob = make_user('bob')
+    db.session.add(IncidentReport(description='crash', latitude=-1.28, longitude=36.8, user_id=bob.id))
+    db.session.commit()
+    etag = client.get('/incidents?limit=10').headers['ETag']
+
+    # Written straight to the database: this worker's generation is not bumped
+    db.session.execute(update(User).where(User.id == bob.id).values(is_banned=True))
+    db.session.commit()
+    assert revalidate(client, etag).status_code == 200
@@ -0,0 +1,19 @@
+from models.extensions import db
+from models.incident_report import IncidentReport
+
+
+def test_review_rating_is_validated_before_counters_move(make_user):
+    client, user = make_user('alice')
+    incident = client.post('/incidents', data={'description': 'crash', 'latitude': '-1.28',
+                                                'longitude': '36.8'}).get_json()
+
+    for body in ({'rating': 'x', 'content': 'ok'}, {'rating': 0, 'content': 'ok'},
+                 {'rating': 6, 'content': 'ok'}, {'rating': 4.5, 'content': 'ok'},
+                 {'rating': True, 'content': 'ok'}, {'rating': [4], 'content': 'ok'},
+                 {'content': 'ok'}, {'rating': 4}):
+        assert client.post(f"/incidents/{incident['id']}/reviews", json=body).status_code == 400
+
+    assert client.post(f"/incidents/{incident['id']}/reviews",
+                       json={'rating': '4', 'content': 'ok'}).status_code == 201
+    report = db.session.get(IncidentReport, incident['id'])
+    assert (report.review_count, report.rating_total) == (1, 4)
@@ -0,0 +1,31 @@
+from models.extensions import db
+from models.incident_comment import IncidentComment
+from models.incident_report import IncidentReport
+from services.moderation import delete_incidents
+from services.search import search_incidents
+
+
+def found(q):
+    return [incident['id'] for incident in search_incidents(q, 20)['incidents']]
+
+
+def test_bulk_delete_keeps_the_index_of_other_incidents(make_user):
+    _, user = make_user('alice')
+    incidents = [IncidentReport(description=f'{word} overturned', latitude=-1.28, longitude=36.8, user_id=user.id)
+                 for word in ('bus', 'lorry')]
+    db.session.add_all(incidents)
+    db.session.flush()
+    for incident in incidents:
+        db.session.add_all([IncidentComment(content=f'{incident.description} near thika {i}',
+                                            user_id=user.id, incident_id=incident.id) for i in range(50)])
+    db.session.commit()
+    bus, lorry = (incident.id for incident in incidents)
+
+    delete_incidents([bus])
+    db.session.commit()
+    assert found('thika') == [lorry]
+    assert found('bus') == []
+
+    db.session.add(IncidentComment(content='ambulance arrived', user_id=user.id, incident_id=lorry))
+    db.session.commit()
+    assert found('ambulance') == [lorry]
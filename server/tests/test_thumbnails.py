@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from models.extensions import db
+from models.incident_image import IncidentImage
+from models.incident_report import IncidentReport
+from services.media import pipeline
+from services.thumbnails import Image, variants
+
+
+@pytest.fixture
+def inline(monkeypatch):
+    monkeypatch.setattr(variants, 'processes', None)
+
+
+def add_image(app, user, content):
+    name = 'c' * 64 + '.png'
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], name), 'wb') as f:
+        f.write(content)
+    incident = IncidentReport(description='crash', latitude=-1.28, longitude=36.8, user_id=user.id)
+    db.session.add(incident)
+    db.session.flush()
+    image = IncidentImage(image_url=name, content_hash='c' * 64, report_id=incident.id)
+    db.session.add(image)
+    db.session.commit()
+    return image.id
+
+
+@pytest.mark.skipif(Image is None, reason='needs Pillow')
+def test_image_without_a_thumbnail_is_still_ready(app, make_user, inline):
+    _, user = make_user('alice')
+    image_id = add_image(app, user, b'not really a png')
+
+    pipeline._run(IncidentImage, image_id)
+
+    image = db.session.get(IncidentImage, image_id)
+    assert image.status == 'ready'
+    assert image.thumbnail_url is None
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], 'c' * 64 + '.thumb.jpg'))
+
+
+def test_variant_that_writes_nothing_is_left_unset(app, inline):
+    def silent(source, target):
+        pass  # like ffmpeg exiting 0 on a clip shorter than the poster offset
+
+    assert variants._build(silent, 'clip.mp4', 'd' * 64 + '.poster.jpg') is None
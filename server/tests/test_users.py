@@ -0,0 +1,34 @@
+from sqlalchemy import select
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from models.incident_archive import ArchivedIncidentComment, ArchivedIncidentReaction, ArchivedIncidentReview
+from services.archive import archive_batch
+
+
+def test_deleting_a_user_removes_their_archived_contributions(make_user):
+    admin, _ = make_user('admin', admin=True)
+    alice, user = make_user('alice')
+    bob, author = make_user('bob')
+    incident = IncidentReport(description='crash', latitude=-1.28, longitude=36.8, user_id=author.id,
+                              status='resolved')
+    db.session.add(incident)
+    db.session.commit()
+    incident_id = incident.id
+
+    url = f'/incidents/{incident_id}'
+    for client, rating in ((alice, 2), (bob, 4)):
+        assert client.post(f'{url}/comments', json={'content': 'seen it'}).status_code == 201
+        assert client.post(f'{url}/reviews', json={'rating': rating, 'content': 'ok'}).status_code == 201
+    assert alice.post(f'{url}/reactions', json={'reaction_type': 'like'}).status_code == 201
+    archive_batch([incident_id])
+    db.session.commit()
+
+    user_id = user.id
+    assert admin.delete(f'/users/{user_id}').status_code == 204
+    for model in (ArchivedIncidentComment, ArchivedIncidentReview, ArchivedIncidentReaction):
+        assert not db.session.scalars(select(model.id).where(model.user_id == user_id)).all()
+    archived = bob.get(url).get_json()
+    assert archived['comment_count'] == 1 and len(archived['comments']) == 1
+    assert archived['review_stats'] == {'count': 1, 'average_rating': 4}
+    assert archived['reactions'] == {'like': 0, 'share': 0}
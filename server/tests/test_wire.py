@@ -0,0 +1,53 @@
+import gzip
+
+import pytest
+
+from models.extensions import db
+from models.incident_report import IncidentReport
+from services.wire import brotli, msgspec
+
+
+@pytest.fixture
+def feed(make_user):
+    client, user = make_user('alice')
+    db.session.add_all([IncidentReport(description=f'bus overturned near thika {i}', latitude=-1.28,
+                                       longitude=36.8, user_id=user.id) for i in range(20)])
+    db.session.commit()
+    return client, client.get('/incidents?limit=20').get_json()
+
+
+def test_large_responses_are_compressed_for_clients_that_accept_it(feed):
+    client, expected = feed
+    response = client.get('/incidents?limit=20', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_etag()[1]  # weak once the bytes depend on the encoding
+    assert gzip.decompress(response.data) == client.get('/incidents?limit=20').data
+
+    if brotli is not None:
+        response = client.get('/incidents?limit=20', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == client.get('/incidents?limit=20').data
+
+    small = client.get('/notifications/unread_count', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+@pytest.mark.skipif(msgspec is None, reason='needs msgspec')
+def test_msgpack_is_served_when_asked_for(feed):
+    client, expected = feed
+    response = client.get('/incidents?limit=20', headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    assert 'Accept' in response.vary
+    assert msgspec.msgpack.decode(response.data) == expected
+    # Cached per representation, so JSON clients still get JSON
+    assert client.get('/incidents?limit=20').mimetype == 'application/json'
+
+
+def test_normalized_shape_sends_each_user_once(feed):
+    client, expected = feed
+    body = client.get('/incidents?limit=20&shape=normalized').get_json()
+    assert [incident['id'] for incident in body['incidents']] == [i['id'] for i in expected['incidents']]
+    assert all('user' not in incident for incident in body['incidents'])
+    [(user_id, user)] = body['users'].items()
+    assert user == {'id': int(user_id), 'username': 'alice', 'is_admin': False}